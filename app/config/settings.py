@@ -13,11 +13,25 @@ ANNOTATIONS_PATH = os.path.join(BASE_DIR, "dataset", "annotations")
 # Caminhos para resultados da detecção
 RESULTS_DETECTED_PATH = os.path.join(BASE_DIR, "dataset", "results", "detected")
 RESULTS_NOT_DETECTED_PATH = os.path.join(BASE_DIR, "dataset", "results", "not_detected")
+METRICS_PATH = os.path.join(BASE_DIR, "dataset", "results", "metrics")
+# Resultados estruturados (caixas, scores, tempos); .db/.sqlite usa SQLite
+RESULTS_STORE_PATH = os.path.join(BASE_DIR, "dataset", "results", "detections.jsonl")
 
 # Caminhos para arquivos do modelo treinado
 MODEL_DIR = os.path.join(BASE_DIR, "model")
 CASCADE_XML_PATH = os.path.join(MODEL_DIR, "cascade.xml")
 VEC_FILE_PATH = os.path.join(MODEL_DIR, "trained_vec.vec")
+# Registro de cascades versionados (model/registry/<modelo>/<versão>/cascade.xml)
+MODEL_REGISTRY_PATH = os.path.join(MODEL_DIR, "registry")
+# Varreduras de treinamento (um diretório isolado por job)
+SWEEP_PATH = os.path.join(MODEL_DIR, "sweeps")
+
+# Cache de artefatos intermediários (índices, hashes)
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+DETECTION_INDEX_PATH = os.path.join(CACHE_DIR, "detection_index.json")
+
+# Baselines dos benchmarks (versionados para comparar entre commits)
+BENCHMARK_PATH = os.path.join(BASE_DIR, "benchmarks")
 
 
 # Parâmetros de treinamento do classificador Haar Cascade
@@ -36,6 +50,34 @@ TRAINING_PARAMS = {
 }
 
 
+# Varredura de configurações de treino rodando em paralelo
+SWEEP_PARAMS = {
+    "grid": {                 # sobrescreve TRAINING_PARAMS (produto cartesiano)
+        "feature_type": ["HAAR", "LBP"],
+        "window": [(40, 40), (80, 80)],   # (width, height); um .vec por janela
+        "max_false_alarm_rate": [0.4, 0.5],
+    },
+    "jobs": 0,                # treinos simultâneos; 0 = metade dos núcleos
+    "memory_mb": 4096,        # orçamento total dos buffers precalc, dividido entre os jobs
+    "min_buffer_mb": 256,     # piso por buffer (precalcVal/precalcIdx) de cada job
+}
+
+
+# Acompanhamento do traincascade (progresso + parada antecipada)
+TRAIN_MONITOR_PARAMS = {
+    "min_acceptance": 1e-5,   # acceptanceRatio dos negativos abaixo disso = overtraining → para
+    "max_weak": 0,            # máx. de classificadores fracos por estágio (0 = sem limite)
+    "finalize": True,         # ao parar, monta o cascade.xml com os estágios já prontos
+}
+
+
+# Registro de modelos (versões imutáveis + ponteiro da versão ativa)
+REGISTRY_PARAMS = {
+    "default_model": "books",  # nome usado pelo treinamento ao registrar o cascade
+    "reload_seconds": 1.0,    # intervalo mín. entre checagens da versão ativa (hot-reload)
+}
+
+
 # Parâmetros para o processo de detecção
 DETECTION_PARAMS = {
     "scaleFactor": 1.06,      # passo entre escalas
@@ -43,13 +85,153 @@ DETECTION_PARAMS = {
     "minSize": (80, 100),     # ≥ janela de treino
     "maxSize": (800, 1200),   # opcional, pode omitir
     "flags": 0,
-    "groupThreshold": 1,     # NMS: grupos com ≥2 retângulos
-    "eps": 0.2,              # NMS: sobreposição máxima
-    "max_objects": 2      # queremos máx. 5 livros
+    "workingSize": 1280,      # reduz o maior lado a N px antes da busca (None = original)
+    "maxScaleLevels": 32,     # teto de escalas; aumenta o scaleFactor se preciso (0 = fixo)
+    "nmsThreshold": 0.3,     # NMS: IoU máx. entre caixas mantidas
+    "max_objects": 2      # mantém as N caixas de maior score
+}
+
+
+# Parâmetros da detecção em lote (pool de processos)
+BATCH_PARAMS = {
+    "workers": 0,             # 0 = um processo por núcleo (os.cpu_count())
+    "chunk_size": 16,         # imagens por tarefa enviada a um worker
+    "max_pending": 0,         # chunks em voo; 0 = 2 × workers (backpressure)
+}
+
+
+# Gravação dos resultados da detecção
+RESULTS_PARAMS = {
+    "render": False,          # grava também a cópia JPEG anotada (detected/not_detected)
+    "incremental": True,      # reprocessa só imagens novas/alteradas (tudo se o cascade mudar)
+    "flush_every": 256,       # registros acumulados antes de escrever no store
+    "flush_seconds": 5.0,     # ou a cada N segundos, o que vier primeiro
+}
+
+
+# Parâmetros do pipeline em estágios (leitura → detecção → escrita)
+STREAM_PARAMS = {
+    "readers": 2,             # threads de leitura/decodificação
+    "detectors": 0,           # threads de detecção; 0 = os.cpu_count()
+    "writers": 2,             # threads de desenho/codificação JPEG
+    "queue_size": 32,         # tamanho máx. de cada fila entre estágios
+}
+
+
+# Parâmetros da detecção em vídeo/webcam em tempo real
+VIDEO_PARAMS = {
+    "detect_every": 5,        # detecção completa a cada N frames; rastreia nos demais
+    "track_margin": 0.25,     # margem da janela de busca (fração da caixa)
+    "track_size": 64,         # lado máx. do template de rastreamento (px)
+    "track_min_score": 0.6,   # correlação mínima para manter a caixa
+    "save_queue": 16,         # frames aguardando gravação assíncrona
+}
+
+
+# Geração nativa do .vec (substitui o opencv_createsamples)
+VEC_PARAMS = {
+    "workers": 0,             # processos de recorte; 0 = os.cpu_count()
+    "variants": 4,            # variações aumentadas por caixa em cada rodada extra
+    "jitter": 0.05,           # deslocamento máx. (fração da caixa) nas variações
+    "seed": 0,                # semente do RNG (amostras reprodutíveis)
+    "max_rounds": 5,          # rodadas de aumento antes de desistir
+}
+
+
+# Aumento offline dos positivos (app/core/augment.py), gravado direto no .vec
+AUGMENT_PARAMS = {
+    "per_box": 0,             # variações por caixa anotada (0 = desliga; N → .vec e numPos ~N+1×)
+    "margin": 0.15,           # contexto em volta da caixa usado nas deformações
+    "max_angle": 8.0,         # rotação máx. (graus)
+    "max_shear": 0.08,        # cisalhamento máx.
+    "scale": 0.1,             # variação de escala (±)
+    "perspective": 0.06,      # deslocamento máx. de cada canto (fração do lado)
+    "translate": 0.04,        # deslocamento máx. do centro (fração do lado)
+    "brightness": 25,         # soma máx. de brilho (níveis de cinza, ±)
+    "contrast": 0.25,         # variação de contraste (±)
+    "blur_prob": 0.3,         # fração das variações com desfoque gaussiano
+    "max_blur": 1.5,          # sigma máx. do desfoque
+    "noise": 6.0,             # desvio máx. do ruído gaussiano
+    "background_prob": 0.5,   # fração com fundo trocado por recorte de negativo
+    "seed": 0,                # semente (mesmo seed → mesmo .vec, com qualquer nº de workers)
+    "workers": 0,             # processos; 0 = os.cpu_count()
+}
+
+
+# Mineração de negativos difíceis (falsos positivos → novos negativos)
+MINING_PARAMS = {
+    "workers": 0,             # processos; 0 = os.cpu_count()
+    "chunk_size": 16,         # imagens por tarefa
+    "max_per_image": 20,      # máx. de recortes por imagem negativa
+    "padding": 0.1,           # margem extra em volta de cada falso positivo
+    "prefix": "hard_",        # prefixo dos recortes gravados em NEGATIVE_PATH
+}
+
+
+# Instrumentação (histogramas de latência e perfil por estágio do cascade)
+METRICS_PARAMS = {
+    "export": True,           # grava metrics .json/.csv/.prom em METRICS_PATH ao fim
+    "stage_profile_images": 0,  # imagens amostradas p/ contar janelas por estágio (0 = não)
+    "stage_profile_size": 640,  # maior lado dessas imagens no avaliador NumPy
+}
+
+
+# Avaliação precisão × velocidade sobre as imagens anotadas
+EVAL_PARAMS = {
+    "grid": {                 # configurações testadas (produto cartesiano)
+        "scaleFactor": [1.05, 1.1, 1.2],
+        "minNeighbors": [3, 5, 7],
+        "minSize": [(60, 75), (80, 100), (120, 150)],
+    },
+    "search": {               # busca sem replanejamento: a grade vale como está
+        "workingSize": None,  # (podem virar eixos da grade, ex. "workingSize": [640, 1280])
+        "maxScaleLevels": 0,
+    },
+    "iou": 0.5,               # IoU mínimo para casar detecção e anotação
+    "workers": 0,             # processos; 0 = os.cpu_count()
+    "chunk_size": 8,          # imagens por tarefa
+}
+
+
+# Benchmarks de desempenho (cargas sintéticas reprodutíveis)
+BENCHMARK_PARAMS = {
+    "resolutions": [(640, 480), (1280, 720), (1920, 1080)],  # imagens sintéticas (L × A)
+    "images": 20,             # imagens por resolução / anotações sintéticas
+    "repeats": 3,             # rodadas medidas (após 1 de aquecimento)
+    "seed": 0,                # semente das cargas sintéticas
+    "workers": 0,             # processos do caso batch; 0 = os.cpu_count()
+    "nms_boxes": 500,         # caixas por chamada no caso nms
+    "vec_samples": 20000,     # amostras 24×24 no caso vec
+    "tolerance": 0.15,        # piora máx. (fração) antes de acusar regressão
+}
+
+
+# Servidor HTTP local de detecção (python -m app.core.server)
+SERVER_PARAMS = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "workers": 0,             # processos com o cascade carregado; 0 = os.cpu_count()
+    "max_batch": 8,           # imagens por micro-lote
+    "max_wait_ms": 5,         # espera máx. para completar um lote
+    "max_pending": 256,       # imagens na fila; acima disso responde 503
+    "max_body": 32 << 20,     # tamanho máx. do upload (bytes)
+    "max_header": 64 << 10,   # tamanho máx. da linha + cabeçalhos HTTP
+}
+
+
+# Download de imagens (scripts/download_images.py)
+DOWNLOAD_PARAMS = {
+    "workers": 8,             # downloads simultâneos (threads + conexões no pool)
+    "per_host": 4,            # conexões simultâneas máx. por host
+    "timeout": 10,            # segundos por requisição
+    "retries": 3,             # novas tentativas (retoma o .part via Range)
+    "backoff": 0.5,           # espera antes da tentativa N: backoff × 2^(N-1) segundos
+    "chunk_size": 1 << 16,    # bytes por bloco gravado em disco
+    "save_every": 20,         # downloads entre gravações do manifesto
 }
 
 
-# Caminho para os binários do OpenCV
-OPENCV_BIN_DIR = r"C:\opencv\build\x64\vc15\bin"
-CREATESAMPLES_EXE = os.path.join(OPENCV_BIN_DIR, "opencv_createsamples.exe")
-TRAINCASCADE_EXE = os.path.join(OPENCV_BIN_DIR, "opencv_traincascade.exe")
+# Caminho para os binários do OpenCV (sobrescreva com a variável OPENCV_BIN_DIR)
+OPENCV_BIN_DIR = os.environ.get("OPENCV_BIN_DIR", r"C:\opencv\build\x64\vc15\bin")
+_EXE = ".exe" if os.name == "nt" else ""
+TRAINCASCADE_EXE = os.path.join(OPENCV_BIN_DIR, f"opencv_traincascade{_EXE}")
@@ -7,10 +7,11 @@ from app.config.settings import POSITIVE_PATH, ANNOTATIONS_PATH
 logger = get_logger(__name__)
 
 
-def annotate_images():
+def annotate_images(only_missing: bool = True):
     """
     Permite anotar regiões com livros nas imagens da pasta POSITIVE_PATH.
     Salva anotações no formato x y w h por imagem.
+    :param only_missing: se True, pula imagens que já têm anotação
     """
     ensure_dir(ANNOTATIONS_PATH)
     images = list_images(POSITIVE_PATH)
@@ -19,6 +20,13 @@ def annotate_images():
         logger.warning("Nenhuma imagem encontrada em 'positives'.")
         return
 
+    if only_missing:
+        images = [p for p in images if not os.path.exists(os.path.join(
+            ANNOTATIONS_PATH, f"{os.path.splitext(os.path.basename(p))[0]}.txt"))]
+        if not images:
+            logger.info("Todas as imagens já estão anotadas — etapa pulada.")
+            return
+
     logger.info(f"Iniciando anotação de {len(images)} imagens...")
 
     for image_path in images:
@@ -0,0 +1,276 @@
+# app/core/augment.py
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.core.vec_file import VecWriter
+from app.services.image_loader import REDUCED_GRAYSCALE
+from app.services.logger import get_logger
+from app.config.settings import AUGMENT_PARAMS
+
+logger = get_logger(__name__)
+
+# Negativos do processo worker (caminhos + imagens já decodificadas)
+_negatives = []
+_neg_cache = {}
+_NEG_CACHE_SIZE = 32
+
+
+def decode_factor(boxes, w: int, h: int) -> int:
+    """
+    Maior redução na decodificação (2, 4 ou 8) que ainda deixa toda caixa
+    com ao menos o dobro do tamanho da amostra (margem para o INTER_AREA).
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if not len(boxes):
+        return 1
+    room = min(boxes[:, 2].min() / (2 * w), boxes[:, 3].min() / (2 * h))
+    return next((f for f in (8, 4, 2) if room >= f), 1)
+
+
+def context_crop(gray: np.ndarray, box, w: int, h: int, margin: float) -> np.ndarray:
+    """
+    Recorta a caixa com `margin` de contexto em cada lado (bordas replicadas
+    fora da imagem) e redimensiona para que a caixa ocupe exatamente w×h.
+    :return: (h + 2·my, w + 2·mx) uint8, com a caixa em [my:my+h, mx:mx+w]
+    """
+    x, y, bw, bh = box
+    mx, my = round(w * margin), round(h * margin)
+    ih, iw = gray.shape
+    x0, x1 = math.floor(x - bw * mx / w), math.ceil(x + bw + bw * mx / w)
+    y0, y1 = math.floor(y - bh * my / h), math.ceil(y + bh + bh * my / h)
+    region = gray[max(0, y0):min(ih, y1), max(0, x0):min(iw, x1)]
+    if x0 < 0 or y0 < 0 or x1 > iw or y1 > ih:
+        region = cv2.copyMakeBorder(region, max(0, -y0), max(0, y1 - ih), max(0, -x0),
+                                    max(0, x1 - iw), cv2.BORDER_REPLICATE)
+    return cv2.resize(region, (w + 2 * mx, h + 2 * my), interpolation=cv2.INTER_AREA)
+
+
+def random_homographies(rng, n: int, w: int, h: int, mx: int, my: int, p: dict) -> np.ndarray:
+    """
+    n homografias (n, 3, 3) que levam pixels da amostra w×h para o recorte
+    com contexto: rotação, cisalhamento, escala e translação (afim) mais
+    um deslocamento aleatório de cada canto (perspectiva).
+    """
+    theta = np.radians(rng.uniform(-p["max_angle"], p["max_angle"], n))
+    shear = rng.uniform(-p["max_shear"], p["max_shear"], n)
+    scale = rng.uniform(1 - p["scale"], 1 + p["scale"], n)
+    shift = rng.uniform(-p["translate"], p["translate"], (n, 2)) * (w, h)
+    persp = rng.uniform(-p["perspective"], p["perspective"], (n, 4, 2)) * (w, h)
+
+    cos, sin = np.cos(theta), np.sin(theta)
+    affine = np.empty((n, 2, 2))
+    affine[:, 0, 0] = scale * cos
+    affine[:, 0, 1] = scale * (cos * shear - sin)
+    affine[:, 1, 0] = scale * sin
+    affine[:, 1, 1] = scale * (sin * shear + cos)
+
+    corners = np.array([[0, 0], [w, 0], [w, h], [0, h]], np.float64)
+    center = np.array([w / 2, h / 2])
+    # onde os cantos da caixa vão parar na amostra
+    dst = (corners - center) @ affine.transpose(0, 2, 1) + center + shift[:, None] + persp
+    src = corners + (mx, my)
+
+    # resolve as n homografias dst → src de uma vez (sistemas 8×8 em lote)
+    a = np.zeros((n, 8, 8))
+    b = np.empty((n, 8))
+    for i in range(4):
+        u, v = dst[:, i, 0], dst[:, i, 1]
+        X, Y = src[i]
+        a[:, 2 * i, 0:3] = np.stack([u, v, np.ones(n)], 1)
+        a[:, 2 * i, 6:8] = np.stack([-u * X, -v * X], 1)
+        a[:, 2 * i + 1, 3:6] = np.stack([u, v, np.ones(n)], 1)
+        a[:, 2 * i + 1, 6:8] = np.stack([-u * Y, -v * Y], 1)
+        b[:, 2 * i], b[:, 2 * i + 1] = X, Y
+    hom = np.linalg.solve(a, b[..., None])[..., 0]
+    return np.concatenate([hom, np.ones((n, 1))], 1).reshape(n, 3, 3)
+
+
+def warp_batch(src: np.ndarray, hom: np.ndarray, w: int, h: int):
+    """
+    Amostragem bilinear de `src` pelas n homografias, toda vetorizada.
+    :return: (imagens (n, h, w) float32, coordenadas x e y na origem)
+    """
+    ys, xs = np.mgrid[0:h, 0:w]
+    grid = np.stack([xs.ravel(), ys.ravel(), np.ones(h * w)]).astype(np.float64)
+    mapped = hom @ grid
+    sx = (mapped[:, 0] / mapped[:, 2]).reshape(-1, h, w)
+    sy = (mapped[:, 1] / mapped[:, 2]).reshape(-1, h, w)
+
+    sh, sw = src.shape
+    cx = np.clip(sx, 0, sw - 1)
+    cy = np.clip(sy, 0, sh - 1)   # fora do recorte: borda replicada
+    x0 = np.minimum(cx.astype(np.intp), sw - 2)
+    y0 = np.minimum(cy.astype(np.intp), sh - 2)
+    fx, fy = cx - x0, cy - y0
+    img = src.astype(np.float32)
+    top = img[y0, x0] * (1 - fx) + img[y0, x0 + 1] * fx
+    bottom = img[y0 + 1, x0] * (1 - fx) + img[y0 + 1, x0 + 1] * fx
+    return (top * (1 - fy) + bottom * fy).astype(np.float32), sx, sy
+
+
+def gaussian_blur_batch(images: np.ndarray, sigmas: np.ndarray, max_sigma: float) -> np.ndarray:
+    """Desfoque gaussiano separável com um sigma por imagem (sigma 0 = intacta)."""
+    radius = max(1, math.ceil(3 * max_sigma))
+    taps = np.arange(-radius, radius + 1)
+    safe = np.where(sigmas > 0, sigmas, 1.0)[:, None]
+    kernels = np.exp(-0.5 * (taps / safe) ** 2)
+    kernels[sigmas <= 0] = (taps == 0)
+    kernels /= kernels.sum(1, keepdims=True)
+
+    pad = np.pad(images, ((0, 0), (0, 0), (radius, radius)), mode="edge")
+    out = np.einsum("nhwk,nk->nhw", sliding_window_view(pad, len(taps), axis=2), kernels)
+    pad = np.pad(out, ((0, 0), (radius, radius), (0, 0)), mode="edge")
+    return np.einsum("nhwk,nk->nhw", sliding_window_view(pad, len(taps), axis=1), kernels)
+
+
+def _negative(index: int):
+    img = _neg_cache.get(index)
+    if img is None:
+        img = cv2.imread(_negatives[index], cv2.IMREAD_REDUCED_GRAYSCALE_2)
+        if len(_neg_cache) >= _NEG_CACHE_SIZE:
+            _neg_cache.pop(next(iter(_neg_cache)))
+        _neg_cache[index] = img
+    return img
+
+
+def background_patches(rng, n: int, w: int, h: int, pool: int = 2) -> np.ndarray:
+    """
+    n recortes w×h de negativos aleatórios (None se não houver negativos).
+    Os recortes saem de `pool` negativos sorteados por chamada: decodificar
+    uma imagem por variação custaria mais que todo o resto do aumento.
+    """
+    if not _negatives:
+        return None
+    images = [_negative(int(i)) for i in rng.integers(0, len(_negatives), min(pool, len(_negatives)))]
+    images = [img for img in images if img is not None]
+    if not images:
+        return None
+    picks = rng.integers(0, len(images), n)
+    sizes = rng.uniform(1.0, 4.0, n)
+    corners = rng.random((n, 2))
+    out = np.empty((n, h, w), np.float32)
+    for k in range(n):
+        neg = images[picks[k]]
+        nh, nw = neg.shape
+        pw, ph = min(nw, round(w * sizes[k])), min(nh, round(h * sizes[k]))
+        x, y = int(corners[k, 0] * (nw - pw)), int(corners[k, 1] * (nh - ph))
+        out[k] = cv2.resize(neg[y:y + ph, x:x + pw], (w, h), interpolation=cv2.INTER_AREA)
+    return out
+
+
+def augment_box(gray: np.ndarray, box, w: int, h: int, n: int, rng, p: dict = None) -> np.ndarray:
+    """
+    Gera n variações w×h de uma caixa anotada de uma vez: deformação
+    afim/perspectiva, troca de fundo por negativo, brilho/contraste,
+    desfoque e ruído.
+    :return: (n, h, w) uint8
+    """
+    p = p or AUGMENT_PARAMS
+    mx, my = round(w * p["margin"]), round(h * p["margin"])
+    src = context_crop(gray, box, w, h, p["margin"])
+    images, sx, sy = warp_batch(src, random_homographies(rng, n, w, h, mx, my, p), w, h)
+
+    # fundo: tudo que cai fora da caixa original vem de um negativo
+    swap = rng.random(n) < p["background_prob"]
+    if swap.any():
+        bg = background_patches(rng, int(swap.sum()), w, h)
+        if bg is not None:
+            outside = (sx[swap] < mx) | (sx[swap] > mx + w - 1) | (sy[swap] < my) | (sy[swap] > my + h - 1)
+            images[swap] = np.where(outside, bg, images[swap])
+
+    contrast = rng.uniform(1 - p["contrast"], 1 + p["contrast"], n)[:, None, None]
+    brightness = rng.uniform(-p["brightness"], p["brightness"], n)[:, None, None]
+    mean = images.mean((1, 2), keepdims=True)
+    images = (images - mean) * contrast + mean + brightness
+
+    sigmas = np.where(rng.random(n) < p["blur_prob"], rng.uniform(0.3, p["max_blur"], n), 0.0)
+    if p["max_blur"] > 0 and (sigmas > 0).any():
+        images = gaussian_blur_batch(images, sigmas, p["max_blur"])
+
+    noise = rng.uniform(0, p["noise"], n)[:, None, None]
+    images = images + rng.standard_normal(images.shape) * noise
+    return np.clip(np.rint(images), 0, 255).astype(np.uint8)
+
+
+def augment_image(img_path: str, boxes, w: int, h: int, per_box: int, seed, p: dict = None) -> np.ndarray:
+    """
+    Variações de todas as caixas de uma imagem (RNG semeado por imagem).
+    Caixas bem maiores que a amostra permitem decodificar já reduzido.
+    """
+    boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+    boxes = boxes[(boxes[:, 2] > 1) & (boxes[:, 3] > 1)]
+    if not per_box or not len(boxes):
+        return np.empty((0, h, w), np.uint8)
+    factor = decode_factor(boxes, w, h)
+    gray = cv2.imread(img_path, REDUCED_GRAYSCALE.get(factor, cv2.IMREAD_GRAYSCALE))
+    if gray is None:
+        return np.empty((0, h, w), np.uint8)
+    rng = np.random.default_rng(seed)
+    out = [augment_box(gray, box / factor, w, h, per_box, rng, p) for box in boxes]
+    return np.concatenate(out) if out else np.empty((0, h, w), np.uint8)
+
+
+def _init_worker(negatives: list):
+    global _negatives
+    cv2.setNumThreads(1)
+    _negatives = list(negatives)
+    _neg_cache.clear()
+
+
+def _augment_task(args):
+    return augment_image(*args)
+
+
+def augment_to_vec(path: str, positives: list, w: int, h: int, per_box: int = None,
+                   negatives: list = None, seed: int = None, workers: int = None,
+                   append: bool = True, params: dict = None) -> int:
+    """
+    Gera as variações em paralelo e grava em streaming no .vec (na ordem das
+    imagens: mesmo seed → mesmo arquivo, com qualquer nº de workers).
+    :param positives: lista de (caminho da imagem, caixas) — ver read_positives_txt
+    :param negatives: imagens usadas como fundo (sem elas, só o contexto original)
+    :return: total de amostras no arquivo
+    """
+    p = {**AUGMENT_PARAMS, **(params or {})}
+    per_box = p["per_box"] if per_box is None else per_box
+    seed = p["seed"] if seed is None else seed
+    workers = workers or p["workers"] or None
+
+    writer = VecWriter(path, w, h, append=append)
+    before = writer.count
+    tasks = [(img, boxes, w, h, per_box, (seed, i), p) for i, (img, boxes) in enumerate(positives)]
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(sorted(negatives or []),)) as pool:
+        for samples in pool.map(_augment_task, tasks, chunksize=4):
+            writer.write(samples)
+
+    added = writer.count - before
+    elapsed = time.perf_counter() - t0
+    logger.info(f"{added} amostras aumentadas em {elapsed:.1f} s "
+                f"({added / max(elapsed, 1e-9):.0f}/s) → {path}")
+    return writer.count
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from app.utils.annotation_utils import read_positives_txt
+    from app.utils.file_utils import list_images
+    from app.config.settings import MODEL_DIR, NEGATIVE_PATH, TRAINING_PARAMS
+
+    # python -m app.core.augment [variações por caixa] (padrão: AUGMENT_PARAMS["per_box"])
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else AUGMENT_PARAMS["per_box"]
+    if not n:
+        logger.error("Aumento desligado (per_box = 0): informe as variações por caixa, ex.: 10")
+    else:
+        augment_to_vec(os.path.join(MODEL_DIR, "augmented.vec"), read_positives_txt(),
+                       TRAINING_PARAMS["width"], TRAINING_PARAMS["height"], per_box=n,
+                       negatives=list_images(NEGATIVE_PATH), append=False)
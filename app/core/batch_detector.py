@@ -0,0 +1,94 @@
+# app/core/batch_detector.py
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+import cv2
+
+from app.services.logger import get_logger
+from app.services.metrics import METRICS
+from app.core.detector import load_detector, process_image
+from app.config.settings import (
+    CASCADE_XML_PATH,
+    RESULTS_DETECTED_PATH,
+    RESULTS_NOT_DETECTED_PATH,
+    BATCH_PARAMS,
+)
+
+logger = get_logger(__name__)
+
+# Detector do processo worker — carregado uma única vez no initializer
+_detector = None
+
+
+def _init_worker(cascade_path: str):
+    global _detector
+    # Um thread do OpenCV por processo: o paralelismo vem do pool
+    cv2.setNumThreads(1)
+    _detector = load_detector(cascade_path)
+
+
+def _process_chunk(paths: List[str], detected_dir: str, not_detected_dir: str, render: bool):
+    """Processa um chunk; devolve também as métricas do worker (zeradas a cada chunk)."""
+    if _detector is None:
+        return [None] * len(paths), None
+    results = [process_image(_detector, p, detected_dir, not_detected_dir, render) for p in paths]
+    snapshot = METRICS.snapshot()
+    METRICS.reset()
+    return results, snapshot
+
+
+def _collect(future) -> list:
+    results, snapshot = future.result()
+    if snapshot:
+        METRICS.merge(snapshot)
+    return results
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    """Divide um iterável em listas de até `size` elementos."""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_batch_detection(image_paths: Iterable[str],
+                         workers: int = None,
+                         chunk_size: int = None,
+                         max_pending: int = None,
+                         cascade_path: str = CASCADE_XML_PATH,
+                         detected_dir: str = RESULTS_DETECTED_PATH,
+                         not_detected_dir: str = RESULTS_NOT_DETECTED_PATH,
+                         render: bool = None) -> Iterator[dict]:
+    """
+    Detecta em paralelo, gerando os resultados na mesma ordem de `image_paths`.
+    No máximo `max_pending` chunks ficam em voo: a leitura dos caminhos
+    só avança quando o chunk mais antigo termina (backpressure).
+    As métricas dos workers são somadas ao METRICS deste processo.
+    """
+    workers = workers or BATCH_PARAMS["workers"] or os.cpu_count() or 1
+    chunk_size = chunk_size or BATCH_PARAMS["chunk_size"]
+    max_pending = max_pending or BATCH_PARAMS["max_pending"] or 2 * workers
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(cascade_path,)) as pool:
+        pending = deque()
+        for chunk in chunked(image_paths, chunk_size):
+            pending.append(pool.submit(_process_chunk, chunk, detected_dir, not_detected_dir, render))
+            if len(pending) >= max_pending:
+                yield from _collect(pending.popleft())
+
+        while pending:
+            yield from _collect(pending.popleft())
+
+
+def run_batch_detection(image_paths: Iterable[str], **kwargs) -> list:
+    """Versão em lista de iter_batch_detection (ordem determinística)."""
+    return list(iter_batch_detection(image_paths, **kwargs))
@@ -0,0 +1,348 @@
+# app/core/benchmark.py
+
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+from app.core.detector import load_detector
+from app.core.batch_detector import run_batch_detection
+from app.core.nms import nms
+from app.core.trainer import build_positives_txt
+from app.core.vec_file import VecReader, VecWriter
+from app.utils.file_utils import list_images
+from app.config.settings import CASCADE_XML_PATH, BENCHMARK_PATH, BENCHMARK_PARAMS, BASE_DIR
+
+logger = get_logger(__name__)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ── cargas de trabalho ──────────────────────────────────── #
+def synthetic_image(width: int, height: int, rng, books: int = 3):
+    """
+    Cena sintética reprodutível: fundo texturizado + retângulos listrados
+    imitando lombadas de livros.
+    :return: (imagem BGR uint8, caixas int32 (N, 4))
+    """
+    noise = rng.integers(0, 256, (max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+    img = cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    boxes = []
+    for _ in range(books):
+        bw = int(rng.integers(width // 12, width // 5))
+        bh = int(rng.integers(height // 4, height // 2))
+        x = int(rng.integers(0, width - bw))
+        y = int(rng.integers(0, height - bh))
+        color = rng.integers(0, 256, 3).tolist()
+        cv2.rectangle(img, (x, y), (x + bw, y + bh), color, -1)
+        for sy in range(y + bh // 6, y + bh, max(4, bh // 6)):
+            cv2.line(img, (x, sy), (x + bw, sy), (255 - color[0], 255 - color[1], 255 - color[2]), 2)
+        boxes.append((x, y, bw, bh))
+    return img, np.asarray(boxes, np.int32).reshape(-1, 4)
+
+
+def synthetic_dataset(out_dir: str, count: int, resolution, seed: int = 0):
+    """
+    Grava `count` imagens sintéticas com anotação no formato do projeto.
+    :return: (pasta de imagens, pasta de anotações)
+    """
+    images_dir = os.path.join(out_dir, "images")
+    ann_dir = os.path.join(out_dir, "annotations")
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(ann_dir, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        img, boxes = synthetic_image(*resolution, rng)
+        name = f"synth_{i:04d}"
+        cv2.imwrite(os.path.join(images_dir, f"{name}.jpg"), img)
+        values = [len(boxes), *boxes.ravel().tolist()]
+        with open(os.path.join(ann_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(" ".join(map(str, values)))
+    return images_dir, ann_dir
+
+
+def _workload(cfg: dict, resolution):
+    """Imagens gravadas (cfg["images_dir"]) ou sintéticas, já decodificadas em cinza."""
+    if cfg.get("images_dir"):
+        paths = list_images(cfg["images_dir"])[:cfg["images"]]
+        return [g for g in (cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in paths) if g is not None]
+    rng = np.random.default_rng(cfg["seed"])
+    return [cv2.cvtColor(synthetic_image(*resolution, rng)[0], cv2.COLOR_BGR2GRAY)
+            for _ in range(cfg["images"])]
+
+
+# ── medição ─────────────────────────────────────────────── #
+def peak_rss_mb():
+    """
+    Pico de memória residente do processo ou do maior filho já encerrado
+    (workers do pool). None onde não há `resource`.
+    """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux informa em KiB; macOS em bytes
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def _stats(name: str, latencies: list, items: int, wall: float, **extra) -> dict:
+    """
+    Vazão e percentis por item. Sem latências por item (casos medidos só pelo
+    tempo total), p50/p99 ficam None e o caso é comparado apenas pela vazão.
+    """
+    lat = np.asarray(latencies) * 1000
+    return {
+        "name": name,
+        "items": items,
+        "wall_s": round(wall, 4),
+        "throughput": round(items / wall, 2) if wall else 0.0,
+        "p50_ms": round(float(np.percentile(lat, 50)), 3) if lat.size else None,
+        "p99_ms": round(float(np.percentile(lat, 99)), 3) if lat.size else None,
+        **extra,
+    }
+
+
+def _timed(fn, items, repeats: int) -> tuple:
+    """Roda fn(item) `repeats` vezes sobre os itens (1 rodada de aquecimento)."""
+    for item in items[:1]:
+        fn(item)
+    latencies = []
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            t = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - t0
+
+
+# ── casos ───────────────────────────────────────────────── #
+def bench_detect(cfg: dict) -> list:
+    """Detector.detect por resolução (uma imagem por chamada)."""
+    detector = load_detector(cfg["cascade_path"])
+    if detector is None:
+        return []
+    out = []
+    for res in cfg["resolutions"]:
+        grays = _workload(cfg, res)
+        latencies, wall = _timed(detector.detect, grays, cfg["repeats"])
+        label = "recorded" if cfg.get("images_dir") else f"{res[0]}x{res[1]}"
+        out.append(_stats(f"detect[{label}]", latencies, len(latencies), wall))
+        if cfg.get("images_dir"):
+            break
+    return out
+
+
+def bench_batch(cfg: dict) -> list:
+    """
+    Detecção em lote com pool de processos, incluindo a leitura das imagens.
+    Só a vazão é reportada: poucas rodadas do lote inteiro não dão percentis úteis.
+    """
+    if not os.path.exists(cfg["cascade_path"]):
+        return []
+    with tempfile.TemporaryDirectory() as tmp:
+        if cfg.get("images_dir"):
+            images = list_images(cfg["images_dir"])[:cfg["images"]]
+        else:
+            images_dir, _ = synthetic_dataset(tmp, cfg["images"], cfg["resolutions"][0], cfg["seed"])
+            images = list_images(images_dir)
+        t0 = time.perf_counter()
+        for _ in range(cfg["repeats"]):
+            run_batch_detection(images, workers=cfg["workers"], cascade_path=cfg["cascade_path"],
+                                detected_dir=tmp, not_detected_dir=tmp)
+        wall = time.perf_counter() - t0
+    return [_stats("batch_detect", [], len(images) * cfg["repeats"], wall)]
+
+
+def bench_nms(cfg: dict) -> list:
+    """NMS sobre conjuntos de caixas aleatórias sobrepostas."""
+    rng = np.random.default_rng(cfg["seed"])
+    sets = []
+    for _ in range(cfg["images"]):
+        n = cfg["nms_boxes"]
+        xy = rng.integers(0, 1000, (n, 2))
+        wh = rng.integers(40, 200, (n, 2))
+        sets.append((np.hstack([xy, wh]).astype(np.int32), rng.random(n).astype(np.float32)))
+    latencies, wall = _timed(lambda s: nms(s[0], s[1], 0.3), sets, cfg["repeats"])
+    return [_stats(f"nms[{cfg['nms_boxes']}]", latencies, len(latencies), wall)]
+
+
+def bench_positives(cfg: dict) -> list:
+    """build_positives_txt sobre o dataset sintético, com cache frio e quente (só vazão)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        images_dir, ann_dir = synthetic_dataset(tmp, cfg["images"], cfg["resolutions"][0], cfg["seed"])
+        cache_path = os.path.join(tmp, "index.json")
+        out = []
+        for label in ("cold", "warm"):
+            if label == "cold" and os.path.exists(cache_path):
+                os.remove(cache_path)
+            t0 = time.perf_counter()
+            build_positives_txt(ann_dir, images_dir, cache_path=cache_path)
+            wall = time.perf_counter() - t0
+            out.append(_stats(f"positives_txt[{label}]", [], cfg["images"], wall))
+    return out
+
+
+def bench_vec(cfg: dict) -> list:
+    """Escrita, leitura sequencial e hash/dedup de um .vec em memmap."""
+    w = h = 24
+    n = cfg["vec_samples"]
+    samples = np.random.default_rng(cfg["seed"]).integers(0, 256, (n, h, w), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.vec")
+
+        t0 = time.perf_counter()
+        writer = VecWriter(path, w, h)
+        for start in range(0, n, 1024):
+            writer.write(samples[start:start + 1024])
+        write_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reader = VecReader(path)
+        total = sum(int(block.sum()) for _, block in reader.iter_chunks())
+        read_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reader.unique_indices()
+        dedup_s = time.perf_counter() - t0
+        del reader
+
+    return [_stats("vec_write", [write_s], n, write_s),
+            _stats("vec_read", [read_s], n, read_s, checksum=total),
+            _stats("vec_dedup", [dedup_s], n, dedup_s)]
+
+
+CASES = {
+    "detect": bench_detect,
+    "batch": bench_batch,
+    "nms": bench_nms,
+    "positives": bench_positives,
+    "vec": bench_vec,
+}
+
+
+def _run_case(name: str, cfg: dict) -> list:
+    rows = CASES[name](cfg)
+    rss = peak_rss_mb()
+    for row in rows:
+        row["peak_rss_mb"] = rss
+    return rows
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(cases=None, isolate: bool = True, **overrides) -> dict:
+    """
+    Executa os casos escolhidos (todos por padrão). Com isolate=True cada caso
+    roda em um processo novo, para que o pico de RSS seja só dele.
+    :return: relatório com commit, parâmetros e uma linha por medição
+    """
+    cfg = {**BENCHMARK_PARAMS, "cascade_path": CASCADE_XML_PATH, **overrides}
+    cases = list(cases or CASES)
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise ValueError(f"casos desconhecidos: {sorted(unknown)}")
+    if not os.path.exists(cfg["cascade_path"]):
+        logger.warning(f"Cascade não encontrado ({cfg['cascade_path']}): casos de detecção pulados")
+
+    results = []
+    for name in cases:
+        logger.info(f"Benchmark '{name}'…")
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results.extend(pool.submit(_run_case, name, cfg).result())
+        else:
+            results.extend(_run_case(name, cfg))
+
+    for r in results:
+        pct = (f"p50={r['p50_ms']:.2f} ms  p99={r['p99_ms']:.2f} ms  "
+               if r["p99_ms"] is not None else "")
+        logger.info(f"{r['name']:28s} {r['throughput']:10.1f} itens/s  {pct}"
+                    f"rss={r['peak_rss_mb']} MB")
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "params": {k: v for k, v in cfg.items() if k != "images_dir"},
+        "results": results,
+    }
+
+
+# ── baselines ───────────────────────────────────────────── #
+def baseline_path(label: str = "baseline") -> str:
+    return os.path.join(BENCHMARK_PATH, f"{label}.json")
+
+
+def save_baseline(report: dict, label: str = "baseline") -> str:
+    os.makedirs(BENCHMARK_PATH, exist_ok=True)
+    path = baseline_path(label)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    logger.info(f"Baseline salvo em {path}")
+    return path
+
+
+def load_baseline(label: str = "baseline"):
+    path = baseline_path(label)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(report: dict, baseline: dict, tolerance: float = None) -> list:
+    """
+    Compara com o baseline medição a medição.
+    Regressão = vazão caiu ou p99 subiu mais que `tolerance` (fração);
+    casos sem percentis (p99 None) são comparados só pela vazão.
+    :return: lista de regressões (vazia se está tudo dentro da tolerância)
+    """
+    tolerance = BENCHMARK_PARAMS["tolerance"] if tolerance is None else tolerance
+    before = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    for row in report["results"]:
+        old = before.get(row["name"])
+        if not old:
+            continue
+        checks = [("throughput", old["throughput"], row["throughput"],
+                   old["throughput"] and row["throughput"] < old["throughput"] * (1 - tolerance)),
+                  ("p99_ms", old["p99_ms"], row["p99_ms"],
+                   bool(old.get("p99_ms") and row.get("p99_ms"))
+                   and row["p99_ms"] > old["p99_ms"] * (1 + tolerance))]
+        for metric, was, now, worse in checks:
+            if worse:
+                regressions.append({"name": row["name"], "metric": metric, "baseline": was, "current": now})
+                logger.warning(f"Regressão em {row['name']}: {metric} {was} → {now} "
+                               f"(baseline {baseline.get('commit')})")
+    if not regressions:
+        logger.info(f"Sem regressões além de {tolerance:.0%} em relação a {baseline.get('commit')}")
+    return regressions
+
+
+if __name__ == "__main__":
+    report = run_benchmarks()
+    baseline = load_baseline()
+    if baseline:
+        compare(report, baseline)
+    else:
+        save_baseline(report)
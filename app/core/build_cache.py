@@ -0,0 +1,68 @@
+# app/core/build_cache.py
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.dataset_index import load_cache, save_cache
+from app.services.logger import get_logger
+from app.utils.file_utils import file_sha256
+from app.config.settings import CACHE_DIR
+
+logger = get_logger(__name__)
+
+STATE_PATH = os.path.join(CACHE_DIR, "build_state.json")
+HASHES_PATH = os.path.join(CACHE_DIR, "file_hashes.json")
+
+
+class BuildCache:
+    """
+    Estado do grafo de build do treino. Cada etapa guarda a chave (hash do
+    conteúdo das entradas + parâmetros) com que foi gerada; se a chave e as
+    saídas continuam iguais, a etapa é pulada.
+    """
+
+    def __init__(self, state_path: str = STATE_PATH, hashes_path: str = HASHES_PATH):
+        self.state_path = state_path
+        self.hashes_path = hashes_path
+        self.state = load_cache(state_path)
+        # hash de conteúdo por arquivo, reaproveitado enquanto mtime/tamanho não mudam
+        self._hashes = load_cache(hashes_path)
+
+    def file_digest(self, path: str) -> str:
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = self._hashes.get(path)
+        if entry and entry["stamp"] == stamp:
+            return entry["sha256"]
+
+        digest = file_sha256(path)
+        self._hashes[path] = {"stamp": stamp, "sha256": digest}
+        return digest
+
+    def files_key(self, paths, workers: int = None) -> str:
+        """Hash combinado do conteúdo de vários arquivos (ordem irrelevante)."""
+        paths = sorted(paths)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = list(pool.map(self.file_digest, paths))
+        save_cache(self.hashes_path, self._hashes)
+        return self.digest([(os.path.basename(p), d) for p, d in zip(paths, digests)])
+
+    @staticmethod
+    def digest(*parts) -> str:
+        """Hash estável de valores serializáveis em JSON (dicts com chaves ordenadas)."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_fresh(self, stage: str, key: str, outputs=()) -> bool:
+        entry = self.state.get(stage)
+        return bool(entry) and entry["key"] == key and all(os.path.exists(o) for o in outputs)
+
+    def get(self, stage: str, field: str = "key"):
+        return self.state.get(stage, {}).get(field)
+
+    def mark(self, stage: str, key: str, **meta):
+        """Registra a etapa como concluída e persiste o estado imediatamente."""
+        self.state[stage] = {"key": key, **meta}
+        save_cache(self.state_path, self.state)
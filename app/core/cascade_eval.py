@@ -0,0 +1,395 @@
+# app/core/cascade_eval.py
+
+import os
+import xml.etree.ElementTree as ET
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+from app.services.metrics import METRICS
+from app.config.settings import CASCADE_XML_PATH, DETECTION_PARAMS, METRICS_PARAMS
+
+logger = get_logger(__name__)
+
+# Janelas avaliadas por bloco (limita a memória dos gathers)
+CHUNK = 4096
+
+
+def integral_images(gray: np.ndarray):
+    """
+    Imagens integrais (soma, soma dos quadrados e rotacionada a 45°),
+    no mesmo layout (H+1, W+1) de cv2.integral3.
+    """
+    img = gray.astype(np.int64)
+    h, w = img.shape
+    ii = np.zeros((h + 1, w + 1), np.int64)
+    ii[1:, 1:] = img.cumsum(0).cumsum(1)
+    sq = np.zeros((h + 1, w + 1), np.float64)
+    sq[1:, 1:] = (img.astype(np.float64) ** 2).cumsum(0).cumsum(1)
+
+    # T(X,Y) = T(X-1,Y-1) + T(X+1,Y-1) - T(X,Y-2) + I(X-1,Y-1) + I(X-1,Y-2),
+    # com margem de H+1 colunas para a recorrência não sofrer efeito de borda
+    pad = h + 1
+    src = np.zeros((h, w + 2 * pad), np.int64)
+    src[:, pad:pad + w] = img
+    tilted = np.zeros((h + 1, w + 2 * pad + 1), np.int64)
+    for y in range(1, h + 1):
+        row = tilted[y]
+        row[1:-1] = tilted[y - 1, :-2] + tilted[y - 1, 2:]
+        row[1:] += src[y - 1]
+        if y >= 2:
+            row -= tilted[y - 2]
+            row[1:] += src[y - 2]
+    return ii, sq, np.ascontiguousarray(tilted[:, pad:pad + w + 1])
+
+
+class HaarCascade:
+    """
+    Cascade Haar (formato do opencv_traincascade) em tabelas NumPy:
+    features (retângulos, pesos, tilted), nós das árvores fracas e
+    limiares por estágio. Avalia todas as janelas de uma escala de uma vez,
+    descartando as rejeitadas a cada estágio.
+    """
+
+    def __init__(self, width, height, rects, weights, tilted, stages):
+        self.width, self.height = width, height
+        self.rects = rects          # (F, 3, 4) int32: x, y, w, h
+        self.weights = weights      # (F, 3) float32 (0 = retângulo ausente)
+        self.tilted = tilted        # (F,) bool
+        self.stages = stages        # lista de dicts com arrays por estágio
+        self._offset_cache = {}
+
+    # ───────────────────────── leitura ───────────────────────── #
+    @classmethod
+    def from_xml(cls, path: str = CASCADE_XML_PATH) -> "HaarCascade":
+        root = ET.parse(path).getroot()
+        node = root.find("cascade")
+        if node is None or node.findtext("featureType", "").strip().upper() != "HAAR":
+            raise ValueError(f"Apenas cascades HAAR no formato novo são suportados: {path}")
+
+        feats = node.find("features")
+        n_feat = len(feats)
+        rects = np.zeros((n_feat, 3, 4), np.int32)
+        weights = np.zeros((n_feat, 3), np.float32)
+        tilted = np.zeros(n_feat, bool)
+        for i, feat in enumerate(feats):
+            for j, r in enumerate(feat.find("rects")):
+                vals = r.text.split()
+                rects[i, j] = [int(float(v)) for v in vals[:4]]
+                weights[i, j] = float(vals[4])
+            tilted[i] = int(feat.findtext("tilted", "0").strip() or 0) != 0
+
+        stages = []
+        for st in node.find("stages"):
+            nodes, leaves, weak_nodes, weak_leaves = [], [], [], []
+            for weak in st.find("weakClassifiers"):
+                vals = weak.findtext("internalNodes").split()
+                weak_nodes.append(len(nodes))
+                weak_leaves.append(len(leaves))
+                for k in range(0, len(vals), 4):
+                    left, right, feat = (int(v) for v in vals[k:k + 3])
+                    nodes.append((left, right, feat, float(vals[k + 3])))
+                leaves.extend(float(v) for v in weak.findtext("leafValues").split())
+
+            nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 4)
+            stages.append({
+                "threshold": float(st.findtext("stageThreshold")),
+                "left": nodes[:, 0].astype(np.int32),
+                "right": nodes[:, 1].astype(np.int32),
+                "feature": nodes[:, 2].astype(np.int32),
+                "node_threshold": nodes[:, 3].astype(np.float32),
+                "leaves": np.asarray(leaves, np.float32),
+                "weak_nodes": np.asarray(weak_nodes, np.int32),
+                "weak_leaves": np.asarray(weak_leaves, np.int32),
+                # todos os fracos são stumps (1 nó): caminho rápido sem laço de árvore
+                "stumps": len(nodes) == len(weak_nodes),
+            })
+
+        return cls(int(node.findtext("width")), int(node.findtext("height")),
+                   rects, weights, tilted, stages)
+
+    def truncated(self, n_stages: int) -> "HaarCascade":
+        """Cópia com apenas os primeiros `n_stages` estágios (poda)."""
+        return HaarCascade(self.width, self.height, self.rects, self.weights,
+                           self.tilted, self.stages[:n_stages])
+
+    # ───────────────────────── avaliação ───────────────────────── #
+    def _offsets(self, step: int):
+        """Deslocamentos dos 4 cantos de cada retângulo para uma largura de integral."""
+        if step not in self._offset_cache:
+            x, y, w, h = (self.rects[..., k].astype(np.int64) for k in range(4))
+            straight = np.stack([y * step + x, y * step + x + w,
+                                 (y + h) * step + x, (y + h) * step + x + w], -1)
+            rotated = np.stack([y * step + x, (y + h) * step + x - h,
+                                (y + w) * step + x + w, (y + w + h) * step + x + w - h], -1)
+            offs = np.where(self.tilted[:, None, None], rotated, straight)
+
+            # retângulo de normalização: janela sem a borda de 1 px
+            nx, ny, nw, nh = 1, 1, self.width - 2, self.height - 2
+            norm = np.array([ny * step + nx, ny * step + nx + nw,
+                             (ny + nh) * step + nx, (ny + nh) * step + nx + nw], np.int64)
+            self._offset_cache[step] = (offs, norm)
+        return self._offset_cache[step]
+
+    def _features(self, flat_ii, flat_tilted, origins, feats, offs, inv_nf):
+        """Valores normalizados das features `feats` para cada janela: (A, n)."""
+        corners = origins[:, None, None, None] + offs[feats][None]
+        tilted = self.tilted[feats]
+        sums = np.empty(corners.shape[:3], np.float64)
+        if (~tilted).any():
+            c = flat_ii[corners[:, ~tilted]]
+            sums[:, ~tilted] = c[..., 0] - c[..., 1] - c[..., 2] + c[..., 3]
+        if tilted.any():
+            c = flat_tilted[corners[:, tilted]]
+            sums[:, tilted] = c[..., 0] - c[..., 1] - c[..., 2] + c[..., 3]
+        return (sums * self.weights[feats][None]).sum(-1) * inv_nf[:, None]
+
+    def _stage_sum(self, stage, values):
+        """Soma das folhas das árvores fracas de um estágio: (A,)."""
+        thr = stage["node_threshold"]
+        if stage["stumps"]:
+            go_left = values < thr[None]
+            leaf = stage["weak_leaves"][None] + np.where(go_left, -stage["left"], -stage["right"])
+            return stage["leaves"][leaf].sum(1)
+
+        total = np.zeros(len(values), np.float64)
+        rows = np.arange(len(values))
+        for start, leaf0 in zip(stage["weak_nodes"], stage["weak_leaves"]):
+            idx = np.zeros(len(values), np.int32)           # nó local atual
+            done = np.zeros(len(values), bool)
+            while not done.all():
+                cur = start + idx
+                nxt = np.where(values[rows, cur] < thr[cur], stage["left"][cur], stage["right"][cur])
+                leaf = ~done & (nxt <= 0)
+                total[leaf] += stage["leaves"][leaf0 - nxt[leaf]]
+                done |= leaf
+                idx = np.where(done, idx, nxt)
+        return total
+
+    def evaluate(self, integrals, origins: np.ndarray, profile: "StageProfile" = None):
+        """
+        Avalia as janelas cujos cantos superiores esquerdos estão em `origins`
+        (índices planos na integral; para lotes, já deslocados por imagem).
+        :param integrals: (ii, sq, tilted) achatados com o mesmo passo de linha
+        :return: (máscara das janelas aceitas, último estágio atingido, soma do último estágio)
+        """
+        flat_ii, flat_sq, flat_tilted, step = integrals
+        offs, norm = self._offsets(step)
+        area = float((self.width - 2) * (self.height - 2))
+
+        n = len(origins)
+        reached = np.zeros(n, np.int32)
+        last_sum = np.zeros(n, np.float64)
+
+        # normalização por variância (mesma regra do OpenCV: rejeita janelas lisas)
+        s = flat_ii[origins + norm[0]] - flat_ii[origins + norm[1]] \
+            - flat_ii[origins + norm[2]] + flat_ii[origins + norm[3]]
+        q = flat_sq[origins + norm[0]] - flat_sq[origins + norm[1]] \
+            - flat_sq[origins + norm[2]] + flat_sq[origins + norm[3]]
+        nf = area * q - s.astype(np.float64) ** 2
+        valid = nf > 0
+        nf = np.sqrt(np.where(valid, nf, 1.0))
+        valid &= area / nf < 0.1
+        alive = np.flatnonzero(valid)
+        inv_nf = 1.0 / nf
+
+        for si, stage in enumerate(self.stages):
+            if profile is not None:
+                profile.add(si, len(alive))
+            if not len(alive):
+                break
+            sums = np.empty(len(alive), np.float64)
+            for a in range(0, len(alive), CHUNK):
+                idx = alive[a:a + CHUNK]
+                values = self._features(flat_ii, flat_tilted, origins[idx],
+                                        stage["feature"], offs, inv_nf[idx])
+                sums[a:a + CHUNK] = self._stage_sum(stage, values)
+            passed = sums >= stage["threshold"]
+            reached[alive] = si + 1
+            last_sum[alive] = sums
+            if profile is not None:
+                profile.reject(si, int((~passed).sum()))
+            alive = alive[passed]
+
+        accepted = np.zeros(n, bool)
+        accepted[alive] = True
+        return accepted, reached, last_sum
+
+
+class StageProfile:
+    """Janelas avaliadas e rejeitadas por estágio."""
+
+    def __init__(self, n_stages: int):
+        self.evaluated = np.zeros(n_stages, np.int64)
+        self.rejected = np.zeros(n_stages, np.int64)
+
+    def add(self, stage: int, count: int):
+        self.evaluated[stage] += count
+
+    def reject(self, stage: int, count: int):
+        self.rejected[stage] += count
+
+    def as_dict(self) -> list:
+        return [{"stage": i, "evaluated": int(e), "rejected": int(r),
+                 "rejection_rate": round(r / e, 4) if e else 0.0}
+                for i, (e, r) in enumerate(zip(self.evaluated, self.rejected))]
+
+
+def _window_origins(h: int, w: int, win_w: int, win_h: int, step: int, ystep: int, base: int = 0):
+    ys = np.arange(0, h - win_h + 1, ystep)
+    xs = np.arange(0, w - win_w + 1, ystep)
+    yy, xx = np.meshgrid(ys, xs, indexing="ij")
+    return base + (yy * step + xx).ravel(), xx.ravel(), yy.ravel()
+
+
+def detect_multiscale(cascade: HaarCascade, gray: np.ndarray, scale_factor: float = 1.1,
+                      min_size=None, max_size=None, profile: StageProfile = None):
+    """
+    Detecção multi-escala sem agrupamento (equivale a minNeighbors=0):
+    reduz a imagem a cada escala e avalia todas as janelas de uma vez.
+    :return: (caixas int32 (N, 4) em coordenadas originais, estágio atingido, soma final)
+    """
+    batch = detect_multiscale_batch(cascade, gray[None], scale_factor, min_size, max_size, profile)
+    return batch[0]
+
+
+def detect_multiscale_batch(cascade: HaarCascade, grays: np.ndarray, scale_factor: float = 1.1,
+                            min_size=None, max_size=None, profile: StageProfile = None) -> list:
+    """
+    Como detect_multiscale, para um lote (B, H, W) de imagens do mesmo tamanho:
+    as janelas de todas as imagens são avaliadas juntas em cada escala.
+    """
+    grays = np.asarray(grays)
+    b, h, w = grays.shape
+    win = (cascade.width, cascade.height)
+    min_size = min_size or win
+    max_size = max_size or (w, h)
+    out = [([], [], []) for _ in range(b)]
+
+    factor = 1.0
+    while True:
+        win_w, win_h = round(win[0] * factor), round(win[1] * factor)
+        if win_w > max_size[0] or win_h > max_size[1]:
+            break
+        sw, sh = round(w / factor), round(h / factor)
+        if sw < win[0] or sh < win[1]:
+            break
+        if win_w >= min_size[0] and win_h >= min_size[1]:
+            integrals = [integral_images(cv2.resize(g, (sw, sh), interpolation=cv2.INTER_LINEAR))
+                         for g in grays]
+            step = sw + 1
+            size = (sh + 1) * step
+            flat = (np.concatenate([i[0].ravel() for i in integrals]),
+                    np.concatenate([i[1].ravel() for i in integrals]),
+                    np.concatenate([i[2].ravel() for i in integrals]), step)
+
+            ystep = 1 if factor > 2 else 2
+            origins, xs, ys, owner = [], [], [], []
+            for k in range(b):
+                o, x, y = _window_origins(sh, sw, win[0], win[1], step, ystep, base=k * size)
+                origins.append(o), xs.append(x), ys.append(y), owner.append(np.full(len(o), k))
+            origins, xs, ys, owner = map(np.concatenate, (origins, xs, ys, owner))
+
+            accepted, reached, last_sum = cascade.evaluate(flat, origins, profile)
+            for k in range(b):
+                sel = accepted & (owner == k)
+                boxes = np.stack([np.round(xs[sel] * factor), np.round(ys[sel] * factor),
+                                  np.full(sel.sum(), win_w), np.full(sel.sum(), win_h)], 1)
+                out[k][0].append(boxes.astype(np.int32))
+                out[k][1].append(reached[sel])
+                out[k][2].append(last_sum[sel])
+        factor *= scale_factor
+
+    empty = (np.empty((0, 4), np.int32), np.empty(0, np.int32), np.empty(0, np.float64))
+    return [tuple(np.concatenate(parts) if parts else e for parts, e in zip(res, empty))
+            for res in out]
+
+
+def detect_multiscale_shared(cascades: dict, gray: np.ndarray, scale_factor: float = 1.1,
+                             min_size=None, max_size=None) -> dict:
+    """
+    Vários cascades (nome → HaarCascade) na mesma imagem numa só passada:
+    em cada escala a imagem reduzida e as integrais (a rotacionada é a mais
+    cara) são calculadas uma vez e avaliadas por todos os cascades cuja
+    janela cabe naquela escala.
+    :return: {nome: (caixas, estágio atingido, soma final)} como detect_multiscale
+    """
+    h, w = gray.shape
+    max_size = max_size or (w, h)
+    out = {name: ([], [], []) for name in cascades}
+
+    factor = 1.0
+    while True:
+        sw, sh = round(w / factor), round(h / factor)
+        active, alive = [], False
+        for name, cascade in cascades.items():
+            win = (cascade.width, cascade.height)
+            win_w, win_h = round(win[0] * factor), round(win[1] * factor)
+            if win_w > max_size[0] or win_h > max_size[1] or sw < win[0] or sh < win[1]:
+                continue  # janela não cabe mais: este cascade terminou
+            alive = True
+            low = min_size or win
+            if win_w >= low[0] and win_h >= low[1]:
+                active.append((name, cascade, win_w, win_h))
+        if not alive:
+            break
+
+        if active:
+            ii, sq, tilted = integral_images(cv2.resize(gray, (sw, sh), interpolation=cv2.INTER_LINEAR))
+            step = sw + 1
+            flat = (ii.ravel(), sq.ravel(), tilted.ravel(), step)
+            ystep = 1 if factor > 2 else 2
+            for name, cascade, win_w, win_h in active:
+                origins, xs, ys = _window_origins(sh, sw, cascade.width, cascade.height, step, ystep)
+                accepted, reached, last_sum = cascade.evaluate(flat, origins)
+                n = int(accepted.sum())
+                boxes = np.stack([np.round(xs[accepted] * factor), np.round(ys[accepted] * factor),
+                                  np.full(n, win_w), np.full(n, win_h)], 1)
+                out[name][0].append(boxes.astype(np.int32))
+                out[name][1].append(reached[accepted])
+                out[name][2].append(last_sum[accepted])
+        factor *= scale_factor
+
+    empty = (np.empty((0, 4), np.int32), np.empty(0, np.int32), np.empty(0, np.float64))
+    return {name: tuple(np.concatenate(parts) if parts else e for parts, e in zip(res, empty))
+            for name, res in out.items()}
+
+
+def profile_stages(image_paths, cascade_path: str = CASCADE_XML_PATH,
+                   size: int = None, scale_factor: float = None) -> list:
+    """
+    Conta janelas avaliadas/rejeitadas por estágio numa amostra de imagens
+    (o detectMultiScale do OpenCV não expõe esses números) e registra em METRICS.
+    """
+    cascade = HaarCascade.from_xml(cascade_path)
+    size = size or METRICS_PARAMS["stage_profile_size"]
+    scale_factor = scale_factor or DETECTION_PARAMS["scaleFactor"]
+    profile = StageProfile(len(cascade.stages))
+
+    for path in image_paths:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        scale = size / max(gray.shape)
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        with METRICS.timer("stage_profile"):
+            detect_multiscale(cascade, gray, scale_factor, profile=profile)
+
+    rows = profile.as_dict()
+    METRICS.set_stages(os.path.basename(cascade_path), rows)
+    for row in rows:
+        logger.info(f"estágio {row['stage']:2d}: avaliadas={row['evaluated']} "
+                    f"rejeitadas={row['rejected']} ({row['rejection_rate']:.1%})")
+    return rows
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.utils.annotation_utils import read_positives_txt
+
+    xml = sys.argv[1] if len(sys.argv) > 1 else CASCADE_XML_PATH
+    profile_stages([p for p, _ in read_positives_txt()[:10]], xml, scale_factor=1.2)
+    METRICS.log_summary()
@@ -0,0 +1,92 @@
+# app/core/detection_index.py
+
+import hashlib
+import os
+from typing import Iterator
+
+from app.services.dataset_index import load_cache, save_cache
+from app.services.results_store import to_record
+from app.services.logger import get_logger
+from app.utils.file_utils import file_sha256
+from app.config.settings import DETECTION_INDEX_PATH
+
+logger = get_logger(__name__)
+
+
+def cascade_key(cascade_path: str, params: dict) -> str:
+    """Identifica o modelo: conteúdo do XML + parâmetros de detecção."""
+    h = hashlib.sha256(file_sha256(cascade_path).encode())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+
+def shard_index_path(shard: tuple, path: str = None) -> str:
+    """Índice próprio do shard (i, n): detection_index.json → detection_index.{i}of{n}.json."""
+    root, ext = os.path.splitext(path or DETECTION_INDEX_PATH)
+    return f"{root}.{shard[0]}of{shard[1]}{ext}"
+
+
+def _stamp(path: str):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class DetectionIndex:
+    """
+    Índice (caminho → mtime, tamanho, sha256, resultado) da última detecção.
+    Só imagens novas ou alteradas voltam ao detector; se o cascade ou os
+    parâmetros mudarem, o índice inteiro é invalidado. Use um índice por
+    shard: a varredura remove do índice o que não viu.
+    """
+
+    def __init__(self, path: str = DETECTION_INDEX_PATH):
+        self.path = path
+        data = load_cache(path)
+        self.cascade = data.get("cascade")
+        self.entries = data.get("entries", {})
+
+    def use_cascade(self, key: str):
+        if key != self.cascade:
+            if self.entries:
+                logger.info("Cascade/parâmetros mudaram — todas as imagens serão reprocessadas")
+            self.cascade = key
+            self.entries = {}
+
+    def pending(self, paths) -> Iterator[str]:
+        """
+        Gera sob demanda só as imagens novas ou alteradas; os resultados
+        reaproveitados vão para `self.reused`. mtime/tamanho iguais bastam;
+        se mudaram, o hash do conteúdo decide. Ao fim da varredura, imagens
+        que sumiram saem do índice.
+        """
+        self.reused = []
+        seen = set()
+        for path in paths:
+            seen.add(path)
+            try:
+                stamp = _stamp(path)
+            except OSError:
+                continue
+            entry = self.entries.get(path)
+            if entry and (entry["stamp"] == stamp or file_sha256(path) == entry["sha256"]):
+                entry["stamp"] = stamp  # só o mtime mudou
+                self.reused.append(entry["result"])
+                continue
+            yield path
+
+        for path in [p for p in self.entries if p not in seen]:
+            del self.entries[path]
+
+    def split(self, paths):
+        """Versão em lista de pending: (pendentes, resultados reaproveitados)."""
+        pending = list(self.pending(paths))
+        return pending, self.reused
+
+    def update(self, result: dict):
+        """Registra o resultado de process_image (com sha256)."""
+        record = to_record(result)
+        self.entries[result["path"]] = {"stamp": _stamp(result["path"]),
+                                        "sha256": record["sha256"], "result": record}
+
+    def save(self):
+        save_cache(self.path, {"cascade": self.cascade, "entries": self.entries})
@@ -1,89 +1,392 @@
 # app/core/detector.py
 
+import hashlib
 import os
+import threading
+import time
+
 import cv2
+import numpy as np
+
+from app.core.multiscale import plan_search
+from app.core.nms import nms, cascade_scores
 from app.services.logger import get_logger
-from app.utils.file_utils import list_images, ensure_dir
+from app.services.metrics import METRICS
+from app.services.image_loader import read_bytes, decode_for_detection
+from app.services.results_store import open_store, read_results
+from app.core.detection_index import DetectionIndex, cascade_key, shard_index_path
+from app.core.model_registry import ModelRegistry
+from app.utils.file_utils import iter_images, ensure_dir
 from app.config.settings import (
     CASCADE_XML_PATH,
     RESULTS_DETECTED_PATH,
     RESULTS_NOT_DETECTED_PATH,
     DETECTION_PARAMS,
+    BATCH_PARAMS,
+    RESULTS_PARAMS,
+    METRICS_PARAMS,
+    METRICS_PATH,
     BASE_DIR,
 )
 
 logger = get_logger(__name__)
 
 
-def run_detection():
-    """Aplica o classificador Haar treinado em imagens da pasta test_images."""
-    if not os.path.exists(CASCADE_XML_PATH):
-        logger.error(f"Modelo Haar não encontrado: {CASCADE_XML_PATH}")
-        return
+_EMPTY = np.empty((0, 4), dtype=np.int32)
+_NO_SCORES = np.empty(0, dtype=np.float32)
+
+# Cache de classificadores por thread: {path: (mtime, CascadeClassifier)}.
+# O CascadeClassifier do OpenCV não é seguro para uso concorrente.
+_local = threading.local()
+
+
+def get_cascade(path: str = CASCADE_XML_PATH):
+    """
+    Retorna o classificador do cache, recarregando o XML só quando o mtime muda.
+    :raises FileNotFoundError: se o XML não existir
+    :raises RuntimeError: se o XML for inválido
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Modelo Haar não encontrado: {path}")
+
+    cache = getattr(_local, "cache", None)
+    if cache is None:
+        cache = _local.cache = {}
 
-    cascade = cv2.CascadeClassifier(CASCADE_XML_PATH)
+    mtime = os.path.getmtime(path)
+    entry = cache.get(path)
+    if entry and entry[0] == mtime:
+        return entry[1]
+
+    cascade = cv2.CascadeClassifier(path)
     if cascade.empty():
-        logger.error("Falha ao carregar cascade.xml.")
-        return
+        raise RuntimeError(f"Falha ao carregar cascade.xml: {path}")
+    cache[path] = (mtime, cascade)
+    return cascade
 
-    ensure_dir(RESULTS_DETECTED_PATH)
-    ensure_dir(RESULTS_NOT_DETECTED_PATH)
 
-    test_dir = os.path.join(BASE_DIR, "dataset", "test_images")
-    images = list_images(test_dir)
+def to_gray(image):
+    """Converte BGR para tons de cinza (imagens já em cinza passam direto)."""
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    if not images:
-        logger.warning("Nenhuma imagem em dataset/test_images.")
-        return
 
-    logger.info(f"Detectando em {len(images)} imagens…")
+class Detector:
+    """
+    Detector Haar reutilizável: valida o cascade uma vez e mantém o
+    classificador aquecido entre chamadas (cache por caminho + mtime).
+    Com `model`, o cascade vem da versão ativa no registro de modelos e
+    uma troca de versão vale a partir da detecção seguinte (hot-reload).
+    """
+
+    def __init__(self, cascade_path: str = CASCADE_XML_PATH, model: str = None,
+                 registry: ModelRegistry = None, **params):
+        self.model = model
+        self.registry = registry or (ModelRegistry() if model else None)
+        self._cascade_path = cascade_path
+        self.params = {**DETECTION_PARAMS, **params}
+        get_cascade(self.cascade_path)  # valida já na construção
+
+    @property
+    def cascade_path(self) -> str:
+        if self.model is None:
+            return self._cascade_path
+        return self.registry.active_path(self.model)
+
+    def plan(self, gray, prescale: float = 1.0):
+        """
+        Escala de trabalho e parâmetros efetivos da busca para esta imagem.
+        :return: (cascade, escala em relação à original, parâmetros)
+        """
+        cascade = get_cascade(self.cascade_path)
+        shape = (int(round(gray.shape[0] / prescale)), int(round(gray.shape[1] / prescale)))
+        scale, p = plan_search(shape, self.params, cascade.getOriginalWindowSize(),
+                               max_scale=prescale)
+        return cascade, scale, p
+
+    def detect_scored(self, gray, prescale: float = 1.0):
+        """
+        Detecta em uma imagem cinza com score por caixa.
+        :param prescale: resolução de `gray` em relação à imagem original
+                         (ex.: 0.25 quando decodificada com IMREAD_REDUCED_*_4)
+        :return: (boxes int32 (N, 4) em x, y, w, h na imagem original;
+                 scores float32 (N,)), ordenados do maior para o menor score
+        """
+        # Imagens grandes são reduzidas à resolução de trabalho antes da busca
+        cascade, scale, p = self.plan(gray, prescale)
+        return self.search(cascade, working_image(gray, scale / prescale), scale, p)
+
+    @staticmethod
+    def search(cascade, gray, scale: float, p: dict):
+        """Busca multi-escala em `gray` já na escala de trabalho `scale`."""
+        with METRICS.timer("detect"):
+            rects, levels, weights = cascade.detectMultiScale3(
+                gray,
+                scaleFactor=p["scaleFactor"],
+                minNeighbors=p["minNeighbors"],
+                minSize=p["minSize"],
+                maxSize=p.get("maxSize"),
+                flags=p["flags"],
+                outputRejectLevels=True,
+            )
+        if len(rects) == 0:
+            return _EMPTY, _NO_SCORES
+
+        rects = np.asarray(rects, dtype=np.int32).reshape(-1, 4)
+        if scale < 1.0:
+            # volta para coordenadas da imagem original
+            rects = np.round(rects / scale).astype(np.int32)
+        with METRICS.timer("nms"):
+            scores = cascade_scores(levels, weights)
+            # NMS + limite opcional de objetos (mantém os de maior score)
+            keep = nms(rects, scores, p.get("nmsThreshold", 0.3), p.get("max_objects"))
+        return rects[keep], scores[keep]
+
+    def detect(self, gray) -> np.ndarray:
+        """Detecta em uma imagem cinza. Retorna array int32 (N, 4) de x, y, w, h."""
+        return self.detect_scored(gray)[0]
+
+    def detect_batch(self, images) -> list:
+        """Detecta em várias imagens (BGR ou cinza); uma lista de arrays por imagem."""
+        return [self.detect(to_gray(img)) for img in images]
+
+
+def working_image(gray, resize: float):
+    """Reduz `gray` pelo fator `resize` (< 1); senão devolve a própria imagem."""
+    if resize < 1.0:
+        with METRICS.timer("resize"):
+            return cv2.resize(gray, None, fx=resize, fy=resize, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+class MultiDetector:
+    """
+    Vários cascades (ex.: lombada e capa) na mesma imagem: a decodificação
+    e a redução à resolução de trabalho são feitas uma vez e compartilhadas
+    por todos os detectores que caem na mesma escala.
+    """
+
+    def __init__(self, detectors: dict):
+        if not detectors:
+            raise ValueError("MultiDetector precisa de ao menos um detector")
+        self.detectors = detectors  # nome → Detector
+
+    @classmethod
+    def from_registry(cls, models, registry: ModelRegistry = None, **params) -> "MultiDetector":
+        """Um Detector com hot-reload por modelo do registro."""
+        registry = registry or ModelRegistry()
+        return cls({m: Detector(model=m, registry=registry, **params) for m in models})
+
+    @property
+    def params(self) -> dict:
+        # a decodificação usa a maior resolução de trabalho pedida
+        sizes = [d.params.get("workingSize") for d in self.detectors.values()]
+        return {"workingSize": None if None in sizes else max(sizes)}
 
-    for img_path in images:
-        filename = os.path.basename(img_path)
-        img = cv2.imread(img_path)
+    def detect_scored(self, gray, prescale: float = 1.0) -> dict:
+        """:return: {nome: (boxes, scores)} — mesmo formato de Detector.detect_scored"""
+        resized = {}
+        out = {}
+        for name, detector in self.detectors.items():
+            cascade, scale, p = detector.plan(gray, prescale)
+            resize = scale / prescale
+            if resize not in resized:
+                resized[resize] = working_image(gray, resize)
+            out[name] = detector.search(cascade, resized[resize], scale, p)
+        return out
+
+
+def load_detector(cascade_path: str = CASCADE_XML_PATH, model: str = None, **params):
+    """Cria um Detector registrando o erro no log. Retorna None se falhar."""
+    try:
+        return Detector(cascade_path, model=model, **params)
+    except (OSError, RuntimeError) as err:
+        logger.error(str(err))
+        return None
+
+
+def draw_boxes(img, rects):
+    """Desenha as caixas detectadas na imagem (in-place)."""
+    for (x, y, w, h) in rects:
+        cv2.rectangle(img, (int(x), int(y)), (int(x + w), int(y + h)), (0, 255, 0), 2)
+    return img
+
+
+def process_image(detector: Detector, img_path: str,
+                  detected_dir: str = RESULTS_DETECTED_PATH,
+                  not_detected_dir: str = RESULTS_NOT_DETECTED_PATH,
+                  render: bool = None):
+    """
+    Detecta livros em uma imagem. A cópia JPEG anotada só é gravada com
+    render=True (padrão: RESULTS_PARAMS["render"]); sem ela a imagem é
+    decodificada direto em cinza, já reduzida se for bem maior que a
+    resolução de trabalho.
+    :return: dict com path, sha256, size, boxes, scores, timings (ms) e output
+             (None sem render), ou None se a imagem não abrir
+    """
+    render = RESULTS_PARAMS["render"] if render is None else render
+    filename = os.path.basename(img_path)
+
+    t0 = time.perf_counter()
+    data = read_bytes(img_path)
+    decoded = decode_for_detection(data, detector.params.get("workingSize"), keep_color=render)
+    decode_s = time.perf_counter() - t0
+    METRICS.observe("decode", decode_s)
+    if decoded is None:
+        logger.warning(f"Falha ao abrir: {filename}")
+        METRICS.inc("decode_errors")
+        return None
+
+    t0 = time.perf_counter()
+    rects, scores = detector.detect_scored(decoded["gray"], decoded["prescale"])
+    timings = {"decode": round(1000 * decode_s, 3),
+               "detect": round(1000 * (time.perf_counter() - t0), 3)}
+    METRICS.inc("images")
+    METRICS.inc("boxes", len(rects))
+
+    if len(rects) > 0:
+        logger.info(f"{filename}: {len(rects)} livro(s) detectado(s).")
+    else:
+        logger.info(f"{filename}: nenhum livro.")
+
+    out_path = None
+    if render:
+        out_path = os.path.join(detected_dir if len(rects) else not_detected_dir, filename)
+        t0 = time.perf_counter()
+        with METRICS.timer("encode"):
+            cv2.imwrite(out_path, draw_boxes(decoded["color"], rects))
+        timings["encode"] = round(1000 * (time.perf_counter() - t0), 3)
+
+    return {
+        "path": img_path,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": list(decoded["size"]),
+        "boxes": rects,
+        "scores": scores,
+        "timings": timings,
+        "cascade": detector.cascade_path,
+        "output": out_path,
+    }
+
+
+def render_results(store_path: str = None,
+                   detected_dir: str = RESULTS_DETECTED_PATH,
+                   not_detected_dir: str = RESULTS_NOT_DETECTED_PATH,
+                   only_detected: bool = True) -> int:
+    """
+    Gera sob demanda as cópias JPEG anotadas a partir do store de resultados.
+    :return: nº de imagens gravadas
+    """
+    ensure_dir(detected_dir)
+    ensure_dir(not_detected_dir)
+    written = 0
+    for record in read_results(store_path):
+        if only_detected and not record["boxes"]:
+            continue
+        img = cv2.imread(record["path"])
         if img is None:
-            logger.warning(f"Falha ao abrir: {filename}")
+            logger.warning(f"Falha ao abrir: {record['path']}")
             continue
+        out_dir = detected_dir if record["boxes"] else not_detected_dir
+        cv2.imwrite(os.path.join(out_dir, os.path.basename(record["path"])),
+                    draw_boxes(img, record["boxes"]))
+        written += 1
+    logger.info(f"{written} imagem(ns) anotada(s) gravada(s)")
+    return written
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        rects = cascade.detectMultiScale(
-            gray,
-            scaleFactor=DETECTION_PARAMS["scaleFactor"],
-            minNeighbors=DETECTION_PARAMS["minNeighbors"],
-            minSize=DETECTION_PARAMS["minSize"],
-            maxSize=DETECTION_PARAMS.get("maxSize"),
-            flags=DETECTION_PARAMS["flags"],
-        )
-
-        # ---------- Non-Maximum Suppression -----------------
-        rects = list(rects)                         # converte para lista nativa
-        if len(rects) > 0:
-            rects, _ = cv2.groupRectangles(
-                rects + rects,                     # duplica lista p/ agrupar
-                groupThreshold=DETECTION_PARAMS.get("groupThreshold", 1),
-                eps=DETECTION_PARAMS.get("eps", 0.3),
-            )
-            rects = rects.tolist()                 # volta a ser lista de tuplas
-        # ----------------------------------------------------
-
-        # Limite opcional de objetos por imagem
-        max_obj = DETECTION_PARAMS.get("max_objects")
-        if max_obj and len(rects) > max_obj:
-            rects = rects[:max_obj]
-
-        if len(rects) > 0:
-            for (x, y, w, h) in rects:
-                cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            out_path = os.path.join(RESULTS_DETECTED_PATH, filename)
-            logger.info(f"{filename}: {len(rects)} livro(s) detectado(s).")
-        else:
-            out_path = os.path.join(RESULTS_NOT_DETECTED_PATH, filename)
-            logger.info(f"{filename}: nenhum livro.")
-
-        cv2.imwrite(out_path, img)
-
-    logger.info("✅ Detecção concluída.")
+
+def run_detection(workers: int = None, render: bool = None, store_path: str = None,
+                  incremental: bool = None, images=None, index_path: str = None,
+                  cascade_path: str = CASCADE_XML_PATH, shard: tuple = None, model: str = None):
+    """
+    Aplica o classificador Haar treinado em imagens da pasta test_images.
+    Caixas, scores, tempos e hash de cada imagem vão para o store de
+    resultados (JSONL ou SQLite); JPEGs anotados só com render=True.
+    No modo incremental só imagens novas/alteradas são processadas.
+    :param workers: nº de processos; None usa BATCH_PARAMS, 1 roda em série
+    :param images: iterável de caminhos (padrão: varredura de test_images)
+    :param shard: (i, n) processa só a fatia i de n da pasta (vários workers/máquinas);
+                  sem index_path, o índice incremental é detection_index.{i}of{n}.json
+    :param model: usa a versão ativa deste modelo do registro no lugar de cascade_path
+    """
+    if model:
+        # a execução inteira usa a versão ativa no início (coerente com o índice)
+        try:
+            cascade_path = ModelRegistry().active_path(model)
+        except FileNotFoundError as err:
+            logger.error(str(err))
+            return
+    detector = load_detector(cascade_path)
+    if detector is None:
+        return
+
+    render = RESULTS_PARAMS["render"] if render is None else render
+    incremental = RESULTS_PARAMS["incremental"] if incremental is None else incremental
+    if render:
+        ensure_dir(RESULTS_DETECTED_PATH)
+        ensure_dir(RESULTS_NOT_DETECTED_PATH)
+
+    if images is None:
+        # gerador: a detecção começa antes de a varredura terminar
+        images = iter_images(os.path.join(BASE_DIR, "dataset", "test_images"), shard=shard)
+
+    pending = images
+    if incremental:
+        # cada shard tem o seu índice: pending() remove o que não viu, e um
+        # índice compartilhado seria apagado pelo shard seguinte
+        if not index_path and shard:
+            index_path = shard_index_path(shard)
+        index = DetectionIndex(index_path) if index_path else DetectionIndex()
+        index.use_cascade(cascade_key(detector.cascade_path, detector.params))
+        pending = index.pending(images)
+
+    workers = BATCH_PARAMS["workers"] if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Detectando ({workers} processo(s))…")
+
+    if workers > 1:
+        # import tardio: batch_detector importa funções deste módulo
+        from app.core.batch_detector import iter_batch_detection
+        stream = iter_batch_detection(pending, workers=workers, render=render,
+                                      cascade_path=cascade_path)
+    else:
+        stream = (process_image(detector, p, render=render) for p in pending)
+
+    results, failed = [], 0
+    with open_store(store_path) as store:
+        for result in stream:
+            if not result:
+                # imagem ilegível: fica fora da contagem, do índice e do merge
+                failed += 1
+                continue
+            results.append(result)
+            store.add(result)
+            if incremental:
+                index.update(result)
+    if failed:
+        logger.warning(f"{failed} imagem(ns) não puderam ser lidas e foram ignoradas")
+    if incremental:
+        index.save()
+        logger.info(f"Incremental: {len(results)} nova(s)/alterada(s), "
+                    f"{len(index.reused)} sem mudança")
+        results = index.reused + results
+    logger.info(f"{store.count} resultado(s) gravado(s) em {store.path}")
+
+    if not results:
+        logger.warning("Nenhuma imagem em dataset/test_images.")
+        return results
+    found = sum(1 for r in results if len(r["boxes"]))
+    logger.info(f"✅ Detecção concluída. Imagens com livros: {found}/{len(results)}")
+
+    if METRICS_PARAMS["stage_profile_images"]:
+        from app.core.cascade_eval import profile_stages
+        sample = [r["path"] for r in results][:METRICS_PARAMS["stage_profile_images"]]
+        profile_stages(sample, detector.cascade_path)
+    METRICS.log_summary()
+    if METRICS_PARAMS["export"]:
+        METRICS.export(METRICS_PATH, "detection")
+    return results
 
 
 if __name__ == "__main__":
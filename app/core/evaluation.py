@@ -0,0 +1,204 @@
+# app/core/evaluation.py
+
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+from app.services.dataset_index import scan_annotations
+from app.core.batch_detector import chunked
+from app.core.detector import Detector, working_image
+from app.core.nms import iou_matrix
+from app.utils.annotation_utils import parse_boxes
+from app.config.settings import (
+    ANNOTATIONS_PATH,
+    POSITIVE_PATH,
+    CASCADE_XML_PATH,
+    CACHE_DIR,
+    METRICS_PATH,
+    EVAL_PARAMS,
+)
+
+logger = get_logger(__name__)
+
+# Detectores do processo worker, um por configuração da grade
+_detectors = None
+
+
+def match_boxes(gt, pred, iou: float = 0.5):
+    """
+    Casamento guloso 1-para-1 por IoU decrescente.
+    :return: (verdadeiros positivos, falsos positivos, falsos negativos)
+    """
+    gt = np.asarray(gt).reshape(-1, 4)
+    pred = np.asarray(pred).reshape(-1, 4)
+    if not len(gt) or not len(pred):
+        return 0, len(pred), len(gt)
+
+    overlaps = iou_matrix(gt, pred)
+    pairs = np.argwhere(overlaps >= iou)
+    pairs = pairs[np.argsort(-overlaps[pairs[:, 0], pairs[:, 1]], kind="stable")]
+    used_gt, used_pred = set(), set()
+    for g, p in pairs:
+        if g not in used_gt and p not in used_pred:
+            used_gt.add(g)
+            used_pred.add(p)
+    tp = len(used_gt)
+    return tp, len(pred) - tp, len(gt) - tp
+
+
+def scores(tp: int, fp: int, fn: int) -> dict:
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+def param_grid(grid: dict = None) -> list:
+    """Produto cartesiano da grade {parâmetro: [valores]} → lista de dicts."""
+    grid = grid or EVAL_PARAMS["grid"]
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def load_annotated(annotations_dir: str = ANNOTATIONS_PATH, images_dir: str = POSITIVE_PATH) -> list:
+    """Imagens com anotação válida: lista de (caminho da imagem, caixas int32 (N, 4))."""
+    scanned = scan_annotations(annotations_dir, images_dir,
+                               cache_path=os.path.join(CACHE_DIR, "positives_index.json"))
+    samples = []
+    for name, img_path, result in scanned:
+        if "error" in result:
+            logger.warning(f"Ignorada '{name}': {result['error']}")
+            continue
+        samples.append((img_path, parse_boxes(result["values"])))
+    return samples
+
+
+def _init_worker(cascade_path: str, configs: list):
+    global _detectors
+    cv2.setNumThreads(1)
+    # workingSize/maxScaleLevels de EVAL_PARAMS["search"], salvo se forem eixos da grade:
+    # com os de DETECTION_PARAMS o plano da busca alteraria scaleFactor/minSize da grade
+    _detectors = [Detector(cascade_path, **{**EVAL_PARAMS["search"], **cfg}) for cfg in configs]
+
+
+def _eval_chunk(samples: list, iou: float) -> list:
+    """
+    Avalia todas as configurações num chunk; cada imagem é decodificada uma vez.
+    Também guarda os (scaleFactor, minSize) efetivamente buscados.
+    """
+    totals = [[0, 0, 0, [], set()] for _ in _detectors]
+    for img_path, gt in samples:
+        gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        for acc, det in zip(totals, _detectors):
+            t0 = time.perf_counter()
+            cascade, scale, p = det.plan(gray)
+            boxes = det.search(cascade, working_image(gray, scale), scale, p)[0]
+            acc[3].append(time.perf_counter() - t0)
+            acc[4].add((round(p["scaleFactor"], 4), tuple(p["minSize"])))
+            tp, fp, fn = match_boxes(gt, boxes, iou)
+            acc[0] += tp
+            acc[1] += fp
+            acc[2] += fn
+    return totals
+
+
+def drop_duplicates(rows: list, keys: list) -> list:
+    """
+    Remove configurações que, depois do planejamento, buscaram exatamente o
+    mesmo (scaleFactor, minSize) em todas as imagens com os demais parâmetros
+    iguais — repetidas, distorceriam a fronteira de Pareto. Fica a primeira.
+    """
+    seen, unique = set(), []
+    for row in rows:
+        rest = tuple(str(row[k]) for k in keys if k not in ("scaleFactor", "minSize"))
+        key = (rest, tuple(map(tuple, row["planned"])))
+        if key in seen:
+            params = ", ".join(f"{k}={row[k]}" for k in keys)
+            logger.warning(f"Configuração repetida após o planejamento da busca, ignorada: {params}")
+            continue
+        seen.add(key)
+        unique.append(row)
+    return unique
+
+
+def pareto_front(rows: list, quality: str = "f1", cost: str = "mean_ms") -> list:
+    """
+    Configurações não dominadas: nenhuma outra tem qualidade ≥ e custo ≤
+    com pelo menos uma das duas estritamente melhor. Ordenadas por custo.
+    """
+    front, best = [], -1.0
+    for row in sorted(rows, key=lambda r: (r[cost], -r[quality])):
+        if row[quality] > best:
+            front.append(row)
+            best = row[quality]
+    return front
+
+
+def evaluate_grid(grid: dict = None, samples: list = None, iou: float = None,
+                  workers: int = None, chunk_size: int = None,
+                  cascade_path: str = CASCADE_XML_PATH, out_path: str = None) -> dict:
+    """
+    Avalia o detector em paralelo sobre as imagens anotadas para cada
+    configuração da grade (scaleFactor × minNeighbors × minSize por padrão).
+    A busca usa EVAL_PARAMS["search"] (sem redução nem teto de escalas),
+    para que cada linha meça os valores da grade; "planned" registra os
+    (scaleFactor, minSize) efetivamente buscados.
+    :return: {"rows": uma linha por configuração, "pareto": fronteira F1 × latência}
+    """
+    configs = param_grid(grid)
+    samples = load_annotated() if samples is None else samples
+    iou = iou or EVAL_PARAMS["iou"]
+    workers = workers or EVAL_PARAMS["workers"] or os.cpu_count() or 1
+    chunk_size = chunk_size or EVAL_PARAMS["chunk_size"]
+    Detector(cascade_path)  # falha cedo se o cascade não existir
+
+    logger.info(f"Avaliando {len(configs)} configurações em {len(samples)} imagens "
+                f"({workers} processo(s))…")
+    totals = [[0, 0, 0, [], set()] for _ in configs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cascade_path, configs)) as pool:
+        futures = [pool.submit(_eval_chunk, chunk, iou) for chunk in chunked(samples, chunk_size)]
+        for future in futures:
+            for acc, part in zip(totals, future.result()):
+                acc[0] += part[0]
+                acc[1] += part[1]
+                acc[2] += part[2]
+                acc[3].extend(part[3])
+                acc[4].update(part[4])
+
+    rows = []
+    for cfg, (tp, fp, fn, latencies, planned) in zip(configs, totals):
+        lat = np.asarray(latencies) * 1000
+        rows.append({
+            **cfg, "planned": sorted(planned),
+            "tp": tp, "fp": fp, "fn": fn, **scores(tp, fp, fn),
+            "mean_ms": round(float(lat.mean()), 2) if lat.size else 0.0,
+            "p95_ms": round(float(np.percentile(lat, 95)), 2) if lat.size else 0.0,
+        })
+    rows = drop_duplicates(rows, list(configs[0]))
+
+    front = pareto_front(rows)
+    for r in front:
+        params = ", ".join(f"{k}={r[k]}" for k in configs[0])
+        logger.info(f"[pareto] {params}: F1={r['f1']:.3f} P={r['precision']:.3f} "
+                    f"R={r['recall']:.3f} média={r['mean_ms']:.1f} ms")
+
+    report = {"iou": iou, "images": len(samples), "rows": rows, "pareto": front}
+    if out_path:
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=list)
+        logger.info(f"Relatório salvo em {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    evaluate_grid(out_path=os.path.join(METRICS_PATH, "evaluation.json"))
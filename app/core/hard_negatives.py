@@ -0,0 +1,122 @@
+# app/core/hard_negatives.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+from app.utils.file_utils import list_images
+from app.core.batch_detector import chunked
+from app.core.detector import load_detector
+from app.config.settings import (
+    BASE_DIR, NEGATIVE_PATH, CASCADE_XML_PATH, MINING_PARAMS,
+)
+
+logger = get_logger(__name__)
+
+# Detector do processo worker — carregado uma única vez no initializer
+_detector = None
+
+
+def _init_worker(cascade_path: str, max_per_image: int):
+    global _detector
+    cv2.setNumThreads(1)
+    _detector = load_detector(cascade_path, max_objects=max_per_image)
+
+
+def crop_box(img, box, padding: float):
+    """Recorta a caixa com margem proporcional, limitada às bordas da imagem."""
+    x, y, w, h = (int(v) for v in box)
+    px, py = int(w * padding), int(h * padding)
+    ih, iw = img.shape[:2]
+    return img[max(0, y - py):min(ih, y + h + py), max(0, x - px):min(iw, x + w + px)]
+
+
+def _mine_chunk(paths: list, padding: float) -> list:
+    """Toda detecção em imagem negativa é falso positivo: devolve os recortes."""
+    if _detector is None:
+        return []
+    crops = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        for box in _detector.detect(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)):
+            crops.append(crop_box(img, box, padding).copy())
+    return crops
+
+
+def dhash(img) -> str:
+    """Hash perceptual de 64 bits (diferença entre pixels vizinhos)."""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def append_bg_txt(paths: list, bg_path: str = None) -> int:
+    """Acrescenta ao bg.txt só os caminhos que ainda não estão nele."""
+    bg_path = bg_path or os.path.join(NEGATIVE_PATH, "bg.txt")
+    existing = set()
+    if os.path.exists(bg_path):
+        with open(bg_path, encoding="utf-8") as f:
+            existing = {line.strip() for line in f if line.strip()}
+
+    rels = [os.path.relpath(p, BASE_DIR).replace("\\", "/") for p in paths]
+    new = [r for r in dict.fromkeys(rels) if r not in existing]
+    if new:
+        with open(bg_path, "a", encoding="utf-8") as f:
+            f.write(("\n" if existing else "") + "\n".join(new))
+    return len(new)
+
+
+def mine_hard_negatives(corpus_dirs=None, out_dir: str = NEGATIVE_PATH,
+                        cascade_path: str = CASCADE_XML_PATH,
+                        workers: int = None, update_bg: bool = True) -> list:
+    """
+    Roda o cascade atual em paralelo sobre imagens sem livros e grava os
+    falsos positivos (sem duplicatas) como novos negativos.
+    :return: caminhos dos recortes gravados nesta rodada
+    """
+    prefix = MINING_PARAMS["prefix"]
+    corpus_dirs = corpus_dirs or [NEGATIVE_PATH]
+    # recortes de rodadas anteriores não voltam a ser minerados
+    images = [p for d in corpus_dirs for p in list_images(d)
+              if not os.path.basename(p).startswith(prefix)]
+    if not images:
+        logger.warning("Nenhuma imagem negativa para minerar.")
+        return []
+    if load_detector(cascade_path) is None:
+        return []
+
+    workers = workers or MINING_PARAMS["workers"] or os.cpu_count() or 1
+    logger.info(f"Minerando falsos positivos em {len(images)} imagens ({workers} processo(s))…")
+
+    saved, seen, total = [], set(), 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cascade_path, MINING_PARAMS["max_per_image"])) as pool:
+        task = partial(_mine_chunk, padding=MINING_PARAMS["padding"])
+        for crops in pool.map(task, chunked(images, MINING_PARAMS["chunk_size"])):
+            for crop in crops:
+                total += 1
+                key = dhash(crop)
+                out_path = os.path.join(out_dir, f"{prefix}{key}.jpg")
+                # o nome deriva do hash: duplicatas (inclusive de rodadas anteriores) são puladas
+                if key in seen or os.path.exists(out_path):
+                    continue
+                seen.add(key)
+                cv2.imwrite(out_path, crop)
+                saved.append(out_path)
+
+    logger.info(f"{total} falsos positivos, {len(saved)} novos negativos gravados")
+    if update_bg and saved:
+        added = append_bg_txt(saved)
+        logger.info(f"bg.txt atualizado com {added} negativos difíceis")
+    return saved
+
+
+if __name__ == "__main__":
+    mine_hard_negatives()
@@ -0,0 +1,170 @@
+# app/core/model_registry.py
+
+import os
+import shutil
+import threading
+import time
+
+from app.services.dataset_index import load_cache, save_cache
+from app.services.logger import get_logger
+from app.utils.file_utils import file_sha256
+from app.config.settings import MODEL_REGISTRY_PATH, REGISTRY_PARAMS
+
+logger = get_logger(__name__)
+
+CASCADE_FILE = "cascade.xml"
+META_FILE = "meta.json"
+ACTIVE_FILE = "active.json"
+
+
+class ModelRegistry:
+    """
+    Registro de cascades versionados:
+      <root>/<modelo>/<versão>/cascade.xml + meta.json   (imutáveis)
+      <root>/<modelo>/active.json                        (versão ativa)
+    Uma versão nunca é sobrescrita: retreinar cria outra, e trocar a versão
+    ativa é um rename atômico do ponteiro. Quem está lendo um XML nunca vê
+    um arquivo pela metade, e detectores ligados a um modelo passam para a
+    nova versão na chamada seguinte, sem reiniciar.
+    """
+
+    def __init__(self, root: str = MODEL_REGISTRY_PATH, reload_seconds: float = None):
+        self.root = root
+        self.reload_seconds = REGISTRY_PARAMS["reload_seconds"] if reload_seconds is None \
+            else reload_seconds
+        self._lock = threading.Lock()
+        self._active = {}  # modelo → (checado em, identidade do ponteiro, caminho do XML)
+
+    # ── consulta ────────────────────────────────────────── #
+    def models(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(e.name for e in os.scandir(self.root) if e.is_dir())
+
+    def versions(self, name: str) -> list:
+        """Metadados de todas as versões do modelo, da mais antiga à mais nova."""
+        folder = os.path.join(self.root, name)
+        if not os.path.isdir(folder):
+            return []
+        metas = [load_cache(os.path.join(e.path, META_FILE))
+                 for e in os.scandir(folder) if e.is_dir()]
+        return sorted((m for m in metas if m), key=lambda m: m["version"])
+
+    def metadata(self, name: str, version: str) -> dict:
+        meta = load_cache(os.path.join(self.root, name, version, META_FILE))
+        if not meta:
+            raise ValueError(f"Versão inexistente: {name}/{version}")
+        return meta
+
+    def path(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, version, CASCADE_FILE)
+
+    def active(self, name: str) -> dict:
+        """Metadados da versão ativa, ou None se o modelo não tiver nenhuma."""
+        pointer = load_cache(os.path.join(self.root, name, ACTIVE_FILE))
+        return self.metadata(name, pointer["version"]) if pointer else None
+
+    def active_path(self, name: str) -> str:
+        """
+        XML da versão ativa. Feito para ser chamado a cada detecção: o
+        ponteiro só é relido quando muda (inode/mtime) e, no máximo, a cada
+        `reload_seconds`.
+        :raises FileNotFoundError: se o modelo não tiver versão ativa
+        """
+        now = time.monotonic()
+        cached = self._active.get(name)
+        if cached and now - cached[0] < self.reload_seconds:
+            return cached[2]
+
+        pointer = os.path.join(self.root, name, ACTIVE_FILE)
+        try:
+            st = os.stat(pointer)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Modelo sem versão ativa no registro: {name}") from None
+        ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if cached and cached[1] == ident:
+            path = cached[2]
+        else:
+            path = self.path(name, load_cache(pointer)["version"])
+            if cached:
+                logger.info(f"Modelo '{name}' recarregado: {path}")
+        with self._lock:
+            self._active[name] = (now, ident, path)
+        return path
+
+    # ── escrita ─────────────────────────────────────────── #
+    def register(self, xml_path: str, name: str = None, metadata: dict = None,
+                 activate: bool = True) -> dict:
+        """
+        Copia um cascade para uma nova versão do modelo. Conteúdo idêntico
+        (mesmo sha256) a uma versão existente não gera versão nova.
+        :param metadata: extras gravados no meta.json (TRAINING_PARAMS, amostras…)
+        :return: metadados da versão
+        """
+        name = name or REGISTRY_PARAMS["default_model"]
+        if not os.path.exists(xml_path):
+            raise FileNotFoundError(f"Cascade não encontrado: {xml_path}")
+        digest = file_sha256(xml_path)
+
+        existing = next((m for m in self.versions(name) if m["sha256"] == digest), None)
+        if existing:
+            logger.info(f"{name}/{existing['version']} já tem este cascade — nada a registrar")
+            meta = existing
+        else:
+            meta = self._new_version(name, xml_path, digest, metadata or {})
+            logger.info(f"Cascade registrado: {name}/{meta['version']} (sha256 {digest[:12]})")
+
+        if activate:
+            self.activate(name, meta["version"])
+        return meta
+
+    def _new_version(self, name: str, xml_path: str, digest: str, metadata: dict) -> dict:
+        folder = os.path.join(self.root, name)
+        os.makedirs(folder, exist_ok=True)
+        # mkdir é atômico: dois registros simultâneos nunca pegam o mesmo número
+        number = len(self.versions(name)) + 1
+        while True:
+            version = f"v{number:04d}"
+            try:
+                os.mkdir(os.path.join(folder, version))
+                break
+            except FileExistsError:
+                number += 1
+
+        target = self.path(name, version)
+        shutil.copyfile(xml_path, f"{target}.tmp")
+        os.replace(f"{target}.tmp", target)
+        meta = {**metadata, "name": name, "version": version, "sha256": digest,
+                "source": os.path.abspath(xml_path), "created": round(time.time(), 3)}
+        # meta.json por último: versão sem ele ainda está sendo gravada e é ignorada
+        save_cache(os.path.join(folder, version, META_FILE), meta)
+        return meta
+
+    def activate(self, name: str, version: str):
+        """Troca a versão ativa (rename atômico do ponteiro)."""
+        meta = self.metadata(name, version)
+        if file_sha256(self.path(name, version)) != meta["sha256"]:
+            raise RuntimeError(f"Cascade de {name}/{version} não confere com o sha256 registrado")
+        save_cache(os.path.join(self.root, name, ACTIVE_FILE),
+                   {"version": version, "sha256": meta["sha256"], "activated": round(time.time(), 3)})
+        with self._lock:
+            self._active.pop(name, None)
+        logger.info(f"Versão ativa de '{name}': {version}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    registry = ModelRegistry()
+    args = sys.argv[1:]
+    if args[:1] == ["register"] and len(args) >= 2:
+        registry.register(args[1], *args[2:3])
+    elif args[:1] == ["activate"] and len(args) == 3:
+        registry.activate(args[1], args[2])
+    else:
+        for model in registry.models():
+            current = registry.active(model) or {}
+            for meta in registry.versions(model):
+                mark = "*" if meta["version"] == current.get("version") else " "
+                print(f"{mark} {model}/{meta['version']}  {meta['sha256'][:12]}  "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(meta['created']))}")
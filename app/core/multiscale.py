@@ -0,0 +1,51 @@
+# app/core/multiscale.py
+
+import math
+
+
+def working_scale(shape, working_size: int) -> float:
+    """Fator (≤ 1) que leva o maior lado da imagem a `working_size` px."""
+    if not working_size:
+        return 1.0
+    return min(1.0, working_size / max(shape[:2]))
+
+
+def adaptive_scale_factor(min_size, max_size, shape, base: float, max_levels: int) -> float:
+    """
+    Escolhe o scaleFactor para que a varredura de minSize até o tamanho
+    máximo buscável caiba em no máximo `max_levels` escalas.
+    Nunca fica abaixo do `base` configurado.
+    """
+    if not max_levels:
+        return base
+    h, w = shape[:2]
+    top = min(w / min_size[0], h / min_size[1])
+    if max_size:
+        top = min(top, max_size[0] / min_size[0], max_size[1] / min_size[1])
+    if top <= 1:
+        return base
+    return max(base, top ** (1.0 / max_levels))
+
+
+def plan_search(shape, params: dict, window=(1, 1), max_scale: float = 1.0):
+    """
+    Planeja a busca multi-escala de uma imagem.
+    :param window: janela original do cascade (w, h)
+    :param max_scale: resolução máxima disponível (ex.: 0.25 se a imagem já
+                      foi decodificada reduzida a 1/4)
+    :return: (fator de redução, params de detectMultiScale para a imagem reduzida)
+    """
+    scale = min(working_scale(shape, params.get("workingSize")), max_scale)
+    win = tuple(window)
+
+    # minSize/maxSize acompanham a redução; abaixo da janela de treino não há busca
+    min_size = tuple(max(int(round(s * scale)), wn) for s, wn in zip(params["minSize"], win))
+    max_size = params.get("maxSize")
+    if max_size:
+        max_size = tuple(max(int(round(s * scale)), m) for s, m in zip(max_size, min_size))
+
+    small = (int(math.ceil(shape[0] * scale)), int(math.ceil(shape[1] * scale)))
+    planned = dict(params, minSize=min_size, maxSize=max_size)
+    planned["scaleFactor"] = adaptive_scale_factor(
+        min_size, max_size, small, params["scaleFactor"], params.get("maxScaleLevels"))
+    return scale, planned
@@ -0,0 +1,54 @@
+# app/core/nms.py
+
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU entre cada caixa de `a` (N, 4) e de `b` (M, 4), formato x, y, w, h."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    iw = np.minimum(ax2[:, None], bx2[None, :]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(ay2[:, None], by2[None, :]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def cascade_scores(reject_levels, level_weights) -> np.ndarray:
+    """
+    Pontua as caixas de detectMultiScale3(outputRejectLevels=True).
+    A parte inteira é o estágio alcançado; a fração (sigmóide do peso do
+    último estágio) desempata caixas do mesmo estágio.
+    """
+    levels = np.ravel(reject_levels).astype(np.float32)
+    weights = np.ravel(level_weights).astype(np.float32)
+    return levels + 1.0 / (1.0 + np.exp(-weights))
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray,
+        iou_threshold: float = 0.3, top_k: int = None) -> np.ndarray:
+    """
+    Non-Maximum Suppression guloso sobre arrays NumPy.
+    :return: índices das caixas mantidas, em ordem decrescente de score
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    order = np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if top_k and len(keep) >= top_k:
+            break
+        rest = order[1:]
+        overlap = iou_matrix(boxes[best], boxes[rest])[0]
+        order = rest[overlap <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.intp)
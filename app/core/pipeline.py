@@ -1,14 +1,14 @@
 # app/core/pipeline.py
 
 from app.services.logger import get_logger
-from app.core import annotator, trainer, detector
+from app.core import annotator, trainer, detector, hard_negatives
 
 logger = get_logger(__name__)
 
 def run_pipeline(etapas=("annotate", "train", "detect")):
     """
     Executa todas as etapas do pipeline, conforme as opções informadas.
-    :param etapas: tupla com as etapas desejadas (annotate, train, detect)
+    :param etapas: tupla com as etapas desejadas (annotate, train, mine, detect)
     """
     logger.info("Iniciando pipeline Haar Cascade...")
 
@@ -20,6 +20,10 @@ def run_pipeline(etapas=("annotate", "train", "detect")):
         logger.info("Etapa 2: Treinamento do classificador Haar.")
         trainer.run_trainer()
 
+    if "mine" in etapas:
+        logger.info("Etapa extra: mineração de negativos difíceis (alimenta o próximo treino).")
+        hard_negatives.mine_hard_negatives()
+
     if "detect" in etapas:
         logger.info("Etapa 3: Detecção com o classificador treinado.")
         detector.run_detection()
@@ -0,0 +1,94 @@
+# app/core/scale_tuner.py
+
+import time
+
+import numpy as np
+
+from app.services.logger import get_logger
+from app.services.image_loader import read_bytes, decode_for_detection
+from app.core.detector import load_detector, working_image
+from app.core.nms import iou_matrix
+from app.utils.annotation_utils import read_positives_txt
+from app.config.settings import CASCADE_XML_PATH
+
+logger = get_logger(__name__)
+
+# Configurações avaliadas por padrão: (workingSize, maxScaleLevels)
+DEFAULT_GRID = [
+    (None, 0),
+    (1920, 32),
+    (1280, 32),
+    (1280, 16),
+    (960, 24),
+    (640, 16),
+]
+
+
+def tune_multiscale(grid=None, info_path: str = None, iou: float = 0.5,
+                    limit: int = None, cascade_path: str = CASCADE_XML_PATH) -> list:
+    """
+    Mede latência × recall de cada configuração multi-escala sobre os
+    positivos anotados. Cada imagem é lida do disco uma vez e decodificada
+    por configuração como em process_image (já reduzida conforme o
+    workingSize); a latência inclui essa decodificação.
+    "planned" registra os (scaleFactor, minSize) que o planejamento da
+    busca escolheu para cada configuração nas imagens medidas.
+    :return: uma linha por configuração, ordenada por latência média
+    """
+    grid = grid or DEFAULT_GRID
+    detectors = {}
+    for working, levels in grid:
+        det = load_detector(cascade_path, workingSize=working, maxScaleLevels=levels)
+        if det is None:
+            return []
+        detectors[(working, levels)] = det
+
+    samples = read_positives_txt(info_path)[:limit]
+    rows = {k: {"workingSize": k[0], "maxScaleLevels": k[1],
+                "latencies": [], "planned": set(), "hits": 0, "detections": 0}
+            for k in detectors}
+    total_gt = 0
+
+    for img_path, gt in samples:
+        data = read_bytes(img_path)
+        for i, (key, det) in enumerate(detectors.items()):
+            t0 = time.perf_counter()
+            decoded = decode_for_detection(data, det.params.get("workingSize"))
+            if decoded is None:
+                logger.warning(f"Falha ao abrir: {img_path}")
+                break
+            if i == 0:
+                total_gt += len(gt)
+            cascade, scale, p = det.plan(decoded["gray"], decoded["prescale"])
+            gray = working_image(decoded["gray"], scale / decoded["prescale"])
+            boxes = det.search(cascade, gray, scale, p)[0]
+            rows[key]["latencies"].append(time.perf_counter() - t0)
+            rows[key]["planned"].add((round(p["scaleFactor"], 4), tuple(p["minSize"])))
+            rows[key]["detections"] += len(boxes)
+            if len(boxes):
+                # um acerto por caixa anotada coberta com IoU ≥ limiar
+                rows[key]["hits"] += int((iou_matrix(gt, boxes).max(axis=1) >= iou).sum())
+
+    report = []
+    for row in rows.values():
+        lat = np.asarray(row.pop("latencies")) * 1000
+        if not lat.size:
+            continue
+        report.append({
+            **row,
+            "planned": sorted(row["planned"]),
+            "recall": round(row["hits"] / total_gt, 4) if total_gt else 0.0,
+            "mean_ms": round(float(lat.mean()), 2),
+            "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        })
+    report.sort(key=lambda r: r["mean_ms"])
+
+    for r in report:
+        logger.info(f"workingSize={r['workingSize']} níveis={r['maxScaleLevels']}: "
+                    f"média={r['mean_ms']:.1f} ms p95={r['p95_ms']:.1f} ms "
+                    f"recall={r['recall']:.2%} ({r['detections']} detecções)")
+    return report
+
+
+if __name__ == "__main__":
+    tune_multiscale()
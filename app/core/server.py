@@ -0,0 +1,316 @@
+# app/core/server.py
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+from app.services.metrics import METRICS
+from app.services.image_loader import decode_for_detection
+from app.core.detector import load_detector
+from app.config.settings import CASCADE_XML_PATH, SERVER_PARAMS
+
+logger = get_logger(__name__)
+
+# Detector do processo worker — carregado (aquecido) no initializer
+_detector = None
+
+
+def _init_worker(cascade_path: str, model: str = None):
+    global _detector
+    cv2.setNumThreads(1)
+    _detector = load_detector(cascade_path, model=model)
+
+
+def _ping() -> bool:
+    return _detector is not None
+
+
+def _detect_payloads(payloads: list):
+    """Decodifica e detecta um micro-lote no worker; devolve também as métricas dele."""
+    results = []
+    for data in payloads:
+        t0 = time.perf_counter()
+        decoded = decode_for_detection(np.frombuffer(data, np.uint8),
+                                       _detector.params.get("workingSize"))
+        decode_ms = 1000 * (time.perf_counter() - t0)
+        METRICS.observe("decode", decode_ms / 1000)
+        if decoded is None:
+            results.append({"error": "imagem inválida"})
+            continue
+        t0 = time.perf_counter()
+        boxes, scores = _detector.detect_scored(decoded["gray"], decoded["prescale"])
+        results.append({
+            "size": list(decoded["size"]),
+            "boxes": boxes.tolist(),
+            "scores": [round(float(s), 4) for s in scores],
+            "cascade": _detector.cascade_path,
+            "timings": {"decode": round(decode_ms, 3),
+                        "detect": round(1000 * (time.perf_counter() - t0), 3)},
+        })
+    snapshot = METRICS.snapshot()
+    METRICS.reset()
+    return results, snapshot
+
+
+class DetectionServer:
+    """
+    Servidor HTTP local (asyncio) de detecção:
+      POST /detect   corpo = bytes da imagem → {"boxes", "scores", ...}
+      GET  /health   estado do pool e da fila
+      GET  /metrics  métricas no formato texto do Prometheus
+    Requisições concorrentes são agrupadas em micro-lotes (até `max_batch`
+    imagens ou `max_wait_ms`) e enviadas a processos com o cascade já carregado.
+    Decodificação e detecção rodam nos workers, fora do event loop.
+    Com `model`, os workers seguem a versão ativa do registro de modelos:
+    ativar outra versão troca o cascade sem reiniciar o servidor.
+    Se um worker morrer, o pool é recriado (o lote em voo recebe 503) e o
+    /health informa quantas vezes isso aconteceu.
+    """
+
+    def __init__(self, cascade_path: str = CASCADE_XML_PATH, host: str = None, port: int = None,
+                 workers: int = None, max_batch: int = None, max_wait_ms: float = None,
+                 max_pending: int = None, model: str = None):
+        self.cascade_path = cascade_path
+        self.model = model
+        self.host = host or SERVER_PARAMS["host"]
+        self.port = SERVER_PARAMS["port"] if port is None else port
+        self.workers = workers or SERVER_PARAMS["workers"] or os.cpu_count() or 1
+        self.max_batch = max_batch or SERVER_PARAMS["max_batch"]
+        self.max_wait = (SERVER_PARAMS["max_wait_ms"] if max_wait_ms is None else max_wait_ms) / 1000
+        self.max_pending = max_pending or SERVER_PARAMS["max_pending"]
+        self.started = None
+        self._detector = None  # só para informar a versão em uso no /health
+        self._pool = None
+        self.pool_restarts = 0
+        self._server = None
+        self._queue = None
+        self._batcher = None
+        self._inflight = None
+        self._tasks = set()  # referências dos lotes em voo (evita coleta pelo GC)
+        self._connections = {}  # task do handler → writer (fechados no stop)
+
+    # ── ciclo de vida ───────────────────────────────────── #
+    async def start(self):
+        detector = load_detector(self.cascade_path, model=self.model)
+        if detector is None:
+            raise RuntimeError(f"Cascade inválido: {self.model or self.cascade_path}")
+        self._detector = detector
+        self._pool = self._new_pool()
+        # sobe e aquece todos os workers antes de aceitar conexões
+        if not await self._warm(self._pool):
+            raise RuntimeError("Falha ao carregar o cascade nos workers")
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._inflight = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=SERVER_PARAMS["max_header"])
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started = time.time()
+        logger.info(f"Servidor de detecção em http://{self.host}:{self.port} "
+                    f"({self.workers} worker(s), lote ≤ {self.max_batch}, "
+                    f"espera ≤ {self.max_wait * 1000:.0f} ms)")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.cascade_path, self.model))
+
+    async def _warm(self, pool: ProcessPoolExecutor) -> bool:
+        loop = asyncio.get_running_loop()
+        warm = await asyncio.gather(*(loop.run_in_executor(pool, _ping)
+                                      for _ in range(self.workers)))
+        return all(warm)
+
+    async def _rebuild_pool(self, broken: ProcessPoolExecutor):
+        """Troca o pool quebrado (worker morto) por um novo; lotes concorrentes recriam uma vez só."""
+        if self._pool is not broken:
+            return
+        self.pool_restarts += 1
+        METRICS.inc("pool_restarts")
+        logger.warning(f"Pool de workers quebrado — recriando ({self.pool_restarts}ª vez)")
+        self._pool = self._new_pool()
+        await asyncio.to_thread(broken.shutdown, cancel_futures=True)
+        try:
+            await self._warm(self._pool)
+        except BrokenProcessPool as err:
+            logger.error(f"Pool recriado também falhou: {err}")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            # conexões keep-alive não fecham com o servidor: encerra e espera os handlers
+            for writer in list(self._connections.values()):
+                writer.close()
+            if self._connections:
+                await asyncio.wait(list(self._connections), timeout=5)
+            await self._server.wait_closed()
+        if self._batcher:
+            self._batcher.cancel()
+        if self._pool:
+            # shutdown espera os processos: fora do event loop
+            await asyncio.to_thread(self._pool.shutdown, cancel_futures=True)
+
+    # ── micro-lotes ─────────────────────────────────────── #
+    async def detect(self, data: bytes) -> dict:
+        """Enfileira uma imagem e espera o resultado do lote em que ela entrar."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((data, future))   # QueueFull → 503 no handler
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # no máximo um lote por worker em voo; o resto espera na fila
+            await self._inflight.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            METRICS.inc("batches")
+            METRICS.inc("batched_images", len(batch))
+            results, snapshot = await loop.run_in_executor(
+                pool, _detect_payloads, [data for data, _ in batch])
+            METRICS.merge(snapshot)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except BrokenProcessPool as err:
+            logger.error(f"Worker morto durante um lote de {len(batch)} imagem(ns): {err}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            await self._rebuild_pool(pool)
+        except Exception as err:  # pool encerrado etc.
+            logger.error(f"Falha no lote de {len(batch)} imagem(ns): {err}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+        finally:
+            self._inflight.release()
+
+    # ── HTTP ────────────────────────────────────────────── #
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "requisição inválida"})
+                    break
+                headers = {k.strip().lower(): v.strip()
+                           for k, v in (line.split(":", 1) for line in lines[1:] if ":" in line)}
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST,
+                                        {"error": "Content-Length inválido"})
+                    break
+                if length > SERVER_PARAMS["max_body"]:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {"error": "imagem grande demais"})
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" \
+                    and version.upper() == "HTTP/1.1"
+                status, payload = await self._route(method.upper(), target.split("?", 1)[0], body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes):
+        if path == "/health" and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", "cascade": self._detector.cascade_path,
+                                   "workers": self.workers, "queued": self._queue.qsize(),
+                                   "pool_restarts": self.pool_restarts,
+                                   "uptime_s": round(time.time() - self.started, 1)}
+        if path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, METRICS.to_prometheus()
+        if path == "/detect" and method == "POST":
+            if not body:
+                return HTTPStatus.BAD_REQUEST, {"error": "corpo vazio"}
+            t0 = time.perf_counter()
+            try:
+                result = await self.detect(body)
+            except asyncio.QueueFull:
+                METRICS.inc("rejected")
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "fila cheia"}
+            except BrokenProcessPool:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "worker reiniciado, tente de novo"}
+            except Exception as err:
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(err)}
+            METRICS.observe("request", time.perf_counter() - t0)
+            if "error" in result:
+                return HTTPStatus.UNPROCESSABLE_ENTITY, result
+            return HTTPStatus.OK, result
+        return HTTPStatus.NOT_FOUND, {"error": f"rota desconhecida: {method} {path}"}
+
+    @staticmethod
+    async def _respond(writer, status: HTTPStatus, payload, keep_alive: bool = False):
+        if isinstance(payload, str):
+            body, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, ctype = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def run_server(**kwargs):
+    """Sobe o servidor e bloqueia até Ctrl+C."""
+    try:
+        asyncio.run(DetectionServer(**kwargs).serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Servidor encerrado.")
+
+
+if __name__ == "__main__":
+    run_server()
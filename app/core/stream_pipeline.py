@@ -0,0 +1,216 @@
+# app/core/stream_pipeline.py
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from typing import Iterable
+
+import cv2
+
+from app.services.logger import get_logger
+from app.services.metrics import METRICS
+from app.services.results_store import open_store
+from app.services.image_loader import read_bytes, decode_for_detection
+from app.utils.file_utils import iter_images, ensure_dir
+from app.core.detector import load_detector, draw_boxes
+from app.config.settings import (
+    CASCADE_XML_PATH,
+    RESULTS_DETECTED_PATH,
+    RESULTS_NOT_DETECTED_PATH,
+    STREAM_PARAMS,
+    RESULTS_PARAMS,
+    BASE_DIR,
+)
+
+logger = get_logger(__name__)
+
+_STOP = object()  # sentinela de fim de fila
+
+
+class StageStats:
+    """Acumula tempo ocupado e nº de itens de um estágio (thread-safe)."""
+
+    def __init__(self, name: str, threads: int):
+        self.name = name
+        self.threads = threads
+        self.count = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.busy += seconds
+
+    def as_dict(self, wall: float) -> dict:
+        return {
+            "threads": self.threads,
+            "items": self.count,
+            "busy_s": round(self.busy, 4),
+            "mean_ms": round(1000 * self.busy / self.count, 3) if self.count else 0.0,
+            # fração do tempo em que as threads do estágio estiveram ocupadas
+            "utilization": round(self.busy / (wall * self.threads), 3) if wall else 0.0,
+        }
+
+
+def _consume(body, q: queue.Queue, abort: threading.Event, errors: list):
+    """
+    Aplica `body` a cada item de `q` até a sentinela. Se um item falhar
+    (aqui ou em outro estágio), marca `abort` e passa a só drenar a fila:
+    as filas limitadas nunca ficam cheias sem consumidor.
+    """
+    while (item := q.get()) is not _STOP:
+        if abort.is_set():
+            continue
+        try:
+            body(item)
+        except Exception as err:
+            logger.error(f"Pipeline interrompido: {err!r}")
+            errors.append(err)
+            abort.set()
+
+
+def _start(target, n: int, *args) -> list:
+    threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def _close(threads: list, q: queue.Queue):
+    for _ in threads:
+        q.put(_STOP)
+    for t in threads:
+        t.join()
+
+
+def run_stream_detection(image_paths: Iterable[str],
+                         readers: int = None,
+                         detectors: int = None,
+                         writers: int = None,
+                         queue_size: int = None,
+                         cascade_path: str = CASCADE_XML_PATH,
+                         detected_dir: str = RESULTS_DETECTED_PATH,
+                         not_detected_dir: str = RESULTS_NOT_DETECTED_PATH,
+                         render: bool = None,
+                         store_path: str = None) -> dict:
+    """
+    Detecta com estágios sobrepostos ligados por filas limitadas:
+    leitura (decodificação direto em cinza) → detecção → escrita (store de
+    resultados; desenho + imwrite só com render=True).
+    O OpenCV libera o GIL nessas chamadas, então threads bastam.
+    :return: resumo com nº de imagens e tempos por estágio
+    :raises RuntimeError: se um estágio falhar (ex.: store ou imwrite); as
+                          threads são encerradas e o store fechado antes
+    """
+    readers = readers or STREAM_PARAMS["readers"]
+    detectors = detectors or STREAM_PARAMS["detectors"] or os.cpu_count() or 1
+    writers = writers or STREAM_PARAMS["writers"]
+    queue_size = queue_size or STREAM_PARAMS["queue_size"]
+
+    # O Detector mantém um classificador aquecido por thread
+    detector = load_detector(cascade_path)
+    if detector is None:
+        return {}
+
+    render = RESULTS_PARAMS["render"] if render is None else render
+    if render:
+        ensure_dir(detected_dir)
+        ensure_dir(not_detected_dir)
+    working_size = detector.params.get("workingSize")
+    store = open_store(store_path)
+
+    path_q = queue.Queue(maxsize=queue_size)
+    decoded_q = queue.Queue(maxsize=queue_size)
+    result_q = queue.Queue(maxsize=queue_size)
+    stats = {
+        "read": StageStats("read", readers),
+        "detect": StageStats("detect", detectors),
+        "write": StageStats("write", writers),
+    }
+    found = []  # list.append é atômico
+    abort = threading.Event()
+    errors = []
+
+    def read_stage(path):
+        t0 = time.perf_counter()
+        with METRICS.timer("decode"):
+            data = read_bytes(path)
+            decoded = decode_for_detection(data, working_size, keep_color=render)
+        stats["read"].add(time.perf_counter() - t0)
+        if decoded is None:
+            logger.warning(f"Falha ao abrir: {os.path.basename(path)}")
+            return
+        decoded_q.put((path, hashlib.sha256(data).hexdigest(), decoded))
+
+    def detect_stage(item):
+        path, digest, decoded = item
+        t0 = time.perf_counter()
+        try:
+            rects, scores = detector.detect_scored(decoded["gray"], decoded["prescale"])
+        except cv2.error as err:
+            logger.error(f"Erro na detecção de {os.path.basename(path)}: {err}")
+            return
+        finally:
+            stats["detect"].add(time.perf_counter() - t0)
+        result_q.put((path, digest, decoded, rects, scores))
+
+    def write_stage(item):
+        path, digest, decoded, rects, scores = item
+        filename = os.path.basename(path)
+        t0 = time.perf_counter()
+        if len(rects):
+            found.append(path)
+        out_path = None
+        if render:
+            out_path = os.path.join(detected_dir if len(rects) else not_detected_dir, filename)
+            with METRICS.timer("encode"):
+                if not cv2.imwrite(out_path, draw_boxes(decoded["color"], rects)):
+                    raise OSError(f"Falha ao gravar {out_path}")
+        store.add({"path": path, "sha256": digest, "size": list(decoded["size"]),
+                   "boxes": rects, "scores": scores, "cascade": cascade_path,
+                   "output": out_path})
+        stats["write"].add(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    reader_threads = _start(_consume, readers, read_stage, path_q, abort, errors)
+    detector_threads = _start(_consume, detectors, detect_stage, decoded_q, abort, errors)
+    writer_threads = _start(_consume, writers, write_stage, result_q, abort, errors)
+
+    total = 0
+    try:
+        for path in image_paths:        # bloqueia quando a fila enche (backpressure)
+            if abort.is_set():
+                break
+            path_q.put(path)
+            total += 1
+    finally:
+        _close(reader_threads, path_q)
+        _close(detector_threads, decoded_q)
+        _close(writer_threads, result_q)
+        store.close()
+    wall = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"Detecção em fluxo interrompida após {total} imagem(ns): "
+                           f"{errors[0]}") from errors[0]
+
+    summary = {
+        "images": total,
+        "detected": len(found),
+        "wall_s": round(wall, 4),
+        "stages": {name: s.as_dict(wall) for name, s in stats.items()},
+    }
+    for name, s in summary["stages"].items():
+        logger.info(f"[{name}] threads={s['threads']} itens={s['items']} "
+                    f"média={s['mean_ms']:.1f} ms utilização={s['utilization']:.0%}")
+    if total:
+        bottleneck = max(summary["stages"], key=lambda n: summary["stages"][n]["utilization"])
+        logger.info(f"Gargalo provável: estágio '{bottleneck}' "
+                    f"({total / wall:.1f} imagens/s)")
+    return summary
+
+
+if __name__ == "__main__":
+    run_stream_detection(iter_images(os.path.join(BASE_DIR, "dataset", "test_images")))
@@ -0,0 +1,169 @@
+# app/core/train_monitor.py
+
+import re
+import time
+
+from app.services.dataset_index import save_cache
+from app.services.logger import get_logger
+from app.config.settings import TRAIN_MONITOR_PARAMS
+
+logger = get_logger(__name__)
+
+# Linhas da saída do opencv_traincascade
+_NUM = r"([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)"
+_STAGE = re.compile(r"=+\s*TRAINING\s+(\d+)-stage\s*=+")
+_POS = re.compile(r"POS count\s*:\s*consumed\s+(\d+)\s*:\s*(\d+)")
+_NEG = re.compile(rf"NEG count\s*:\s*acceptanceRatio\s+(\d+)\s*:\s*{_NUM}")
+_PRECALC = re.compile(rf"Precalculation time:\s*{_NUM}")
+_WEAK = re.compile(rf"^\|\s*(\d+)\|\s*{_NUM}\|\s*{_NUM}\|$")
+_ELAPSED = re.compile(r"has taken (\d+) days (\d+) hours (\d+) minutes (\d+) seconds")
+_LOADED = re.compile(r"Stages? 0(?:-(\d+))? (?:is|are) loaded")  # "Stage 0 is loaded" com 1 só
+_PARAM = re.compile(r"^(\w+)(?:\[\w+\])?\s*:\s*(.*)$")  # "precalcValBufSize[Mb] : 1024"
+_TERMINATED = re.compile(r"Branch training terminated|can not be filled", re.I)
+_ERROR = re.compile(r"\berror\b\s*:|terminate called|Segmentation fault", re.I)
+# eventos que regravam o progresso (as linhas da tabela HR/FA e contagens não)
+_SAVE_ON = {"params", "loaded", "stage_start", "stage_end", "terminated", "error"}
+
+
+class TrainMonitor:
+    """
+    Acompanha a saída do traincascade linha a linha e a transforma em
+    eventos (parâmetros, início/fim de estágio, tabela HR/FA, tempos).
+    O estado vai para um arquivo de progresso JSON nas fronteiras de
+    estágio e nas paradas (não a cada linha da tabela), e
+    `stop_reason` é preenchido quando o treino não vale mais a pena:
+    - acceptanceRatio dos negativos abaixo de `min_acceptance` (os
+      negativos já são quase todos rejeitados: mais estágios só decoram
+      o conjunto de treino);
+    - estágio com mais de `max_weak` classificadores fracos sem atingir
+      o maxFalseAlarmRate (não converge).
+    """
+
+    def __init__(self, progress_path: str = None, num_stages: int = None,
+                 min_acceptance: float = None, max_weak: int = None, prefix: str = ""):
+        self.progress_path = progress_path
+        self.prefix = prefix
+        self.num_stages = num_stages
+        self.min_acceptance = TRAIN_MONITOR_PARAMS["min_acceptance"] if min_acceptance is None \
+            else min_acceptance
+        self.max_weak = TRAIN_MONITOR_PARAMS["max_weak"] if max_weak is None else max_weak
+        self.params = {}
+        self.stages = []        # estágios concluídos nesta execução
+        self.loaded = 0         # estágios retomados de uma execução anterior
+        self.current = None     # estágio em treinamento
+        self.elapsed = 0
+        self.status = "running"
+        self.stop_reason = None
+        self.errors = []
+        self.started = time.time()
+        self._in_params = False
+
+    @property
+    def completed(self) -> int:
+        """Nº de estágios prontos em disco (stageN.xml), retomados inclusos."""
+        done = [s["stage"] for s in self.stages]
+        return max(done) + 1 if done else self.loaded
+
+    def feed(self, line: str) -> list:
+        """Interpreta uma linha; devolve os eventos gerados (dicts com "event")."""
+        line = line.strip()
+        events = self._parse(line) if line else []
+        for event in events:
+            self._check(event)
+        if any(e["event"] in _SAVE_ON for e in events):
+            self.save()
+        return events
+
+    def _parse(self, line: str) -> list:
+        if line.startswith("PARAMETERS:"):
+            self._in_params = True
+            return []
+        if self._in_params:
+            m = _PARAM.match(line)
+            if m:
+                self.params[m.group(1)] = m.group(2)
+                if m.group(1) == "numStages" and self.num_stages is None:
+                    self.num_stages = int(m.group(2))
+                return []
+            self._in_params = False
+            return [{"event": "params", "params": dict(self.params)}]
+
+        if m := _STAGE.search(line):
+            self.current = {"stage": int(m.group(1)), "weak": 0, "hr": None, "fa": None}
+            return [{"event": "stage_start", "stage": self.current["stage"]}]
+        if m := _LOADED.search(line):
+            self.loaded = int(m.group(1) or 0) + 1
+            return [{"event": "loaded", "stages": self.loaded}]
+        if m := _ELAPSED.search(line):
+            d, h, mi, s = map(int, m.groups())
+            self.elapsed = ((d * 24 + h) * 60 + mi) * 60 + s
+            if self.stages and "seconds" not in self.stages[-1]:
+                before = sum(st.get("seconds", 0) for st in self.stages[:-1])
+                self.stages[-1]["seconds"] = self.elapsed - before
+            return [{"event": "elapsed", "seconds": self.elapsed}]
+        if _TERMINATED.search(line):
+            self.status = "terminated"
+            return [{"event": "terminated", "message": line}]
+        if _ERROR.search(line):
+            self.errors.append(line)
+            return [{"event": "error", "message": line}]
+        if self.current is None:
+            return []
+
+        stage = self.current["stage"]
+        if m := _POS.search(line):
+            self.current.update(pos_count=int(m.group(1)), pos_consumed=int(m.group(2)))
+            return [{"event": "pos", "stage": stage, "count": int(m.group(1)),
+                     "consumed": int(m.group(2))}]
+        if m := _NEG.search(line):
+            self.current.update(neg_count=int(m.group(1)), acceptance_ratio=float(m.group(2)))
+            return [{"event": "neg", "stage": stage, "count": int(m.group(1)),
+                     "acceptance_ratio": float(m.group(2))}]
+        if m := _PRECALC.search(line):
+            self.current["precalc_s"] = float(m.group(1))
+            return []
+        if m := _WEAK.match(line):
+            self.current.update(weak=int(m.group(1)), hr=float(m.group(2)), fa=float(m.group(3)))
+            return [{"event": "weak", "stage": stage, "n": int(m.group(1)),
+                     "hr": float(m.group(2)), "fa": float(m.group(3))}]
+        if line == "END>":
+            done, self.current = self.current, None
+            self.stages.append(done)
+            return [{"event": "stage_end", **done}]
+        return []
+
+    def _check(self, event: dict):
+        kind = event["event"]
+        if kind == "stage_start":
+            logger.info(f"{self.prefix}estágio {event['stage']}"
+                        + (f"/{self.num_stages}" if self.num_stages else "") + " iniciado")
+        elif kind == "stage_end":
+            logger.info(f"{self.prefix}estágio {event['stage']} concluído: {event['weak']} fraco(s), "
+                        f"HR={event['hr']} FA={event['fa']} "
+                        f"acceptanceRatio={event.get('acceptance_ratio')}")
+        elif kind == "neg" and self.min_acceptance and event["acceptance_ratio"] < self.min_acceptance:
+            self._stop(f"overtraining: acceptanceRatio {event['acceptance_ratio']:.3g} "
+                       f"< {self.min_acceptance:g} no estágio {event['stage']}")
+        elif kind == "weak" and self.max_weak and event["n"] > self.max_weak:
+            self._stop(f"estágio {event['stage']} não converge: {event['n']} fracos "
+                       f"com FA={event['fa']}")
+        elif kind == "error":
+            logger.error(f"{self.prefix}{event['message']}")
+
+    def _stop(self, reason: str):
+        if self.stop_reason is None:
+            self.stop_reason = reason
+            self.status = "stopped"
+            logger.warning(f"{self.prefix}Treino interrompido — {reason}")
+            self.save()
+
+    def state(self) -> dict:
+        return {"status": self.status, "stop_reason": self.stop_reason,
+                "num_stages": self.num_stages, "completed": self.completed,
+                "current": self.current, "stages": self.stages, "loaded": self.loaded,
+                "elapsed_s": self.elapsed, "errors": self.errors, "params": self.params,
+                "updated": round(time.time(), 3)}
+
+    def save(self):
+        if self.progress_path:
+            save_cache(self.progress_path, self.state())
@@ -1,64 +1,42 @@
 # app/core/trainer.py
-import os, re, struct, subprocess, math
+import os, subprocess, math
 from typing import Tuple
-import cv2
 
 from app.services.logger import get_logger
+from app.services.dataset_index import scan_annotations
+from app.services.metrics import METRICS
+from app.core.build_cache import BuildCache
+from app.core.model_registry import ModelRegistry
+from app.core.train_monitor import TrainMonitor
+from app.core.vec_file import write_samples, read_header
+from app.core.augment import augment_to_vec
+from app.utils.annotation_utils import read_positives_txt
 from app.utils.file_utils import list_images
 from app.config.settings import (
     BASE_DIR, POSITIVE_PATH, NEGATIVE_PATH, ANNOTATIONS_PATH,
-    VEC_FILE_PATH, MODEL_DIR, TRAINING_PARAMS,
-    CREATESAMPLES_EXE, TRAINCASCADE_EXE,
+    VEC_FILE_PATH, CASCADE_XML_PATH, MODEL_DIR, CACHE_DIR, TRAINING_PARAMS, VEC_PARAMS,
+    TRAINCASCADE_EXE, METRICS_PARAMS, METRICS_PATH, TRAIN_MONITOR_PARAMS, AUGMENT_PARAMS,
 )
 
 logger = get_logger(__name__)
 
 # ───────────────────────────────────────────────────────── #
-def build_positives_txt() -> Tuple[str, int]:
+def build_positives_txt(annotations_path: str = ANNOTATIONS_PATH,
+                        images_path: str = POSITIVE_PATH,
+                        cache_path: str = None) -> Tuple[str, int]:
     """Gera positives.txt e valida todas as caixas anotadas."""
-    info = os.path.join(ANNOTATIONS_PATH, "positives.txt")
+    info = os.path.join(annotations_path, "positives.txt")
     lines = []
 
-    for ann in os.listdir(ANNOTATIONS_PATH):
-        if ann == "positives.txt" or not ann.endswith(".txt"):
-            continue
-
-        base = ann[:-4]
-        img_abs = next(
-            (os.path.join(POSITIVE_PATH, f)
-             for f in os.listdir(POSITIVE_PATH)
-             if os.path.splitext(f)[0] == base
-             and os.path.splitext(f)[1].lower() in (".jpg", ".jpeg", ".png")),
-            None
-        )
-        if not img_abs:
-            logger.warning(f"Ignorada '{ann}': imagem não encontrada")
-            continue
-
-        ann_vals = open(os.path.join(ANNOTATIONS_PATH, ann),
-                        encoding="utf-8").read().strip().split()
-        if len(ann_vals) < 5 or (len(ann_vals) - 1) % 4:
-            logger.warning(f"Ignorada '{ann}': formato inválido")
+    scanned = scan_annotations(annotations_path, images_path,
+                               cache_path=cache_path or os.path.join(CACHE_DIR, "positives_index.json"))
+    for ann, img_abs, result in scanned:
+        if "error" in result:
+            logger.warning(f"Ignorada '{ann}': {result['error']}")
             continue
 
-        img = cv2.imread(img_abs)
-        if img is None:
-            logger.warning(f"Ignorada '{ann}': imagem corrompida")
-            continue
-        ih, iw = img.shape[:2]
-
-        ok = True
-        for i in range(1, len(ann_vals), 4):
-            x, y, w, h = map(int, ann_vals[i:i+4])
-            if w <= 0 or h <= 0 or x < 0 or y < 0 or x+w > iw or y+h > ih:
-                ok = False
-                break
-        if not ok:
-            logger.warning(f"Ignorada '{ann}': bbox fora dos limites")
-            continue
-
-        rel = os.path.relpath(img_abs, ANNOTATIONS_PATH).replace("\\", "/")
-        lines.append(f"{rel} {' '.join(ann_vals)}")
+        rel = os.path.relpath(img_abs, annotations_path).replace("\\", "/")
+        lines.append(f"{rel} {' '.join(result['values'])}")
 
     if not lines:
         raise RuntimeError("Nenhuma anotação válida em /annotations")
@@ -69,51 +47,51 @@ def build_positives_txt() -> Tuple[str, int]:
     return info, len(lines)
 
 # ───────────────────────────────────────────────────────── #
-def create_vec(info_path: str, n_lines: int) -> int:
+def create_vec(info_path: str, n_lines: int, vec_path: str = VEC_FILE_PATH,
+               params: dict = TRAINING_PARAMS) -> int:
     """
-    Gera .vec; aumenta fator (aug) automaticamente até ter
-    amostras ≥ 3×numStages·1.1 (10 % de folga)
+    Gera o .vec em Python (recortes em paralelo, gravação via memmap).
+    Com AUGMENT_PARAMS["per_box"] > 0, acrescenta as variações do motor de
+    aumento (deformações, fotometria, fundos de negativos) logo após os recortes.
+    Enquanto houver menos de 3×numStages·1.1 amostras (10 % de folga),
+    acrescenta uma rodada de variações aumentadas ao mesmo arquivo.
     """
-    stages = TRAINING_PARAMS["num_stages"]
+    stages = params["num_stages"]
     min_required = math.ceil(3 * stages * 1.1)
+    w, h = params["width"], params["height"]
+    positives = read_positives_txt(info_path)
+
+    vec_real = write_samples(vec_path, positives, w, h,
+                             workers=VEC_PARAMS["workers"] or None)
+    logger.info(f"Created {vec_real} samples ({n_lines} anotações)")
 
-    # fator inicial
-    aug = 8.0
-    while True:
-        vec_target = max(int(n_lines * aug), n_lines + 200)
-        cmd = [
-            CREATESAMPLES_EXE,
-            "-info", os.path.basename(info_path),
-            "-num",  str(vec_target),
-            "-w",    str(TRAINING_PARAMS["width"]),
-            "-h",    str(TRAINING_PARAMS["height"]),
-            "-vec",  VEC_FILE_PATH,
-        ]
-        res = subprocess.run(cmd, cwd=ANNOTATIONS_PATH,
-                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if res.returncode:
-            logger.error(res.stderr)
-            raise RuntimeError("createsamples falhou")
-
-        m = re.search(r"Created\s+(\d+)\s+samples", res.stdout)
-        vec_real = int(m.group(1)) if m else vec_target
-        logger.info(f"Created {vec_real} samples (aug={aug:.1f})")
+    if AUGMENT_PARAMS["per_box"]:
+        vec_real = augment_to_vec(vec_path, positives, w, h,
+                                  negatives=list_images(NEGATIVE_PATH), append=True)
 
+    for rnd in range(1, VEC_PARAMS["max_rounds"] + 1):
         if vec_real >= min_required:
             return vec_real
+        logger.warning("Poucas amostras. Acrescentando variações aumentadas ao .vec…")
+        vec_real = write_samples(vec_path, positives, w, h,
+                                 variants=VEC_PARAMS["variants"],
+                                 jitter=VEC_PARAMS["jitter"],
+                                 seed=VEC_PARAMS["seed"] + rnd,
+                                 append=True, workers=VEC_PARAMS["workers"] or None)
+        logger.info(f"Total no .vec: {vec_real} amostras (rodada {rnd})")
 
-        aug *= 1.5        # aumenta e tenta novamente
-        logger.warning("Poucas amostras. Aumentando aug e recriando .vec…")
+    if vec_real < min_required:
+        raise RuntimeError(f"Apenas {vec_real} amostras após {VEC_PARAMS['max_rounds']} rodadas")
+    return vec_real
 
 # ───────────────────────────────────────────────────────── #
 def vec_count(path: str) -> int:
-    with open(path, "rb") as f:
-        return struct.unpack("<I", f.read(4))[0]
+    return read_header(path)[0]
 
 # ───────────────────────────────────────────────────────── #
-def ensure_bg_txt() -> str:
+def ensure_bg_txt(force: bool = False) -> str:
     bg = os.path.join(NEGATIVE_PATH, "bg.txt")
-    if os.path.exists(bg):
+    if os.path.exists(bg) and not force:
         return bg
     rels = [os.path.relpath(p, BASE_DIR).replace("\\", "/")
             for p in list_images(NEGATIVE_PATH, (".jpg", ".jpeg", ".png"))]
@@ -123,8 +101,9 @@ def ensure_bg_txt() -> str:
     return bg
 
 # ───────────────────────────────────────────────────────── #
-def train(vec_real: int):
-    stages = TRAINING_PARAMS["num_stages"]
+def sample_counts(vec_real: int, params: dict = TRAINING_PARAMS) -> Tuple[int, int]:
+    """(numPos, numNeg) para o traincascade a partir das amostras disponíveis."""
+    stages = params["num_stages"]
     min_pos = 3 * stages
     if vec_real < min_pos:
         raise RuntimeError(
@@ -134,48 +113,205 @@ def train(vec_real: int):
     num_pos = max(min_pos, int(vec_real * 0.8))
     num_neg = min(
         sum(1 for _ in open(ensure_bg_txt()) if _.strip()),
-        TRAINING_PARAMS["num_negative"]
+        params["num_negative"]
     )
+    return num_pos, num_neg
 
-    logger.info(f"→ Treinando (stages={stages}, numPos={num_pos}, numNeg={num_neg})")
 
-    cmd = [
+def traincascade_cmd(params: dict, data_dir: str, vec_path: str,
+                     num_pos: int, num_neg: int) -> list:
+    return [
         TRAINCASCADE_EXE,
-        "-data", MODEL_DIR,
-        "-vec",  VEC_FILE_PATH,
+        "-data", data_dir,
+        "-vec",  vec_path,
         "-bg",   ensure_bg_txt(),
         "-numPos", str(num_pos),
         "-numNeg", str(num_neg),
-        "-numStages", str(stages),
-        "-featureType", TRAINING_PARAMS["feature_type"],
-        "-minHitRate",  str(TRAINING_PARAMS["min_hit_rate"]),
-        "-maxFalseAlarmRate", str(TRAINING_PARAMS["max_false_alarm_rate"]),
-        "-w", str(TRAINING_PARAMS["width"]),
-        "-h", str(TRAINING_PARAMS["height"]),
-        "-precalcValBufSize", str(TRAINING_PARAMS["precalcValBufSize"]),
-        "-precalcIdxBufSize", str(TRAINING_PARAMS["precalcIdxBufSize"]),
-        "-mode", TRAINING_PARAMS["mode"],
+        "-numStages", str(params["num_stages"]),
+        "-featureType", params["feature_type"],
+        "-minHitRate",  str(params["min_hit_rate"]),
+        "-maxFalseAlarmRate", str(params["max_false_alarm_rate"]),
+        "-w", str(params["width"]),
+        "-h", str(params["height"]),
+        "-precalcValBufSize", str(params["precalcValBufSize"]),
+        "-precalcIdxBufSize", str(params["precalcIdxBufSize"]),
+        "-mode", params["mode"],
     ]
-    res = subprocess.run(cmd, cwd=BASE_DIR,
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    logger.info(res.stdout)
-    if res.returncode or "ERROR" in res.stderr.upper():
-        logger.error(res.stderr)
-        raise RuntimeError("traincascade falhou")
-    logger.info("✔ Treinamento finalizado — cascade.xml salvo em /model")
+
+
+def run_traincascade(cmd: list, log_path: str = None, prefix: str = "", env: dict = None,
+                     progress_path: str = None, monitor: TrainMonitor = None) -> dict:
+    """
+    Roda o traincascade lendo a saída linha a linha: a saída bruta vai para
+    `log_path` (e para o log em nível debug), os estágios viram eventos no
+    arquivo de progresso. Se o monitor pedir parada (overtraining, estágio
+    que não converge), o processo é encerrado e, com
+    TRAIN_MONITOR_PARAMS["finalize"], o cascade.xml é montado com os
+    estágios já concluídos.
+    :return: estado final do monitor (estágios, tempos, motivo da parada)
+    :raises RuntimeError: se o processo falhar
+    """
+    monitor = monitor or TrainMonitor(progress_path, prefix=prefix)
+    log = open(log_path, "a", encoding="utf-8") if log_path else None
+    try:
+        with subprocess.Popen(cmd, cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              text=True, bufsize=1, env={**os.environ, **(env or {})}) as proc:
+            for line in proc.stdout:
+                if log:
+                    log.write(line)
+                    log.flush()
+                if line.strip():
+                    logger.debug(f"{prefix}{line.rstrip()}")
+                monitor.feed(line)
+                if monitor.stop_reason and proc.poll() is None:
+                    proc.terminate()
+    finally:
+        if log:
+            log.close()
+
+    if monitor.stop_reason:
+        completed = monitor.completed
+        if not completed:
+            monitor.save()
+            raise RuntimeError(f"{prefix}treino parado antes do primeiro estágio: {monitor.stop_reason}")
+        if TRAIN_MONITOR_PARAMS["finalize"] and "-numStages" in cmd:
+            # com numStages ≤ estágios em disco o traincascade só monta o cascade.xml
+            final = list(cmd)
+            final[final.index("-numStages") + 1] = str(completed)
+            logger.info(f"{prefix}Montando cascade.xml com {completed} estágio(s)")
+            try:
+                subprocess.run(final, cwd=BASE_DIR, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, env={**os.environ, **(env or {})},
+                               check=True)
+            except subprocess.CalledProcessError as err:
+                monitor.status = "error"
+                monitor.save()
+                raise RuntimeError(f"{prefix}falha ao montar o cascade.xml com {completed} "
+                                   f"estágio(s) (código {err.returncode})") from err
+    elif proc.returncode or monitor.errors:
+        monitor.status = "error"
+        monitor.save()
+        raise RuntimeError(f"{prefix}traincascade falhou (código {proc.returncode})")
+    else:
+        monitor.status = "done"
+    monitor.save()
+    return monitor.state()
+
+
+def train(vec_real: int) -> dict:
+    """Roda o opencv_traincascade; devolve as contagens de amostras usadas."""
+    num_pos, num_neg = sample_counts(vec_real)
+    logger.info(f"→ Treinando (stages={TRAINING_PARAMS['num_stages']}, "
+                f"numPos={num_pos}, numNeg={num_neg})")
+
+    progress = run_traincascade(traincascade_cmd(TRAINING_PARAMS, MODEL_DIR, VEC_FILE_PATH,
+                                                 num_pos, num_neg),
+                                log_path=os.path.join(MODEL_DIR, "train.log"),
+                                progress_path=os.path.join(MODEL_DIR, "progress.json"))
+    logger.info(f"✔ Treinamento finalizado ({progress['completed']} estágio(s)) — "
+                f"cascade.xml salvo em /model (saída completa em /model/train.log)")
+    return {"vec": vec_real, "num_pos": num_pos, "num_neg": num_neg,
+            "stages": progress["completed"], "stop_reason": progress["stop_reason"]}
 
 # ───────────────────────────────────────────────────────── #
-def run_trainer():
-    info, lines = build_positives_txt()
+def clear_stage_files():
+    """Remove estágios parciais do traincascade (entradas mudaram, não dá p/ retomar)."""
+    for name in os.listdir(MODEL_DIR) if os.path.isdir(MODEL_DIR) else []:
+        if name == "params.xml" or (name.startswith("stage") and name.endswith(".xml")):
+            os.remove(os.path.join(MODEL_DIR, name))
+
+
+def run_trainer(force: bool = False):
+    """
+    Build incremental: annotations → positives.txt → .vec → bg.txt → cascade.
+    Cada etapa só roda se o hash das entradas/parâmetros mudou (ou force=True).
+    """
+    cache = BuildCache()
+
+    def fresh(stage, key, outputs):
+        return not force and cache.is_fresh(stage, key, outputs)
+
+    # positives.txt ← anotações + imagens positivas
+    info = os.path.join(ANNOTATIONS_PATH, "positives.txt")
+    annotations = [os.path.join(ANNOTATIONS_PATH, n) for n in os.listdir(ANNOTATIONS_PATH)
+                   if n.endswith(".txt") and n != "positives.txt"]
+    pos_key = cache.files_key(annotations + list_images(POSITIVE_PATH))
+    if fresh("positives", pos_key, [info]):
+        lines = cache.get("positives", "lines")
+        logger.info("positives.txt em dia — etapa pulada")
+    else:
+        with METRICS.timer("train_positives"):
+            info, lines = build_positives_txt()
+        cache.mark("positives", pos_key, lines=lines)
     logger.info(f"Positivos válidos: {lines}")
 
-    vec_real = create_vec(info, lines)
+    # .vec ← positives.txt + tamanho da janela + parâmetros de geração
+    # (+ negativos, que viram fundo das amostras aumentadas)
+    bg_key = cache.files_key(list_images(NEGATIVE_PATH))
+    vec_key = cache.digest(pos_key, TRAINING_PARAMS["width"], TRAINING_PARAMS["height"],
+                           TRAINING_PARAMS["num_stages"], VEC_PARAMS,
+                           *((AUGMENT_PARAMS, bg_key) if AUGMENT_PARAMS["per_box"] else ()))
+    if fresh("vec", vec_key, [VEC_FILE_PATH]):
+        vec_real = vec_count(VEC_FILE_PATH)
+        logger.info(".vec em dia — etapa pulada")
+    else:
+        with METRICS.timer("train_vec"):
+            vec_real = create_vec(info, lines)
+        header = vec_count(VEC_FILE_PATH)
+        if header != vec_real:
+            # o traincascade confia no cabeçalho: treinar assim lê lixo ou estoura
+            raise RuntimeError(f".vec inconsistente: cabeçalho com {header} amostras, "
+                               f"{vec_real} gravadas ({VEC_FILE_PATH})")
+        cache.mark("vec", vec_key)
     logger.info(f"Amostras geradas: {vec_real}")
 
-    if vec_count(VEC_FILE_PATH) != vec_real:
-        logger.warning("Inconsistência no cabeçalho do .vec (ok para LBP)")
+    # bg.txt ← imagens negativas
+    bg = os.path.join(NEGATIVE_PATH, "bg.txt")
+    if not fresh("bg", bg_key, [bg]):
+        with METRICS.timer("train_bg"):
+            ensure_bg_txt(force=True)
+        cache.mark("bg", bg_key)
+
+    # cascade ← .vec + bg.txt + TRAINING_PARAMS (buffers não alteram o resultado)
+    params = {k: v for k, v in TRAINING_PARAMS.items() if not k.startswith("precalc")}
+    data_key = cache.digest(vec_key, bg_key, {k: v for k, v in params.items() if k != "num_stages"})
+    cascade_key = cache.digest(data_key, params["num_stages"])
+    if fresh("cascade", cascade_key, [CASCADE_XML_PATH]):
+        logger.info("cascade.xml em dia — treinamento pulado")
+        return
+    if fresh("cascade_stopped", cascade_key, [CASCADE_XML_PATH]):
+        # retomar pararia de novo pelo mesmo critério e registraria o mesmo cascade truncado
+        logger.warning(f"Treino com estas entradas já parou com "
+                       f"{cache.get('cascade_stopped', 'stages')} estágio(s) "
+                       f"({cache.get('cascade_stopped', 'reason')}) — pulado; "
+                       f"mude os dados/parâmetros ou use force=True")
+        return
+
+    # Mesmos dados e parâmetros: o traincascade retoma dos stageN.xml já prontos
+    if force or cache.get("cascade_data") != data_key:
+        clear_stage_files()
+        cache.mark("cascade_data", data_key)
+    else:
+        logger.info("Retomando treinamento a partir dos estágios existentes em /model")
 
-    train(vec_real)
+    with METRICS.timer("train_cascade"):
+        samples = train(vec_real)
+    metadata = {"training_params": TRAINING_PARAMS, "samples": samples, "build_key": cascade_key}
+    if samples["stop_reason"]:
+        # cascade truncado: não conta como build em dia nem substitui o modelo ativo
+        meta = ModelRegistry().register(CASCADE_XML_PATH, metadata=metadata, activate=False)
+        cache.mark("cascade_stopped", cascade_key, reason=samples["stop_reason"],
+                   stages=samples["stages"], version=meta["version"])
+        logger.warning(f"⚠ Treino parado com {samples['stages']}/{TRAINING_PARAMS['num_stages']} "
+                       f"estágio(s) ({samples['stop_reason']}). Registrado como "
+                       f"{meta['name']}/{meta['version']} sem ativar; para usá-lo: "
+                       f"python -m app.core.model_registry activate {meta['name']} {meta['version']}")
+    else:
+        cache.mark("cascade", cascade_key)
+        # versão imutável no registro; detectores ligados ao modelo trocam sozinhos
+        ModelRegistry().register(CASCADE_XML_PATH, metadata=metadata)
+    if METRICS_PARAMS["export"]:
+        METRICS.export(METRICS_PATH, "training")
 
 # ───────────────────────────────────────────────────────── #
 if __name__ == "__main__":
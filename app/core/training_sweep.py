@@ -0,0 +1,173 @@
+# app/core/training_sweep.py
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.services.logger import get_logger
+from app.core.evaluation import param_grid, load_annotated, evaluate_grid
+from app.core.model_registry import ModelRegistry
+from app.core.trainer import (build_positives_txt, create_vec, ensure_bg_txt, sample_counts,
+                              traincascade_cmd, run_traincascade)
+from app.config.settings import SWEEP_PATH, SWEEP_PARAMS, TRAINING_PARAMS, DETECTION_PARAMS
+
+logger = get_logger(__name__)
+
+
+def job_name(overrides: dict) -> str:
+    """Nome estável do job a partir dos parâmetros que variam (vira nome de pasta)."""
+    parts = []
+    for key, value in overrides.items():
+        if key == "window":
+            parts.append(f"{value[0]}x{value[1]}")
+        elif key == "feature_type":
+            parts.append(str(value).lower())
+        else:
+            short = "".join(w[0] for w in key.split("_"))
+            parts.append(f"{short}{value}")
+    return "_".join(parts) or "default"
+
+
+def sweep_jobs(grid: dict = None) -> list:
+    """
+    Uma configuração de treino por ponto da grade: TRAINING_PARAMS com os
+    valores da grade por cima ("window" define width e height).
+    """
+    jobs = []
+    for overrides in param_grid(grid or SWEEP_PARAMS["grid"]):
+        params = {**TRAINING_PARAMS, **{k: v for k, v in overrides.items() if k != "window"}}
+        if "window" in overrides:
+            params["width"], params["height"] = overrides["window"]
+        jobs.append({"name": job_name(overrides), "overrides": overrides, "params": params})
+    return jobs
+
+
+def plan_resources(n_jobs: int, jobs: int = None, memory_mb: int = None, cpus: int = None) -> dict:
+    """
+    Divide CPU e RAM entre os treinos simultâneos: o nº de jobs é limitado
+    para que cada um tenha ao menos `min_buffer_mb` por buffer dentro de
+    `memory_mb`; o orçamento é repartido igualmente entre precalcValBufSize
+    e precalcIdxBufSize, e os núcleos entre os jobs (OPENCV_FOR_THREADS_NUM).
+    :raises ValueError: se `memory_mb` não comporta nem um job com os buffers mínimos
+    """
+    cpus = cpus or os.cpu_count() or 1
+    memory_mb = memory_mb or SWEEP_PARAMS["memory_mb"]
+    floor = SWEEP_PARAMS["min_buffer_mb"]
+    if memory_mb < 2 * floor:
+        raise ValueError(f"memory_mb={memory_mb} abaixo do mínimo de um job "
+                         f"(2 × min_buffer_mb = {2 * floor} MB)")
+    jobs = jobs or SWEEP_PARAMS["jobs"] or max(1, cpus // 2)
+    jobs = max(1, min(jobs, n_jobs, memory_mb // (2 * floor), cpus))
+    buffer_mb = max(floor, memory_mb // jobs // 2)
+    return {"jobs": jobs, "threads": max(1, cpus // jobs),
+            "precalcValBufSize": buffer_mb, "precalcIdxBufSize": buffer_mb}
+
+
+def _run_job(job: dict, out_dir: str, vec_path: str, vec_real: int, threads: int) -> dict:
+    """Treina um job no seu próprio diretório (-data, params.json e train.log)."""
+    data_dir = os.path.join(out_dir, job["name"])
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "params.json"), "w", encoding="utf-8") as f:
+        json.dump(job["params"], f, indent=2)
+
+    t0 = time.perf_counter()
+    result = {"name": job["name"], "overrides": job["overrides"], "params": job["params"],
+              "cascade": os.path.join(data_dir, "cascade.xml")}
+    try:
+        num_pos, num_neg = sample_counts(vec_real, job["params"])
+        result["samples"] = {"vec": vec_real, "num_pos": num_pos, "num_neg": num_neg}
+        cmd = traincascade_cmd(job["params"], data_dir, vec_path, num_pos, num_neg)
+        result["progress"] = run_traincascade(
+            cmd, log_path=os.path.join(data_dir, "train.log"),
+            progress_path=os.path.join(data_dir, "progress.json"), prefix=f"[{job['name']}] ",
+            env={"OPENCV_FOR_THREADS_NUM": str(threads), "OMP_NUM_THREADS": str(threads)})
+        result["status"] = "ok" if os.path.exists(result["cascade"]) else "error"
+    except (OSError, RuntimeError) as err:
+        logger.error(f"[{job['name']}] {err}")
+        result.update(status="error", error=str(err))
+    result["seconds"] = round(time.perf_counter() - t0, 1)
+    return result
+
+
+def rank(results: list, samples: list = None) -> list:
+    """
+    Avalia os cascades treinados nas imagens anotadas (P/R/F1 e latência com
+    DETECTION_PARAMS) e ordena por F1 e, no empate, pela latência média.
+    As anotações são as mesmas do treino: o ranking compara as configurações
+    entre si, não mede a generalização.
+    """
+    samples = load_annotated() if samples is None else samples
+    grid = {k: [DETECTION_PARAMS[k]] for k in ("scaleFactor", "workingSize", "maxScaleLevels")}
+    ranked = []
+    for result in results:
+        if result["status"] != "ok":
+            continue
+        row = evaluate_grid(grid, samples, cascade_path=result["cascade"])["rows"][0]
+        result["eval"] = {k: row[k] for k in ("precision", "recall", "f1", "mean_ms", "p95_ms")}
+        ranked.append(result)
+    return sorted(ranked, key=lambda r: (-r["eval"]["f1"], r["eval"]["mean_ms"]))
+
+
+def run_sweep(grid: dict = None, jobs: int = None, memory_mb: int = None,
+              out_dir: str = None, register: bool = True) -> dict:
+    """
+    Treina em paralelo uma configuração por ponto da grade (padrão:
+    SWEEP_PARAMS["grid"]), cada uma num diretório isolado e com a saída do
+    traincascade transmitida ao log em tempo real. No fim, ranqueia os
+    cascades e registra o melhor no registro de modelos (sem ativá-lo).
+    :return: relatório (também gravado em <out_dir>/report.json)
+    """
+    specs = sweep_jobs(grid)
+    plan = plan_resources(len(specs), jobs, memory_mb)
+    for spec in specs:
+        spec["params"]["precalcValBufSize"] = plan["precalcValBufSize"]
+        spec["params"]["precalcIdxBufSize"] = plan["precalcIdxBufSize"]
+    out_dir = out_dir or os.path.join(SWEEP_PATH, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # um .vec por (janela, nº de estágios), compartilhado pelos jobs que o usam
+    info, lines = build_positives_txt()
+    vecs = {}
+    for spec in specs:
+        p = spec["params"]
+        key = (p["width"], p["height"], p["num_stages"])
+        if key not in vecs:
+            path = os.path.join(out_dir, f"vec_{p['width']}x{p['height']}_s{p['num_stages']}.vec")
+            vecs[key] = (path, create_vec(info, lines, path, p))
+        spec["vec"] = vecs[key]
+    # bg.txt criado aqui, uma vez: os jobs só o leem (criá-lo nas threads seria corrida)
+    ensure_bg_txt()
+
+    logger.info(f"Varredura: {len(specs)} configuração(ões), {plan['jobs']} simultânea(s), "
+                f"{plan['threads']} thread(s) e 2×{plan['precalcValBufSize']} MB por job → {out_dir}")
+    results = []
+    with ThreadPoolExecutor(max_workers=plan["jobs"]) as pool:
+        futures = [pool.submit(_run_job, spec, out_dir, *spec["vec"], plan["threads"])
+                   for spec in specs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            logger.info(f"[{done}/{len(specs)}] {result['name']}: {result['status']} "
+                        f"({result['seconds']:.0f} s)")
+
+    ranked = rank(results)
+    for pos, r in enumerate(ranked, 1):
+        e = r["eval"]
+        logger.info(f"#{pos} {r['name']}: F1={e['f1']:.3f} P={e['precision']:.3f} "
+                    f"R={e['recall']:.3f} média={e['mean_ms']:.1f} ms")
+    if register and ranked:
+        best = ranked[0]
+        ModelRegistry().register(best["cascade"], activate=False, metadata={
+            "training_params": best["params"], "samples": best["samples"],
+            "sweep": out_dir, "eval": best["eval"]})
+
+    report = {"out_dir": out_dir, "plan": plan, "results": results,
+              "ranking": [r["name"] for r in ranked]}
+    with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=list)
+    return report
+
+
+if __name__ == "__main__":
+    run_sweep()
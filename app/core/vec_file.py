@@ -0,0 +1,243 @@
+# app/core/vec_file.py
+
+import hashlib
+import math
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Cabeçalho do .vec (opencv_createsamples): count, vecSize (int32) + 2 shorts
+HEADER = struct.Struct("<iihh")
+
+
+def sample_dtype(w: int, h: int) -> np.dtype:
+    """Registro de uma amostra: 1 byte separador + w·h pixels em int16."""
+    return np.dtype([("sep", "u1"), ("img", "<i2", (h, w))])
+
+
+def read_header(path: str):
+    """Retorna (nº de amostras, vecSize) do arquivo .vec."""
+    with open(path, "rb") as f:
+        count, vec_size, _, _ = HEADER.unpack(f.read(HEADER.size))
+    return count, vec_size
+
+
+class VecWriter:
+    """
+    Escreve amostras em um .vec via memmap, em blocos.
+    Com append=True continua um arquivo existente em vez de recriá-lo.
+    """
+
+    def __init__(self, path: str, w: int, h: int, append: bool = False):
+        self.path = path
+        self.w, self.h = w, h
+        self.dtype = sample_dtype(w, h)
+        self.count = 0
+
+        if append and os.path.exists(path):
+            count, vec_size = read_header(path)
+            if vec_size != w * h:
+                raise ValueError(f"vecSize {vec_size} incompatível com {w}x{h}")
+            self.count = count
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(0, w * h, 0, 0))
+
+    def write(self, samples) -> int:
+        """Acrescenta amostras (N, h, w) uint8. Retorna o total no arquivo."""
+        samples = np.asarray(samples).reshape(-1, self.h, self.w)
+        n = len(samples)
+        if not n:
+            return self.count
+
+        offset = HEADER.size + self.count * self.dtype.itemsize
+        with open(self.path, "r+b") as f:
+            f.truncate(offset + n * self.dtype.itemsize)
+
+        block = np.memmap(self.path, dtype=self.dtype, mode="r+", offset=offset, shape=(n,))
+        block["sep"] = 0
+        block["img"] = samples
+        block.flush()
+        del block
+
+        self.count += n
+        self._write_count()
+        return self.count
+
+    def _write_count(self):
+        with open(self.path, "r+b") as f:
+            f.write(struct.pack("<i", self.count))
+
+
+def _digest(sample) -> bytes:
+    return hashlib.blake2b(sample.tobytes(), digest_size=16).digest()
+
+
+class VecReader:
+    """
+    Leitura de .vec via memmap, sem carregar o arquivo na RAM.
+    `samples` é uma view zero-copy (N, h, w) int16 sobre o arquivo.
+    """
+
+    def __init__(self, path: str, w: int = None, h: int = None):
+        self.path = path
+        count, vec_size = read_header(path)
+        if w is None and h is None:
+            side = math.isqrt(vec_size)
+            if side * side != vec_size:
+                raise ValueError(f"vecSize {vec_size} não é quadrado; informe w e h")
+            w = h = side
+        elif w is None or h is None or w * h != vec_size:
+            raise ValueError(f"vecSize {vec_size} incompatível com {w}x{h}")
+
+        self.w, self.h = w, h
+        self._records = np.memmap(path, dtype=sample_dtype(w, h), mode="r",
+                                  offset=HEADER.size, shape=(count,))
+        self.samples = self._records["img"]
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        """Acesso aleatório/fatiamento; fatias simples continuam sendo views."""
+        return self.samples[index]
+
+    def iter_chunks(self, chunk: int = 4096):
+        """Percorre as amostras em blocos (start, view)."""
+        for start in range(0, len(self), chunk):
+            yield start, self.samples[start:start + chunk]
+
+    def hashes(self, chunk: int = 4096) -> list:
+        """Hash (blake2b, 16 bytes) do conteúdo de cada amostra."""
+        out = []
+        for _, block in self.iter_chunks(chunk):
+            block = np.ascontiguousarray(block)
+            out.extend(_digest(s) for s in block)
+        return out
+
+    def unique_indices(self) -> np.ndarray:
+        """Índices da primeira ocorrência de cada amostra distinta."""
+        seen, keep = set(), []
+        for i, digest in enumerate(self.hashes()):
+            if digest not in seen:
+                seen.add(digest)
+                keep.append(i)
+        return np.asarray(keep, dtype=np.intp)
+
+    def write_subset(self, out_path: str, indices=None, chunk: int = 4096) -> int:
+        """Copia as amostras escolhidas (todas se None) para outro .vec, em blocos."""
+        writer = VecWriter(out_path, self.w, self.h)
+        if indices is None:
+            for _, block in self.iter_chunks(chunk):
+                writer.write(block)
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+            for start in range(0, len(indices), chunk):
+                writer.write(self.samples[np.sort(indices[start:start + chunk])])
+        return writer.count
+
+    def split(self, train_path: str, val_path: str,
+              val_fraction: float = 0.2, seed: int = 0):
+        """Divide em treino/validação (embaralhamento semeado)."""
+        order = np.random.default_rng(seed).permutation(len(self))
+        n_val = int(round(len(self) * val_fraction))
+        return (self.write_subset(train_path, np.sort(order[n_val:])),
+                self.write_subset(val_path, np.sort(order[:n_val])))
+
+
+def merge_vec(paths: list, out_path: str, dedupe: bool = False, chunk: int = 4096) -> int:
+    """
+    Junta vários .vec (mesmo w×h) em streaming, opcionalmente sem duplicatas.
+    :return: total de amostras no arquivo final
+    """
+    readers = [VecReader(p) for p in paths]
+    if not readers:
+        raise ValueError("nenhum .vec informado")
+    w, h = readers[0].w, readers[0].h
+    if any((r.w, r.h) != (w, h) for r in readers):
+        raise ValueError("arquivos .vec com tamanhos de amostra diferentes")
+
+    writer = VecWriter(out_path, w, h)
+    seen = set()
+    for reader in readers:
+        for _, block in reader.iter_chunks(chunk):
+            if dedupe:
+                block = np.ascontiguousarray(block)
+                keep = []
+                for i, s in enumerate(block):
+                    digest = _digest(s)
+                    if digest not in seen:
+                        seen.add(digest)
+                        keep.append(i)
+                block = block[keep]
+            writer.write(block)
+
+    logger.info(f"{len(readers)} arquivo(s) .vec unidos em {out_path}: {writer.count} amostras")
+    return writer.count
+
+
+def crop_samples(img_path: str, boxes, w: int, h: int,
+                 variants: int = 0, jitter: float = 0.05, seed=0) -> np.ndarray:
+    """
+    Recorta as caixas de uma imagem e redimensiona para w×h (cinza).
+    Com variants > 0 gera, por caixa, versões com deslocamento/escala e
+    brilho aleatórios (RNG semeado: mesmo seed → mesmas amostras).
+    """
+    gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return np.empty((0, h, w), np.uint8)
+
+    ih, iw = gray.shape
+    rng = np.random.default_rng(seed)
+    out = []
+    for (x, y, bw, bh) in boxes:
+        for _ in range(variants or 1):
+            cx, cy, sw, sh = x + bw / 2, y + bh / 2, bw, bh
+            if variants:
+                cx += rng.uniform(-jitter, jitter) * bw
+                cy += rng.uniform(-jitter, jitter) * bh
+                s = 1 + rng.uniform(-2 * jitter, 2 * jitter)
+                sw, sh = bw * s, bh * s
+            x0, y0 = int(max(0, cx - sw / 2)), int(max(0, cy - sh / 2))
+            x1, y1 = int(min(iw, cx + sw / 2)), int(min(ih, cy + sh / 2))
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                continue
+
+            crop = cv2.resize(gray[y0:y1, x0:x1], (w, h), interpolation=cv2.INTER_AREA)
+            if variants:
+                gain, bias = rng.uniform(0.8, 1.2), rng.uniform(-20, 20)
+                crop = cv2.convertScaleAbs(crop, alpha=gain, beta=bias)
+            out.append(crop)
+
+    return np.asarray(out, np.uint8).reshape(-1, h, w)
+
+
+def _crop_task(args):
+    return crop_samples(*args)
+
+
+def write_samples(path: str, positives: list, w: int, h: int,
+                  variants: int = 0, jitter: float = 0.05, seed: int = 0,
+                  append: bool = False, workers: int = None) -> int:
+    """
+    Gera amostras em paralelo e as grava em streaming no .vec.
+    :param positives: lista de (caminho da imagem, caixas) — ver read_positives_txt
+    :return: total de amostras no arquivo
+    """
+    writer = VecWriter(path, w, h, append=append)
+    tasks = [(img, boxes, w, h, variants, jitter, (seed, i))
+             for i, (img, boxes) in enumerate(positives)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for samples in pool.map(_crop_task, tasks, chunksize=8):
+            writer.write(samples)
+
+    return writer.count
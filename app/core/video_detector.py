@@ -0,0 +1,273 @@
+# app/core/video_detector.py
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from app.services.logger import get_logger
+from app.services.metrics import METRICS
+from app.utils.file_utils import ensure_dir
+from app.core.detector import load_detector, to_gray, draw_boxes
+from app.config.settings import CASCADE_XML_PATH, VIDEO_PARAMS, BASE_DIR
+
+logger = get_logger(__name__)
+
+# pasta onde os frames detectados são salvos
+WEBCAM_DIR = os.path.join(BASE_DIR, "dataset", "results", "webcam")
+
+_STOP = object()  # sentinela de fim de fila
+
+
+class FrameGrabber:
+    """
+    Thread de captura que mantém sempre o frame mais recente.
+    Em webcams frames antigos são descartados; em arquivos de vídeo
+    (drop_frames=False) a leitura espera o consumidor para não pular frames.
+    """
+
+    def __init__(self, source, drop_frames: bool = True):
+        self.cap = cv2.VideoCapture(source)
+        self.drop_frames = drop_frames
+        self.running = False
+        self._cond = threading.Condition()
+        self._frame = None
+        self._index = -1
+        self._consumed = -1
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self) -> bool:
+        if not self.cap.isOpened():
+            return False
+        self.running = True
+        self._thread.start()
+        return True
+
+    def _loop(self):
+        while self.running:
+            ok, frame = self.cap.read()
+            with self._cond:
+                if not ok:
+                    self.running = False
+                    self._cond.notify_all()
+                    break
+                if not self.drop_frames:
+                    self._cond.wait_for(lambda: not self.running or self._consumed >= self._index)
+                self._frame = frame
+                self._index += 1
+                self._cond.notify_all()
+
+    def read(self, last_index: int, timeout: float = 1.0):
+        """
+        Espera um frame mais novo que `last_index`.
+        :return: (índice, frame) ou (None, None) se nada chegou no timeout
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._index > last_index or not self.running, timeout)
+            if self._index <= last_index:
+                return None, None
+            self._consumed = self._index
+            self._cond.notify_all()
+            return self._index, self._frame
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.cap.release()
+
+
+class BoxTracker:
+    """
+    Rastreamento barato entre detecções: cada caixa é procurada por
+    matchTemplate numa janela ao redor da posição anterior, em escala reduzida.
+    """
+
+    def __init__(self, margin: float = None, size: int = None, min_score: float = None):
+        self.margin = VIDEO_PARAMS["track_margin"] if margin is None else margin
+        self.size = size or VIDEO_PARAMS["track_size"]
+        self.min_score = VIDEO_PARAMS["track_min_score"] if min_score is None else min_score
+        self._templates = []
+
+    def reset(self, gray, boxes):
+        """Guarda os templates das caixas recém-detectadas."""
+        self._templates = []
+        for (x, y, w, h) in boxes:
+            scale = min(1.0, self.size / max(w, h))
+            patch = gray[y:y + h, x:x + w]
+            tpl = cv2.resize(patch, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self._templates.append(((int(x), int(y), int(w), int(h)), scale, tpl))
+
+    def update(self, gray) -> np.ndarray:
+        """Reposiciona as caixas no novo frame; caixas perdidas são descartadas."""
+        ih, iw = gray.shape[:2]
+        kept = []
+        for (x, y, w, h), scale, tpl in self._templates:
+            mx, my = int(w * self.margin), int(h * self.margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(iw, x + w + mx), min(ih, y + h + my)
+            window = cv2.resize(gray[y0:y1, x0:x1], None, fx=scale, fy=scale,
+                                interpolation=cv2.INTER_AREA)
+            if window.shape[0] < tpl.shape[0] or window.shape[1] < tpl.shape[1]:
+                continue
+
+            res = cv2.matchTemplate(window, tpl, cv2.TM_CCOEFF_NORMED)
+            _, score, _, loc = cv2.minMaxLoc(res)
+            if score < self.min_score:
+                continue
+
+            box = (x0 + int(loc[0] / scale), y0 + int(loc[1] / scale), w, h)
+            kept.append((box, scale, tpl))
+
+        self._templates = kept
+        return np.asarray([t[0] for t in kept], dtype=np.int32).reshape(-1, 4)
+
+
+class AsyncFrameWriter:
+    """Grava frames em uma thread separada; descarta quando a fila enche."""
+
+    def __init__(self, out_dir: str = WEBCAM_DIR, max_queue: int = None):
+        ensure_dir(out_dir)
+        self.out_dir = out_dir
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue or VIDEO_PARAMS["save_queue"])
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while (item := self._queue.get()) is not _STOP:
+            name, frame = item
+            with METRICS.timer("encode"):
+                cv2.imwrite(os.path.join(self.out_dir, name), frame)
+
+    def submit(self, name: str, frame) -> bool:
+        try:
+            self._queue.put_nowait((name, frame))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Fila de gravação cheia — frame {name} descartado")
+            return False
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+def run_video(source=0, max_saved: int = 50, detect_every: int = None,
+              show: bool = True, out_dir: str = WEBCAM_DIR,
+              cascade_path: str = CASCADE_XML_PATH) -> dict:
+    """
+    Detecção em tempo real para webcam (índice) ou arquivo de vídeo (caminho).
+    Captura, detecção/rastreamento e gravação rodam em threads separadas;
+    a janela de preview fica na thread principal (exigência do HighGUI).
+    :return: estatísticas da execução
+    :raises RuntimeError: se a detecção/rastreamento falhar (captura e gravação são encerradas antes)
+    """
+    detector = load_detector(cascade_path)
+    if detector is None:
+        return {}
+
+    detect_every = detect_every or VIDEO_PARAMS["detect_every"]
+    grabber = FrameGrabber(source, drop_frames=isinstance(source, int))
+    if not grabber.start():
+        logger.error(f"Fonte de vídeo não disponível: {source}")
+        return {}
+
+    tracker = BoxTracker()
+    writer = AsyncFrameWriter(out_dir)
+    preview = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    stats = {"frames": 0, "detections": 0, "tracked": 0, "skipped": 0, "saved": 0}
+    errors = []
+
+    def detect_loop():
+        # qualquer falha encerra a execução (sem o stop.set() o laço principal não sai)
+        try:
+            last, since_detect = -1, detect_every
+            while not stop.is_set():
+                index, frame = grabber.read(last)
+                if frame is None:
+                    if not grabber.running:
+                        break
+                    continue
+                stats["skipped"] += index - last - 1
+                last = index
+                stats["frames"] += 1
+
+                with METRICS.timer("gray"):
+                    gray = to_gray(frame)
+                if since_detect >= detect_every:
+                    rects = detector.detect(gray)
+                    tracker.reset(gray, rects)
+                    since_detect = 1
+                    stats["detections"] += 1
+                    fresh = True
+                else:
+                    with METRICS.timer("track"):
+                        rects = tracker.update(gray)
+                    since_detect += 1
+                    stats["tracked"] += 1
+                    fresh = False
+
+                frame = draw_boxes(frame.copy(), rects)
+
+                # Salva só frames com detecção completa (não rastreados)
+                if fresh and len(rects):
+                    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+                    if writer.submit(f"det_{ts}.jpg", frame):
+                        stats["saved"] += 1
+                        logger.info(f"[{ts}] {len(rects)} objeto(s) – frame salvo")
+                    if stats["saved"] >= max_saved:
+                        break
+
+                if show:
+                    try:
+                        preview.get_nowait()      # mantém só o frame mais novo
+                    except queue.Empty:
+                        pass
+                    preview.put(frame)
+        except Exception as err:
+            logger.error(f"Falha no laço de detecção: {err!r}")
+            errors.append(err)
+        finally:
+            stop.set()
+
+    start = time.perf_counter()
+    worker = threading.Thread(target=detect_loop, daemon=True)
+    worker.start()
+
+    logger.info("▶️ Pressione ESC para sair.")
+    while not stop.is_set():
+        if not show:
+            worker.join(0.1)
+            continue
+        try:
+            cv2.imshow("Webcam – DETECTOR", preview.get(timeout=0.1))
+        except queue.Empty:
+            pass
+        if cv2.waitKey(1) & 0xFF == 27:    # ESC = sair
+            stop.set()
+
+    worker.join()
+    grabber.stop()
+    writer.close()
+    if show:
+        cv2.destroyAllWindows()
+    if errors:
+        raise RuntimeError(f"Detecção em vídeo interrompida após {stats['frames']} frame(s): "
+                           f"{errors[0]}") from errors[0]
+
+    elapsed = time.perf_counter() - start
+    stats["fps"] = round(stats["frames"] / elapsed, 2) if elapsed else 0.0
+    stats["write_dropped"] = writer.dropped
+    stats["latency"] = METRICS.summary()
+    logger.info(f"➡️ Loop encerrado. Frames: {stats['frames']} ({stats['fps']} fps), "
+                f"salvos: {stats['saved']}, descartados: {stats['skipped']}")
+    return stats
@@ -0,0 +1,118 @@
+# app/services/dataset_index.py
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from app.services.logger import get_logger
+from app.utils.annotation_utils import parse_boxes
+
+logger = get_logger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def index_images(directory: str, extensions: tuple = IMAGE_EXTENSIONS) -> dict:
+    """
+    Varre o diretório uma única vez e monta o mapa nome-base → caminho.
+    Em nomes repetidos (ex.: a.jpg e a.png) vale o primeiro em ordem alfabética.
+    """
+    index = {}
+    with os.scandir(directory) as it:
+        entries = sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+    for entry in entries:
+        base, ext = os.path.splitext(entry.name)
+        if ext.lower() in extensions:
+            index.setdefault(base, entry.path)
+    return index
+
+
+def image_size(path: str):
+    """Lê (largura, altura) só do cabeçalho da imagem, sem decodificar os pixels."""
+    with Image.open(path) as img:
+        return img.size
+
+
+def _stamp(path: str) -> list:
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_cache(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path: str, data: dict):
+    """Grava o cache de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def validate_annotation(ann_path: str, img_path: str) -> dict:
+    """
+    Valida uma anotação contra as dimensões da imagem.
+    :return: dict com "values" (lista de str) ou "error" (motivo)
+    """
+    if img_path is None:
+        return {"error": "imagem não encontrada"}
+
+    with open(ann_path, encoding="utf-8") as f:
+        values = f.read().split()
+    try:
+        boxes = parse_boxes(values)
+    except ValueError:
+        return {"error": "formato inválido"}
+
+    try:
+        iw, ih = image_size(img_path)
+    except (OSError, SyntaxError):
+        return {"error": "imagem corrompida"}
+
+    x, y, w, h = boxes.T
+    if (w <= 0).any() or (h <= 0).any() or (x < 0).any() or (y < 0).any() \
+            or (x + w > iw).any() or (y + h > ih).any():
+        return {"error": "bbox fora dos limites"}
+    return {"values": values}
+
+
+def scan_annotations(annotations_dir: str, images_dir: str,
+                     cache_path: str = None, workers: int = None) -> list:
+    """
+    Valida em paralelo todas as anotações *.txt (exceto positives.txt).
+    Resultados ficam em cache pelo mtime/tamanho da anotação e da imagem.
+    :return: lista ordenada de (nome da anotação, caminho da imagem, resultado)
+    """
+    images = index_images(images_dir)
+    names = sorted(n for n in os.listdir(annotations_dir)
+                   if n.endswith(".txt") and n != "positives.txt")
+    cache = load_cache(cache_path) if cache_path else {}
+
+    def check(name):
+        ann_path = os.path.join(annotations_dir, name)
+        img_path = images.get(name[:-4])
+        stamp = [_stamp(ann_path), _stamp(img_path) if img_path else None, img_path]
+        entry = cache.get(name)
+        if entry and entry["stamp"] == stamp:
+            return name, img_path, entry["result"], stamp
+        return name, img_path, validate_annotation(ann_path, img_path), stamp
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        checked = list(pool.map(check, names))
+
+    hits = sum(1 for name, _, _, stamp in checked
+               if name in cache and cache[name]["stamp"] == stamp)
+    logger.info(f"{len(names)} anotações verificadas ({hits} do cache)")
+
+    if cache_path:
+        save_cache(cache_path, {name: {"stamp": stamp, "result": result}
+                                for name, _, result, stamp in checked})
+    return [(name, img_path, result) for name, img_path, result, _ in checked]
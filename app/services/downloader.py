@@ -0,0 +1,187 @@
+# app/services/downloader.py
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.dataset_index import load_cache, save_cache
+from app.services.logger import get_logger
+from app.utils.file_utils import file_sha256
+from app.config.settings import DOWNLOAD_PARAMS, CACHE_DIR
+
+logger = get_logger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Respostas que valem nova tentativa (as demais 4xx falham na hora)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def url_extension(url: str, default: str = ".jpg") -> str:
+    """
+    Extensão do arquivo de destino. Mesma regra da versão sequencial
+    (URL com query string → .jpg), para reconhecer os arquivos já baixados.
+    """
+    ext = os.path.splitext(url)[-1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else default
+
+
+class Downloader:
+    """
+    Download concorrente com sessão HTTP compartilhada (pool de conexões),
+    limite de conexões simultâneas por host e corpo gravado em streaming.
+    Um manifesto JSON (URL → arquivo, sha256, status) permite retomar:
+    arquivos concluídos são pulados e downloads parciais (.part) continuam
+    via Range quando o servidor suporta.
+    """
+
+    def __init__(self, save_folder: str, manifest_path: str = None, workers: int = None,
+                 per_host: int = None, timeout: float = None, retries: int = None):
+        self.save_folder = save_folder
+        self.manifest_path = manifest_path or os.path.join(
+            CACHE_DIR, f"download_{os.path.basename(os.path.normpath(save_folder))}.json")
+        self.workers = workers or DOWNLOAD_PARAMS["workers"]
+        self.per_host = per_host or DOWNLOAD_PARAMS["per_host"]
+        self.timeout = timeout or DOWNLOAD_PARAMS["timeout"]
+        self.retries = DOWNLOAD_PARAMS["retries"] if retries is None else retries
+
+        self.manifest = load_cache(self.manifest_path)
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._dirty = 0
+        # sha256 → arquivo, para descartar a mesma imagem vinda de outra URL
+        self._hashes = {e["sha256"]: e["file"] for e in self.manifest.values()
+                        if e.get("status") == "done" and e.get("sha256")}
+
+        self.session = requests.Session()
+        # sem Retry do urllib3: as novas tentativas ficam só em fetch(), que retoma o .part
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _record(self, url: str, **entry):
+        with self._lock:
+            self.manifest[url] = {**self.manifest.get(url, {}), **entry}
+            self._dirty += 1
+            if self._dirty >= DOWNLOAD_PARAMS["save_every"]:
+                save_cache(self.manifest_path, self.manifest)
+                self._dirty = 0
+
+    def _is_done(self, url: str, filename: str) -> bool:
+        entry = self.manifest.get(url)
+        if entry and entry.get("status") in ("done", "duplicate"):
+            target = entry.get("file", filename)
+            return entry["status"] == "duplicate" or \
+                (os.path.exists(target) and os.path.getsize(target) == entry.get("bytes"))
+        if os.path.exists(filename):
+            # arquivo já existente sem manifesto (ex.: baixado pela versão antiga)
+            digest = file_sha256(filename)
+            self._record(url, file=filename, status="done", sha256=digest,
+                         bytes=os.path.getsize(filename))
+            with self._lock:
+                self._hashes.setdefault(digest, filename)
+            return True
+        return False
+
+    def fetch(self, url: str, filename: str) -> str:
+        """
+        Baixa uma URL para `filename` (streaming + retomada).
+        :return: status final: done, skipped, duplicate ou error
+        """
+        if self._is_done(url, filename):
+            return "skipped"
+
+        part = f"{filename}.part"
+        chunk_size = DOWNLOAD_PARAMS["chunk_size"]
+        error = None
+        attempt = 0
+        while True:
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self._host_slot(url), \
+                        self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+                    if r.status_code == 416 and offset:
+                        # .part já completo ou inválido: recomeça do zero (não conta tentativa)
+                        os.remove(part)
+                        continue
+                    r.raise_for_status()
+                    resumed = offset and r.status_code == 206
+                    h = hashlib.sha256()
+                    if resumed:
+                        with open(part, "rb") as f:
+                            for block in iter(lambda: f.read(1 << 20), b""):
+                                h.update(block)
+                    with open(part, "ab" if resumed else "wb") as f:
+                        for block in r.iter_content(chunk_size):
+                            f.write(block)
+                            h.update(block)
+                break
+            except (requests.RequestException, OSError) as err:
+                error = err
+                logger.warning(f"Falha em {url} (tentativa {attempt + 1}): {err}")
+                status = getattr(getattr(err, "response", None), "status_code", None)
+                attempt += 1
+                if attempt > self.retries or (status and status not in RETRY_STATUS):
+                    self._record(url, file=filename, status="error", error=str(error))
+                    return "error"
+                time.sleep(DOWNLOAD_PARAMS["backoff"] * 2 ** (attempt - 1))
+
+        digest = h.hexdigest()
+        with self._lock:
+            original = self._hashes.setdefault(digest, filename)
+        if original != filename:
+            os.remove(part)
+            self._record(url, file=original, status="duplicate", sha256=digest)
+            return "duplicate"
+
+        os.replace(part, filename)
+        self._record(url, file=filename, status="done", sha256=digest,
+                     bytes=os.path.getsize(filename), error=None)
+        return "done"
+
+    def download(self, jobs) -> dict:
+        """
+        Baixa em paralelo uma lista de (url, caminho de destino).
+        :return: contagem por status
+        """
+        os.makedirs(self.save_folder, exist_ok=True)
+        counts = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for status in pool.map(lambda job: self.fetch(*job), jobs):
+                counts[status] = counts.get(status, 0) + 1
+        self.save()
+        logger.info(f"Download concluído: {counts}")
+        return counts
+
+    def save(self):
+        with self._lock:
+            save_cache(self.manifest_path, self.manifest)
+            self._dirty = 0
+
+    def close(self):
+        self.session.close()
+
+
+def download_urls(urls: list, save_folder: str, prefix: str, **kwargs) -> dict:
+    """Baixa as URLs com nomes estáveis <prefix>_<nº da linha><ext> (retomáveis)."""
+    jobs = [(url, os.path.join(save_folder, f"{prefix}_{i + 1:03d}{url_extension(url)}"))
+            for i, url in enumerate(urls)]
+    downloader = Downloader(save_folder, **kwargs)
+    try:
+        return downloader.download(jobs)
+    finally:
+        downloader.close()
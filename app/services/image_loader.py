@@ -1,11 +1,22 @@
 # app/services/image_loader.py
 
+import io
+
 import cv2
 import os
+import numpy as np
+from PIL import Image
+
 from app.services.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Decodificação reduzida (o JPEG é escalado já na IDCT, sem buffer cheio)
+REDUCED_GRAYSCALE = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                     4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                     8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+
 def load_image(path: str, grayscale: bool = False):
     """
     Carrega uma imagem com OpenCV.
@@ -25,6 +36,71 @@ def load_image(path: str, grayscale: bool = False):
     return image
 
 
+def read_bytes(path: str) -> np.ndarray:
+    """Conteúdo do arquivo como array uint8 (vazio se não der para ler)."""
+    try:
+        return np.fromfile(path, np.uint8)
+    except OSError:
+        return np.empty(0, np.uint8)
+
+
+def header_size(data: np.ndarray):
+    """(largura, altura) lidas só do cabeçalho, ou None se o formato não for reconhecido."""
+    # o cabeçalho quase sempre cabe nos primeiros 64 KiB (EXIF incluso)
+    for chunk in (data[:1 << 16], data):
+        try:
+            with Image.open(io.BytesIO(chunk)) as img:
+                return img.size
+        except (OSError, SyntaxError, ValueError):
+            continue
+    return None
+
+
+def reduction_for(size, working_size: int) -> int:
+    """
+    Maior fator de redução na decodificação (2, 4 ou 8) que ainda deixa o
+    maior lado ≥ working_size — a busca reduziria a imagem a esse tamanho de
+    qualquer forma, então os pixels descartados não seriam usados.
+    """
+    if not working_size or not size:
+        return 1
+    side = max(size)
+    for factor in (8, 4, 2):
+        if side / factor >= working_size:
+            return factor
+    return 1
+
+
+def decode_for_detection(data: np.ndarray, working_size: int = None, keep_color: bool = False):
+    """
+    Decodifica para a detecção com o mínimo de trabalho:
+    - sem keep_color, direto em cinza e, para imagens grandes, já reduzida
+      (IMREAD_REDUCED_GRAYSCALE_2/4/8) conforme a resolução de trabalho;
+    - com keep_color (render), em cor na resolução original + cinza.
+    :return: dict com gray, color (ou None), prescale (resolução de `gray`
+             em relação à original) e size (largura, altura originais),
+             ou None se os bytes não forem uma imagem
+    """
+    if not data.size:
+        return None
+
+    if keep_color:
+        color = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if color is None:
+            return None
+        return {"gray": cv2.cvtColor(color, cv2.COLOR_BGR2GRAY), "color": color,
+                "prescale": 1.0, "size": (color.shape[1], color.shape[0])}
+
+    size = header_size(data) if working_size else None
+    factor = reduction_for(size, working_size)
+    gray = cv2.imdecode(data, REDUCED_GRAYSCALE.get(factor, cv2.IMREAD_GRAYSCALE))
+    if gray is None:
+        return None
+    if factor == 1:
+        size = (gray.shape[1], gray.shape[0])
+    return {"gray": gray, "color": None, "prescale": 1.0 / factor, "size": tuple(size)}
+
+
 def resize_image(image, width: int = None, height: int = None):
     """
     Redimensiona a imagem para a largura/altura especificada.
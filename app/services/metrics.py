@@ -0,0 +1,191 @@
+# app/services/metrics.py
+
+import bisect
+import csv
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Limites superiores (s) dos buckets de latência, no estilo Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf)
+
+
+class Histogram:
+    """Histograma de latências com buckets fixos (mescla entre processos por soma)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Estimativa do quantil por interpolação linear dentro do bucket."""
+        if not self.count:
+            return 0.0
+        rank, seen, lower = q * self.count, 0, 0.0
+        for upper, n in zip(self.buckets, self.counts):
+            if n and seen + n >= rank:
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        return self.max
+
+    def merge(self, other: dict):
+        self.counts = [a + b for a, b in zip(self.counts, other["counts"])]
+        self.count += other["count"]
+        self.sum += other["sum"]
+        self.max = max(self.max, other["max"])
+
+    def as_dict(self) -> dict:
+        return {"counts": list(self.counts), "count": self.count,
+                "sum": self.sum, "max": self.max}
+
+
+class Metrics:
+    """
+    Registro de métricas do processo: histogramas de latência por etapa,
+    contadores e perfil de janelas por estágio do cascade. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.stages = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Mede o bloco e registra a duração no histograma `name`."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_stages(self, cascade: str, rows: list):
+        """Guarda o perfil por estágio (linhas de StageProfile.as_dict)."""
+        with self._lock:
+            self.stages[cascade] = rows
+
+    def snapshot(self) -> dict:
+        """Cópia serializável (enviada de volta pelos processos worker)."""
+        with self._lock:
+            return {"histograms": {k: h.as_dict() for k, h in self.histograms.items()},
+                    "counters": dict(self.counters),
+                    "stages": dict(self.stages)}
+
+    def merge(self, snapshot: dict):
+        """Soma um snapshot de outro processo a este registro."""
+        with self._lock:
+            for name, data in snapshot["histograms"].items():
+                self.histograms.setdefault(name, Histogram()).merge(data)
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.stages.update(snapshot["stages"])
+
+    def summary(self) -> dict:
+        """Resumo por etapa: contagem, média, p50, p95, p99 e máximo (ms)."""
+        with self._lock:
+            return {name: {
+                "count": h.count,
+                "mean_ms": round(1000 * h.sum / h.count, 3) if h.count else 0.0,
+                "p50_ms": round(1000 * h.quantile(0.50), 3),
+                "p95_ms": round(1000 * h.quantile(0.95), 3),
+                "p99_ms": round(1000 * h.quantile(0.99), 3),
+                "max_ms": round(1000 * h.max, 3),
+            } for name, h in sorted(self.histograms.items())}
+
+    # ── exportação ──────────────────────────────────────── #
+    def to_json(self, path: str):
+        data = {"latency": self.summary(), **self.snapshot()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+
+    def to_csv(self, path: str):
+        """Uma linha por etapa com as estatísticas de latência."""
+        rows = self.summary()
+        fields = ["name", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for name, row in rows.items():
+                writer.writerow({"name": name, **row})
+
+    def to_prometheus(self, prefix: str = "haar") -> str:
+        """Dump em formato texto de exposição do Prometheus."""
+        snap = self.snapshot()
+        lines = [f"# TYPE {prefix}_latency_seconds histogram"]
+        for name, h in sorted(snap["histograms"].items()):
+            cumulative = 0
+            for upper, n in zip(BUCKETS, h["counts"]):
+                cumulative += n
+                le = "+Inf" if math.isinf(upper) else repr(upper)
+                lines.append(f'{prefix}_latency_seconds_bucket{{step="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_latency_seconds_sum{{step="{name}"}} {h["sum"]:.6f}')
+            lines.append(f'{prefix}_latency_seconds_count{{step="{name}"}} {h["count"]}')
+
+        if snap["counters"]:
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for name, value in sorted(snap["counters"].items()):
+                lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+
+        if snap["stages"]:
+            lines.append(f"# TYPE {prefix}_stage_windows_total counter")
+            for cascade, rows in sorted(snap["stages"].items()):
+                for row in rows:
+                    for kind in ("evaluated", "rejected"):
+                        lines.append(f'{prefix}_stage_windows_total{{cascade="{cascade}",'
+                                     f'stage="{row["stage"]}",kind="{kind}"}} {row[kind]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, out_dir: str, name: str = "metrics") -> dict:
+        """Grava JSON, CSV e o dump Prometheus em `out_dir`. Retorna os caminhos."""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {ext: os.path.join(out_dir, f"{name}.{ext}") for ext in ("json", "csv", "prom")}
+        self.to_json(paths["json"])
+        self.to_csv(paths["csv"])
+        with open(paths["prom"], "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        logger.info(f"Métricas exportadas em {out_dir}")
+        return paths
+
+    def log_summary(self):
+        for name, s in self.summary().items():
+            logger.info(f"[{name}] n={s['count']} média={s['mean_ms']:.2f} ms "
+                        f"p50={s['p50_ms']:.2f} p95={s['p95_ms']:.2f} p99={s['p99_ms']:.2f} ms")
+
+
+# Registro global do processo
+METRICS = Metrics()
@@ -0,0 +1,161 @@
+# app/services/results_store.py
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from app.services.logger import get_logger
+from app.config.settings import RESULTS_STORE_PATH, RESULTS_PARAMS
+
+logger = get_logger(__name__)
+
+
+def to_record(result: dict) -> dict:
+    """Converte o resultado de process_image (arrays NumPy) em dict serializável."""
+    record = {}
+    for key, value in result.items():
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        record[key] = value
+    record.setdefault("created", round(time.time(), 3))
+    return record
+
+
+class ResultsStore(ABC):
+    """
+    Destino dos resultados de detecção com escrita em lote: os registros
+    ficam em memória e vão para o disco a cada `flush_every` registros
+    ou `flush_seconds` segundos. Thread-safe. Subclasses implementam `_write`.
+    """
+
+    def __init__(self, path: str, flush_every: int = None, flush_seconds: float = None):
+        self.path = path
+        self.flush_every = flush_every or RESULTS_PARAMS["flush_every"]
+        self.flush_seconds = RESULTS_PARAMS["flush_seconds"] if flush_seconds is None else flush_seconds
+        self.count = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def add(self, result: dict):
+        with self._lock:
+            self._buffer.append(to_record(result))
+            if len(self._buffer) >= self.flush_every or \
+                    time.monotonic() - self._last_flush >= self.flush_seconds:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._write(self._buffer)
+            self.count += len(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    @abstractmethod
+    def _write(self, records: list):
+        """Grava um lote de registros já serializáveis."""
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlStore(ResultsStore):
+    """Um JSON por linha, sempre em modo append."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, records: list):
+        self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class SqliteStore(ResultsStore):
+    """Tabela `detections`; caixas, scores e tempos ficam em colunas JSON."""
+
+    COLUMNS = ("path", "sha256", "width", "height", "n_boxes", "boxes", "scores",
+               "timings", "cascade", "output", "created")
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS detections ("
+            "id INTEGER PRIMARY KEY, path TEXT, sha256 TEXT, width INTEGER, height INTEGER, "
+            "n_boxes INTEGER, boxes TEXT, scores TEXT, timings TEXT, cascade TEXT, "
+            "output TEXT, created REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_path ON detections(path)")
+        self._conn.commit()
+
+    def _write(self, records: list):
+        rows = []
+        for r in records:
+            width, height = r.get("size") or (None, None)
+            rows.append((r.get("path"), r.get("sha256"), width, height, len(r.get("boxes", [])),
+                         json.dumps(r.get("boxes", [])), json.dumps(r.get("scores", [])),
+                         json.dumps(r.get("timings", {})), r.get("cascade"), r.get("output"),
+                         r.get("created")))
+        placeholders = ", ".join("?" * len(self.COLUMNS))
+        self._conn.executemany(
+            f"INSERT INTO detections ({', '.join(self.COLUMNS)}) VALUES ({placeholders})", rows)
+        self._conn.commit()
+
+    def close(self):
+        super().close()
+        self._conn.close()
+
+
+def open_store(path: str = None, **kwargs) -> ResultsStore:
+    """Abre o store pelo tipo da extensão: .db/.sqlite → SQLite, demais → JSONL."""
+    path = path or RESULTS_STORE_PATH
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteStore(path, **kwargs)
+    return JsonlStore(path, **kwargs)
+
+
+def read_results(path: str = None):
+    """Percorre os registros gravados (JSONL ou SQLite) como dicts."""
+    path = path or RESULTS_STORE_PATH
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        conn = sqlite3.connect(path)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(SqliteStore.COLUMNS)} FROM detections ORDER BY id")
+            for row in cursor:
+                r = dict(zip(SqliteStore.COLUMNS, row))
+                for key in ("boxes", "scores", "timings"):
+                    r[key] = json.loads(r[key])
+                r["size"] = [r.pop("width"), r.pop("height")]
+                r.pop("n_boxes")
+                yield r
+        finally:
+            conn.close()
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,36 @@
+# app/utils/annotation_utils.py
+import os
+import numpy as np
+
+from app.config.settings import ANNOTATIONS_PATH
+
+
+def parse_boxes(values) -> np.ndarray:
+    """
+    Converte "<num_obj> x y w h ..." em array int32 (N, 4).
+    Como sempre foi, o nº de caixas vem do tamanho da linha: um <num_obj>
+    desatualizado não descarta a anotação.
+    :raises ValueError: se o formato for inválido
+    """
+    values = [int(v) for v in values]
+    if len(values) < 5 or (len(values) - 1) % 4:
+        raise ValueError("formato de anotação inválido")
+    return np.asarray(values[1:], dtype=np.int32).reshape(-1, 4)
+
+
+def read_positives_txt(info_path: str = None) -> list:
+    """
+    Lê um positives.txt (formato do opencv_createsamples).
+    :return: lista de (caminho absoluto da imagem, caixas int32 (N, 4))
+    """
+    info_path = info_path or os.path.join(ANNOTATIONS_PATH, "positives.txt")
+    base = os.path.dirname(os.path.abspath(info_path))
+    items = []
+    with open(info_path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            img = os.path.normpath(os.path.join(base, parts[0]))
+            items.append((img, parse_boxes(parts[1:])))
+    return items
@@ -1,21 +1,63 @@
 # app/utils/file_utils.py
+import hashlib
 import os
-import glob
+import zlib
+from typing import Iterator
+
 from PIL import Image
 
 
+def file_sha256(path: str) -> str:
+    """sha256 do conteúdo do arquivo, lido em blocos de 1 MB."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
 def ensure_dir(path: str):
     """Cria o diretório se ele não existir."""
     if not os.path.exists(path):
         os.makedirs(path)
 
 
-def list_images(directory: str, extensions: tuple = (".jpg", ".jpeg", ".png")) -> list:
-    """Lista arquivos de imagem válidos em um diretório."""
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(directory, f"*{ext}")))
-    return sorted(files)
+def iter_images(directory: str, extensions: tuple = (".jpg", ".jpeg", ".png"),
+                recursive: bool = False, shard: tuple = None) -> Iterator[str]:
+    """
+    Gera os caminhos das imagens sob demanda com os.scandir (ordem do sistema).
+    A extensão é comparada sem diferenciar maiúsculas (.JPG entra).
+    :param recursive: desce também nas subpastas
+    :param shard: (i, n) mantém só a fatia i de n — partição estável, pelo
+                  crc32 do caminho relativo, independente da ordem de varredura
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                    continue
+                if not entry.name.lower().endswith(extensions) or not entry.is_file():
+                    continue
+                if shard:
+                    rel = os.path.relpath(entry.path, directory).replace("\\", "/")
+                    if zlib.crc32(rel.encode("utf-8")) % shard[1] != shard[0]:
+                        continue
+                yield entry.path
+
+
+def list_images(directory: str, extensions: tuple = (".jpg", ".jpeg", ".png"),
+                recursive: bool = False) -> list:
+    """Lista arquivos de imagem válidos em um diretório (ordenados)."""
+    return sorted(iter_images(directory, extensions, recursive))
 
 
 def is_image_file(filepath: str) -> bool:
@@ -0,0 +1,36 @@
+# scripts/benchmark.py
+
+import argparse
+import sys
+
+from app.core.benchmark import CASES, run_benchmarks, load_baseline, save_baseline, compare
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de detecção, NMS, anotações e .vec")
+    parser.add_argument("cases", nargs="*", help=f"casos a rodar: {', '.join(CASES)} (padrão: todos)")
+    parser.add_argument("--cascade", help="cascade.xml usado nos casos de detecção")
+    parser.add_argument("--images-dir", help="usa imagens gravadas em vez das sintéticas")
+    parser.add_argument("--repeats", type=int)
+    parser.add_argument("--baseline", default="baseline", help="nome do baseline em /benchmarks")
+    parser.add_argument("--save", action="store_true", help="grava o resultado como baseline")
+    parser.add_argument("--tolerance", type=float)
+    args = parser.parse_args(argv)
+
+    overrides = {k: v for k, v in {"cascade_path": args.cascade, "images_dir": args.images_dir,
+                                   "repeats": args.repeats}.items() if v}
+    report = run_benchmarks(args.cases or None, **overrides)
+
+    if args.save:
+        save_baseline(report, args.baseline)
+        return 0
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"Sem baseline '{args.baseline}'; rode com --save para criar.")
+        return 0
+    # código de saída ≠ 0 em regressão (útil em CI)
+    return 1 if compare(report, baseline, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
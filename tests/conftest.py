@@ -0,0 +1,30 @@
+import os
+
+import cv2
+import pytest
+
+HAAR_DIR = getattr(getattr(cv2, "data", None), "haarcascades", "")
+
+
+def _haar_xml(name: str) -> str:
+    """Caminho de um cascade de exemplo do OpenCV; pula o teste se não estiver instalado."""
+    path = os.path.join(HAAR_DIR, f"haarcascade_{name}.xml")
+    if not os.path.exists(path):
+        pytest.skip(f"cascade de exemplo indisponível ({name})")
+    return path
+
+
+@pytest.fixture(scope="session")
+def face_xml() -> str:
+    return _haar_xml("frontalface_default")
+
+
+@pytest.fixture(scope="session")
+def alt_xml() -> str:
+    # mesmo modelo com árvores de 2 nós por fraco (caminho não-stump)
+    return _haar_xml("frontalface_alt2")
+
+
+@pytest.fixture(scope="session")
+def eye_xml() -> str:
+    return _haar_xml("eye")
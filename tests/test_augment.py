@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+import app.core.augment as augment
+from app.core.augment import (augment_box, augment_to_vec, gaussian_blur_batch,
+                              random_homographies, warp_batch)
+from app.config.settings import AUGMENT_PARAMS
+
+STILL = {**AUGMENT_PARAMS, "max_angle": 0, "max_shear": 0, "scale": 0, "perspective": 0,
+         "translate": 0, "brightness": 0, "contrast": 0, "blur_prob": 0, "noise": 0,
+         "background_prob": 0}
+
+
+def _positives(tmp_path, n=3):
+    rng = np.random.default_rng(0)
+    items = []
+    for i in range(n):
+        path = str(tmp_path / f"pos{i}.png")
+        cv2.imwrite(path, rng.integers(0, 255, (200, 240), dtype=np.uint8))
+        items.append((path, np.array([[30, 40, 120, 100], [150, 20, 60, 150]], np.int32)))
+    return items
+
+
+def test_identity_warp_reproduces_the_box():
+    src = np.random.default_rng(1).integers(0, 255, (30, 40), dtype=np.uint8)
+    hom = random_homographies(np.random.default_rng(0), 2, 32, 20, 4, 5, STILL)
+    images, _, _ = warp_batch(src, hom, 32, 20)
+    np.testing.assert_allclose(images[0], src[5:25, 4:36], atol=1e-3)
+
+
+def test_blur_batch_matches_opencv_per_sigma():
+    images = np.random.default_rng(2).integers(0, 255, (2, 16, 20)).astype(np.float32)
+    out = gaussian_blur_batch(images, np.array([0.0, 1.2]), 1.5)
+
+    np.testing.assert_allclose(out[0], images[0], atol=1e-3)
+    ref = cv2.GaussianBlur(images[1], (11, 11), 1.2, borderType=cv2.BORDER_REPLICATE)
+    np.testing.assert_allclose(out[1], ref, atol=0.05)
+
+
+def test_background_comes_from_negatives(tmp_path, monkeypatch):
+    neg = str(tmp_path / "neg.png")
+    cv2.imwrite(neg, np.full((120, 120), 200, np.uint8))
+    monkeypatch.setattr(augment, "_negatives", [neg])
+    monkeypatch.setattr(augment, "_neg_cache", {})
+    gray = np.zeros((100, 100), np.uint8)
+    params = {**STILL, "scale": 0.3, "background_prob": 1.0}
+
+    samples = augment_box(gray, (30, 30, 40, 40), 20, 20, 8, np.random.default_rng(3), params)
+    assert samples.shape == (8, 20, 20)
+    # o objeto (preto) fica; o que a deformação trouxe de fora da caixa vira fundo claro
+    assert set(np.unique(samples)) <= {0, 200} and (samples == 200).any()
+
+
+def test_vec_is_reproducible_with_any_worker_count(tmp_path):
+    positives = _positives(tmp_path)
+    negatives = [str(tmp_path / "neg.png")]
+    cv2.imwrite(negatives[0], np.random.default_rng(4).integers(0, 255, (90, 90), dtype=np.uint8))
+
+    runs = []
+    for workers, seed in ((1, 7), (2, 7), (1, 8)):
+        path = str(tmp_path / f"{workers}_{seed}.vec")
+        total = augment_to_vec(path, positives, 24, 24, per_box=5, negatives=negatives,
+                               seed=seed, workers=workers, append=False)
+        assert total == 3 * 2 * 5
+        runs.append(open(path, "rb").read())
+
+    assert runs[0] == runs[1]
+    assert runs[0] != runs[2]
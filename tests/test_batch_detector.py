@@ -0,0 +1,22 @@
+import cv2
+import numpy as np
+
+from app.core.batch_detector import chunked, run_batch_detection
+
+
+def test_chunked_keeps_order():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_batch_results_follow_input_order(face_xml, tmp_path):
+    paths = []
+    for i in range(9):
+        path = str(tmp_path / f"img{i}.jpg")
+        cv2.imwrite(path, np.full((120, 160, 3), i * 20, np.uint8))
+        paths.append(path)
+
+    results = run_batch_detection(reversed(paths), workers=2, chunk_size=2, max_pending=2,
+                                  cascade_path=face_xml,
+                                  detected_dir=str(tmp_path), not_detected_dir=str(tmp_path))
+
+    assert [r["path"] for r in results] == paths[::-1]
@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.core.benchmark import compare, run_benchmarks, synthetic_image
+
+
+def test_synthetic_image_is_reproducible():
+    img_a, boxes_a = synthetic_image(320, 240, np.random.default_rng(7))
+    img_b, boxes_b = synthetic_image(320, 240, np.random.default_rng(7))
+
+    assert img_a.shape == (240, 320, 3)
+    np.testing.assert_array_equal(img_a, img_b)
+    np.testing.assert_array_equal(boxes_a, boxes_b)
+    assert ((boxes_a[:, 0] + boxes_a[:, 2] <= 320) & (boxes_a[:, 1] + boxes_a[:, 3] <= 240)).all()
+
+
+def test_run_benchmarks_reports_latency_and_throughput():
+    report = run_benchmarks(["nms", "positives"], isolate=False, images=3, repeats=1,
+                            nms_boxes=50, resolutions=[(160, 120)])
+
+    names = [r["name"] for r in report["results"]]
+    assert names == ["nms[50]", "positives_txt[cold]", "positives_txt[warm]"]
+    assert all(r["throughput"] > 0 for r in report["results"])
+    assert report["results"][0]["p99_ms"] >= report["results"][0]["p50_ms"]
+    # Medidos só pelo tempo total: sem percentis
+    assert all(r["p99_ms"] is None for r in report["results"][1:])
+
+
+def test_compare_flags_only_changes_beyond_tolerance():
+    baseline = {"commit": "abc", "results": [
+        {"name": "detect", "throughput": 100.0, "p99_ms": 10.0},
+        {"name": "nms", "throughput": 100.0, "p99_ms": 10.0},
+    ]}
+    report = {"results": [
+        {"name": "detect", "throughput": 95.0, "p99_ms": 10.5},
+        {"name": "nms", "throughput": 70.0, "p99_ms": 14.0},
+        {"name": "novo", "throughput": 1.0, "p99_ms": 1.0},
+    ]}
+
+    regressions = compare(report, baseline, tolerance=0.1)
+
+    assert [(r["name"], r["metric"]) for r in regressions] == [("nms", "throughput"), ("nms", "p99_ms")]
+
+
+def test_compare_gates_cases_without_percentiles_on_throughput_only():
+    baseline = {"commit": "abc", "results": [
+        {"name": "batch_detect", "throughput": 100.0, "p99_ms": None},
+        {"name": "detect", "throughput": 100.0, "p99_ms": 10.0},
+    ]}
+    report = {"results": [
+        {"name": "batch_detect", "throughput": 80.0, "p99_ms": None},
+        {"name": "detect", "throughput": 100.0, "p99_ms": None},
+    ]}
+
+    regressions = compare(report, baseline, tolerance=0.1)
+
+    assert [(r["name"], r["metric"]) for r in regressions] == [("batch_detect", "throughput")]
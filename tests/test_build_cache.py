@@ -0,0 +1,21 @@
+from app.core.build_cache import BuildCache
+
+
+def test_stage_is_stale_after_input_changes(tmp_path):
+    src, out = tmp_path / "in.txt", tmp_path / "out.txt"
+    src.write_text("a")
+    out.write_text("x")
+    cache = BuildCache(str(tmp_path / "state.json"), str(tmp_path / "hashes.json"))
+
+    key = cache.files_key([str(src)])
+    cache.mark("stage", key)
+    assert BuildCache(str(tmp_path / "state.json")).is_fresh("stage", key, [str(out)])
+
+    src.write_text("b")
+    assert cache.files_key([str(src)]) != key
+    out.unlink()
+    assert not cache.is_fresh("stage", key, [str(out)])
+
+
+def test_digest_ignores_dict_order():
+    assert BuildCache.digest({"a": 1, "b": 2}) == BuildCache.digest({"b": 2, "a": 1})
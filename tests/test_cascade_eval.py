@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+
+from app.core import cascade_eval
+from app.core.cascade_eval import (HaarCascade, StageProfile, detect_multiscale,
+                                   detect_multiscale_batch, integral_images)
+
+
+def synthetic_face(size: int = 26, border: int = 8) -> np.ndarray:
+    """Rosto desenhado (olhos, sobrancelhas, nariz, boca) que os cascades de face aceitam."""
+    img = np.full((96, 96), 150, np.uint8)
+    cv2.ellipse(img, (48, 52), (29, 38), 0, 0, 360, 200, -1)
+    for dx in (-1, 1):
+        cv2.ellipse(img, (48 + dx * 12, 40), (8, 4), 0, 0, 360, 40, -1)
+        cv2.line(img, (48 + dx * 5, 32), (48 + dx * 21, 32), 60, 3)
+    cv2.line(img, (48, 45), (48, 59), 120, 2)
+    cv2.ellipse(img, (48, 69), (12, 4), 0, 0, 360, 70, -1)
+    img = cv2.resize(cv2.GaussianBlur(img, (0, 0), 1.5), (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.copyMakeBorder(img, border, border, border, border, cv2.BORDER_CONSTANT, value=150)
+
+
+def base_scale_pair(xml: str, gray: np.ndarray):
+    """Janelas aceitas na escala base: (NumPy, OpenCV) como conjuntos de tuplas."""
+    cascade = HaarCascade.from_xml(xml)
+    win = (cascade.width, cascade.height)
+    boxes, _, _ = detect_multiscale(cascade, gray, max_size=win)
+    ref = cv2.CascadeClassifier(xml).detectMultiScale(gray, 1.1, 0, maxSize=win)
+    assert boxes.dtype == np.int32 and boxes.shape[1] == 4
+    return (set(map(tuple, boxes.tolist())),
+            set(map(tuple, np.asarray(ref).reshape(-1, 4).tolist())))
+
+
+def test_integral_images_match_opencv():
+    gray = np.random.default_rng(0).integers(0, 256, (23, 31), dtype=np.uint8)
+    ii, sq, tilted = integral_images(gray)
+    ref_ii, ref_sq, ref_tilted = cv2.integral3(gray, sdepth=cv2.CV_32S, sqdepth=cv2.CV_64F)
+
+    np.testing.assert_array_equal(ii, ref_ii)
+    np.testing.assert_allclose(sq, ref_sq)
+    np.testing.assert_array_equal(tilted, ref_tilted)
+
+
+def test_base_scale_windows_cover_opencv_detections(face_xml):
+    ours, ref = base_scale_pair(face_xml, synthetic_face())
+
+    assert HaarCascade.from_xml(face_xml).stages[0]["stumps"]
+    assert ref  # o OpenCV acha o rosto: a comparação não é entre dois vazios
+    # o OpenCV pula a coluna seguinte quando o estágio 0 rejeita; o resto é igual
+    assert ref <= ours
+
+
+def test_tree_weak_classifiers_match_opencv(alt_xml):
+    ours, ref = base_scale_pair(alt_xml, synthetic_face())
+
+    assert not any(stage["stumps"] for stage in HaarCascade.from_xml(alt_xml).stages)
+    assert ref and ref <= ours
+
+
+def test_batch_matches_single_image_and_profiles_stages(face_xml):
+    cascade = HaarCascade.from_xml(face_xml)
+    rng = np.random.default_rng(2)
+    grays = rng.integers(0, 256, (2, 80, 100), dtype=np.uint8)
+    profile = StageProfile(len(cascade.stages))
+
+    batch = detect_multiscale_batch(cascade, grays, 1.3, profile=profile)
+    for gray, (boxes, reached, _) in zip(grays, batch):
+        single, single_reached, _ = detect_multiscale(cascade, gray, 1.3)
+        np.testing.assert_array_equal(boxes, single)
+        np.testing.assert_array_equal(reached, single_reached)
+
+    rows = profile.as_dict()
+    assert rows[0]["evaluated"] > 0
+    assert all(r["rejected"] <= r["evaluated"] for r in rows)
+
+
+def test_row_step_halves_only_above_factor_two(face_xml, monkeypatch):
+    steps = []
+    window_origins = cascade_eval._window_origins
+
+    def spy(h, w, win_w, win_h, step, ystep, base=0):
+        steps.append(ystep)
+        return window_origins(h, w, win_w, win_h, step, ystep, base)
+
+    monkeypatch.setattr(cascade_eval, "_window_origins", spy)
+    detect_multiscale(HaarCascade.from_xml(face_xml), np.zeros((100, 100), np.uint8), scale_factor=2.0)
+
+    # fatores 1, 2 e 4: como no OpenCV, a escala 2 ainda pula linhas
+    assert steps == [2, 2, 1]
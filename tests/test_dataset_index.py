@@ -0,0 +1,43 @@
+from PIL import Image
+
+from app.services.dataset_index import index_images, scan_annotations
+
+
+def _setup(tmp_path):
+    images, anns = tmp_path / "positives", tmp_path / "annotations"
+    images.mkdir()
+    anns.mkdir()
+    Image.new("RGB", (100, 50)).save(images / "a.JPG")
+    Image.new("RGB", (100, 50)).save(images / "b.png")
+    (anns / "a.txt").write_text("1 10 10 50 30\n")
+    (anns / "b.txt").write_text("1 60 10 50 30\n")      # ultrapassa a largura
+    (anns / "c.txt").write_text("1 0 0 5 5\n")          # sem imagem
+    (anns / "positives.txt").write_text("")
+    return str(anns), str(images)
+
+
+def test_index_images_is_case_insensitive(tmp_path):
+    _, images = _setup(tmp_path)
+
+    assert sorted(index_images(images)) == ["a", "b"]
+
+
+def test_scan_annotations_validates_and_caches(tmp_path):
+    anns, images = _setup(tmp_path)
+    cache = str(tmp_path / "cache" / "index.json")
+
+    first = scan_annotations(anns, images, cache_path=cache)
+    second = scan_annotations(anns, images, cache_path=cache)
+
+    assert first == second
+    assert [(name, "error" in result) for name, _, result in first] == [
+        ("a.txt", False), ("b.txt", True), ("c.txt", True)]
+    assert first[0][2]["values"] == ["1", "10", "10", "50", "30"]
+
+
+def test_stale_object_count_keeps_annotation(tmp_path):
+    anns, images = _setup(tmp_path)
+    (tmp_path / "annotations" / "a.txt").write_text("2 10 10 50 30\n")   # conta antiga
+
+    results = {name: r for name, _, r in scan_annotations(anns, images)}
+    assert "values" in results["a.txt"]
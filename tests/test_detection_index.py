@@ -0,0 +1,114 @@
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from app.core.detection_index import DetectionIndex
+from app.utils.file_utils import file_sha256
+
+
+def _result(path):
+    return {"path": path, "sha256": None, "boxes": np.empty((0, 4), np.int32)}
+
+
+def test_split_reuses_unchanged_and_touched_files(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(bytes([i]) * 10)
+        paths.append(str(path))
+
+    index = DetectionIndex(str(tmp_path / "index.json"))
+    index.use_cascade("v1")
+    for p in paths:
+        index.update({**_result(p), "sha256": file_sha256(p)})
+    index.save()
+
+    index = DetectionIndex(str(tmp_path / "index.json"))
+    index.use_cascade("v1")
+    os.utime(paths[0], ns=(1, 1))                    # só o mtime muda
+    (tmp_path / "1.jpg").write_bytes(b"novo conteudo")
+    (tmp_path / "3.jpg").write_bytes(b"imagem nova")
+    os.remove(paths[2])
+
+    pending, cached = index.split(paths[:2] + [str(tmp_path / "3.jpg")])
+
+    assert pending == [paths[1], str(tmp_path / "3.jpg")]
+    assert [r["path"] for r in cached] == [paths[0]]
+    assert paths[2] not in index.entries
+
+    index.use_cascade("v2")
+    assert index.split(paths[:2])[0] == paths[:2]
+
+
+def test_run_detection_processes_only_new_images(face_xml, tmp_path, monkeypatch):
+    from app.core import detector
+    from app.core.detector import run_detection
+
+    monkeypatch.setitem(detector.METRICS_PARAMS, "export", False)  # nada em dataset/results
+
+    xml = str(tmp_path / "cascade.xml")
+    shutil.copy(face_xml, xml)
+    images = []
+    for i in range(2):
+        images.append(str(tmp_path / f"img{i}.jpg"))
+        cv2.imwrite(images[-1], np.full((120, 160, 3), 40 * i, np.uint8))
+    kwargs = dict(workers=1, store_path=str(tmp_path / "r.jsonl"), incremental=True,
+                  index_path=str(tmp_path / "index.json"), cascade_path=xml)
+
+    run_detection(images=images, **kwargs)
+    images.append(str(tmp_path / "img2.jpg"))
+    cv2.imwrite(images[-1], np.full((120, 160, 3), 200, np.uint8))
+    results = run_detection(images=images, **kwargs)
+
+    lines = open(tmp_path / "r.jsonl").read().splitlines()
+    assert len(lines) == 3                  # 2 na 1ª execução + só a nova na 2ª
+    assert [r["path"] for r in results] == images
+
+
+def test_run_detection_drops_unreadable_images(face_xml, tmp_path, monkeypatch):
+    from app.core import detector
+    from app.core.detector import run_detection
+
+    monkeypatch.setitem(detector.METRICS_PARAMS, "export", False)
+
+    xml = str(tmp_path / "cascade.xml")
+    shutil.copy(face_xml, xml)
+    good = str(tmp_path / "ok.jpg")
+    cv2.imwrite(good, np.full((120, 160, 3), 90, np.uint8))
+    broken = tmp_path / "quebrada.jpg"
+    broken.write_bytes(b"nao e uma imagem")
+
+    results = run_detection(images=[good, str(broken)], workers=1, cascade_path=xml,
+                            store_path=str(tmp_path / "r.jsonl"), incremental=True,
+                            index_path=str(tmp_path / "index.json"))
+
+    assert [r["path"] for r in results] == [good]
+    assert str(broken) not in DetectionIndex(str(tmp_path / "index.json")).entries
+
+
+def test_shards_keep_separate_indexes(face_xml, tmp_path, monkeypatch):
+    from app.core import detector, detection_index
+    from app.core.detector import run_detection
+
+    monkeypatch.setitem(detector.METRICS_PARAMS, "export", False)
+    monkeypatch.setattr(detector, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(detection_index, "DETECTION_INDEX_PATH", str(tmp_path / "index.json"))
+    folder = tmp_path / "dataset" / "test_images"
+    folder.mkdir(parents=True)
+    for i in range(6):
+        cv2.imwrite(str(folder / f"img{i}.jpg"), np.full((120, 160, 3), 30 * i, np.uint8))
+    xml = str(tmp_path / "cascade.xml")
+    shutil.copy(face_xml, xml)
+
+    def run(i):
+        store = tmp_path / f"r{i}.jsonl"
+        run_detection(workers=1, incremental=True, cascade_path=xml, shard=(i, 2),
+                      store_path=str(store))
+        return len(store.read_text().splitlines())
+
+    first = [run(0), run(1)]
+    assert sum(first) == 6
+    assert (tmp_path / "index.0of2.json").exists() and (tmp_path / "index.1of2.json").exists()
+    assert [run(0), run(1)] == first   # 2ª rodada: nada novo gravado em nenhum shard
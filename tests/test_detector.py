@@ -0,0 +1,33 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from app.core.detector import Detector, get_cascade
+
+
+def test_cascade_cache_reloads_only_when_mtime_changes(face_xml, tmp_path):
+    xml = str(tmp_path / "cascade.xml")
+    shutil.copy(face_xml, xml)
+
+    first = get_cascade(xml)
+    assert get_cascade(xml) is first
+
+    stat = os.stat(xml)
+    os.utime(xml, (stat.st_atime, stat.st_mtime + 10))
+    assert get_cascade(xml) is not first
+
+
+def test_detect_returns_int32_boxes(face_xml):
+    detector = Detector(face_xml, minSize=(24, 24), maxSize=None)
+    boxes = detector.detect_batch([np.zeros((100, 100, 3), np.uint8), np.zeros((80, 80), np.uint8)])
+
+    assert len(boxes) == 2
+    for b in boxes:
+        assert b.dtype == np.int32 and b.shape[1] == 4
+
+
+def test_invalid_cascade_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Detector(str(tmp_path / "missing.xml"))
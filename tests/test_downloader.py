@@ -0,0 +1,103 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.downloader import Downloader, download_urls
+from app.config.settings import DOWNLOAD_PARAMS
+
+FILES = {"/a.jpg": b"A" * 5000, "/b.png": b"B" * 3000, "/copy.jpg": b"A" * 5000}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = []
+
+    def do_GET(self):
+        _Handler.hits.append((self.path, self.headers.get("Range")))
+        body = FILES.get(self.path)
+        if self.path.startswith("/error500"):
+            self.send_error(500)
+            return
+        if body is None:
+            self.send_error(404)
+            return
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(body):
+                self.send_error(416)
+                return
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    _Handler.hits = []
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_download_skips_existing_and_dedupes(server, tmp_path):
+    urls = [f"{server}/a.jpg", f"{server}/b.png", f"{server}/copy.jpg", f"{server}/missing.jpg"]
+    kwargs = dict(manifest_path=str(tmp_path / "manifest.json"), workers=4, retries=0)
+
+    first = download_urls(urls, str(tmp_path / "imgs"), "neg", **kwargs)
+    assert first == {"done": 2, "duplicate": 1, "error": 1}
+    # a.jpg e copy.jpg têm o mesmo conteúdo: só um dos dois fica em disco
+    names = sorted(os.listdir(tmp_path / "imgs"))
+    assert len(names) == 2 and "neg_002.png" in names
+    assert open(tmp_path / "imgs" / "neg_002.png", "rb").read() == FILES["/b.png"]
+
+    _Handler.hits = []
+    second = download_urls(urls, str(tmp_path / "imgs"), "neg", **kwargs)
+    assert second == {"skipped": 3, "error": 1}
+    assert [path for path, _ in _Handler.hits] == ["/missing.jpg"]
+
+
+def test_partial_download_resumes_with_range(server, tmp_path):
+    target = str(tmp_path / "a.jpg")
+    with open(target + ".part", "wb") as f:
+        f.write(FILES["/a.jpg"][:1200])
+
+    downloader = Downloader(str(tmp_path), manifest_path=str(tmp_path / "m.json"), retries=0)
+    assert downloader.fetch(f"{server}/a.jpg", target) == "done"
+    downloader.close()
+
+    assert _Handler.hits == [("/a.jpg", "bytes=1200-")]
+    assert open(target, "rb").read() == FILES["/a.jpg"]
+    assert not os.path.exists(target + ".part")
+
+
+def test_unsatisfiable_range_restarts_without_using_a_retry(server, tmp_path):
+    target = str(tmp_path / "b.png")
+    with open(target + ".part", "wb") as f:
+        f.write(b"X" * 4000)             # maior que o arquivo: o servidor responde 416
+
+    downloader = Downloader(str(tmp_path), manifest_path=str(tmp_path / "m.json"), retries=0)
+    assert downloader.fetch(f"{server}/b.png", target) == "done"
+    downloader.close()
+
+    assert _Handler.hits == [("/b.png", "bytes=4000-"), ("/b.png", None)]
+    assert open(target, "rb").read() == FILES["/b.png"]
+
+
+def test_server_errors_are_retried_by_a_single_layer(server, tmp_path, monkeypatch):
+    monkeypatch.setitem(DOWNLOAD_PARAMS, "backoff", 0)
+    downloader = Downloader(str(tmp_path), manifest_path=str(tmp_path / "m.json"), retries=2)
+    assert downloader.fetch(f"{server}/error500.jpg", str(tmp_path / "e.jpg")) == "error"
+    downloader.close()
+
+    assert len(_Handler.hits) == 3      # 1 + 2 novas tentativas, não (2 + 1)²
+    assert downloader.manifest[f"{server}/error500.jpg"]["error"]
@@ -0,0 +1,61 @@
+import os
+
+import cv2
+import numpy as np
+
+from app.core.evaluation import evaluate_grid, match_boxes, param_grid, pareto_front, scores
+
+
+def test_match_boxes_is_one_to_one():
+    gt = [[0, 0, 10, 10], [50, 50, 10, 10]]
+    pred = [[1, 1, 10, 10], [0, 0, 10, 10], [200, 200, 5, 5]]
+
+    assert match_boxes(gt, pred, 0.5) == (1, 2, 1)
+    assert match_boxes(gt, [], 0.5) == (0, 0, 2)
+    assert scores(1, 2, 1) == {"precision": 0.3333, "recall": 0.5, "f1": 0.4}
+
+
+def test_pareto_front_drops_dominated_configs():
+    rows = [{"id": "a", "f1": 0.5, "mean_ms": 10}, {"id": "b", "f1": 0.7, "mean_ms": 20},
+            {"id": "c", "f1": 0.6, "mean_ms": 30}, {"id": "d", "f1": 0.9, "mean_ms": 50},
+            {"id": "e", "f1": 0.4, "mean_ms": 10}]
+
+    assert [r["id"] for r in pareto_front(rows)] == ["a", "b", "d"]
+
+
+def test_param_grid_is_cartesian_product():
+    configs = param_grid({"scaleFactor": [1.1, 1.2], "minNeighbors": [3, 5, 7]})
+
+    assert len(configs) == 6
+    assert configs[0] == {"scaleFactor": 1.1, "minNeighbors": 3}
+
+
+def test_evaluate_grid_reports_every_config(face_xml, tmp_path):
+    path = str(tmp_path / "blank.jpg")
+    cv2.imwrite(path, np.full((120, 160), 128, np.uint8))
+    samples = [(path, np.array([[10, 10, 40, 40]], np.int32))]
+
+    report = evaluate_grid({"minNeighbors": [3, 5]}, samples=samples, workers=1,
+                           cascade_path=face_xml, out_path=str(tmp_path / "eval.json"))
+
+    assert [r["minNeighbors"] for r in report["rows"]] == [3, 5]
+    assert all(r["fn"] == 1 and r["recall"] == 0.0 for r in report["rows"])
+    assert os.path.exists(tmp_path / "eval.json")
+
+
+def test_evaluate_grid_searches_grid_values_and_drops_duplicates(face_xml, tmp_path):
+    path = str(tmp_path / "wide.jpg")
+    cv2.imwrite(path, np.full((450, 800), 128, np.uint8))
+    samples = [(path, np.array([[10, 10, 40, 40]], np.int32))]
+
+    # minSize abaixo da janela 24×24 vira (24, 24): as duas primeiras são a mesma busca
+    report = evaluate_grid({"scaleFactor": [1.05], "minSize": [(10, 10), (20, 20), (60, 75)]},
+                           samples=samples, workers=1, cascade_path=face_xml)
+
+    assert [r["minSize"] for r in report["rows"]] == [(10, 10), (60, 75)]
+    assert [r["planned"] for r in report["rows"]] == [[(1.05, (24, 24))], [(1.05, (60, 75))]]
+
+    # workingSize como eixo da grade: aí sim o plano reduz a imagem e o minSize
+    report = evaluate_grid({"minSize": [(60, 75)], "workingSize": [400]},
+                           samples=samples, workers=1, cascade_path=face_xml)
+    assert report["rows"][0]["planned"][0][1] == (30, 38)
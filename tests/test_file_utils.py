@@ -0,0 +1,31 @@
+import os
+
+from app.utils.file_utils import iter_images, list_images
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_iter_images_is_case_insensitive_and_optionally_recursive(tmp_path):
+    for name in ("a.jpg", "b.JPG", "c.Png", "notes.txt", "sub/d.jpeg"):
+        _touch(str(tmp_path / name))
+
+    flat = sorted(os.path.basename(p) for p in iter_images(str(tmp_path)))
+    deep = sorted(os.path.basename(p) for p in iter_images(str(tmp_path), recursive=True))
+
+    assert flat == ["a.jpg", "b.JPG", "c.Png"]
+    assert deep == ["a.jpg", "b.JPG", "c.Png", "d.jpeg"]
+    assert list_images(str(tmp_path / "nao_existe")) == []
+
+
+def test_shards_partition_the_directory(tmp_path):
+    for i in range(40):
+        _touch(str(tmp_path / f"img{i:02d}.png"))
+
+    shards = [set(iter_images(str(tmp_path), shard=(i, 3))) for i in range(3)]
+
+    assert set().union(*shards) == set(list_images(str(tmp_path)))
+    assert sum(len(s) for s in shards) == 40
+    assert all(shards)
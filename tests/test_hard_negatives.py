@@ -0,0 +1,22 @@
+import numpy as np
+
+from app.core.hard_negatives import append_bg_txt, crop_box, dhash
+from app.config.settings import BASE_DIR
+
+
+def test_append_bg_txt_skips_existing_lines(tmp_path):
+    bg = tmp_path / "bg.txt"
+    bg.write_text("dataset/negatives/a.jpg")
+    paths = [f"{BASE_DIR}/dataset/negatives/a.jpg", f"{BASE_DIR}/dataset/negatives/hard_1.jpg"]
+
+    assert append_bg_txt(paths, str(bg)) == 1
+    assert append_bg_txt(paths, str(bg)) == 0
+    assert bg.read_text().splitlines() == ["dataset/negatives/a.jpg", "dataset/negatives/hard_1.jpg"]
+
+
+def test_dhash_matches_identical_crops_only():
+    img = np.random.default_rng(0).integers(0, 255, (60, 80), dtype=np.uint8)
+
+    assert dhash(img) == dhash(img.copy())
+    assert dhash(img) != dhash(255 - img)
+    assert crop_box(img, (10, 10, 20, 20), padding=0.5).shape == (40, 40)
@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+
+from app.services.image_loader import decode_for_detection, read_bytes, reduction_for
+
+
+def test_reduction_keeps_at_least_the_working_size():
+    assert reduction_for((4000, 3000), 1280) == 2
+    assert reduction_for((6000, 4000), 640) == 8
+    assert reduction_for((1000, 800), 1280) == 1
+    assert reduction_for((6000, 4000), None) == 1
+
+
+def test_decode_reduced_grayscale_or_full_color(tmp_path):
+    path = str(tmp_path / "big.jpg")
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 256, (1800, 2600, 3), dtype=np.uint8))
+    data = read_bytes(path)
+
+    small = decode_for_detection(data, working_size=640)
+    assert small["gray"].shape == (450, 650) and small["color"] is None
+    assert small["prescale"] == 0.25 and small["size"] == (2600, 1800)
+
+    full = decode_for_detection(data, working_size=640, keep_color=True)
+    assert full["color"].shape == (1800, 2600, 3) and full["gray"].shape == (1800, 2600)
+    assert decode_for_detection(read_bytes(str(tmp_path / "missing.jpg"))) is None
+
+
+def test_prescaled_detection_returns_original_coordinates(face_xml):
+    from app.core.detector import Detector
+
+    gray = cv2.GaussianBlur(np.random.default_rng(3).integers(0, 256, (200, 200), np.uint8), (0, 0), 2)
+    params = dict(minNeighbors=0, maxSize=None, workingSize=None, maxScaleLevels=0, max_objects=None)
+
+    native = Detector(face_xml, minSize=(24, 24), **params).detect(gray)
+    # a mesma imagem tratada como a decodificação 1/2 de uma imagem 400×400
+    prescaled = Detector(face_xml, minSize=(48, 48), **params).detect_scored(gray, 0.5)[0]
+
+    assert len(native)
+    np.testing.assert_array_equal(np.sort(prescaled, 0), np.sort(native * 2, 0))
@@ -0,0 +1,46 @@
+import csv
+import json
+
+from app.services.metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles_follow_observations():
+    hist = Histogram()
+    for ms in range(1, 101):
+        hist.observe(ms / 1000)
+
+    assert hist.count == 100
+    assert 0.025 <= hist.quantile(0.5) <= 0.05
+    assert 0.05 <= hist.quantile(0.99) <= 0.1
+    assert hist.quantile(1.0) == hist.max == 0.1
+
+
+def test_merge_snapshot_sums_workers():
+    parent, worker = Metrics(), Metrics()
+    parent.observe("detect", 0.01)
+    worker.observe("detect", 0.02)
+    worker.inc("images", 3)
+    worker.set_stages("cascade.xml", [{"stage": 0, "evaluated": 10, "rejected": 7}])
+
+    parent.merge(worker.snapshot())
+
+    assert parent.summary()["detect"]["count"] == 2
+    assert parent.counters == {"images": 3}
+    assert "cascade.xml" in parent.stages
+
+
+def test_export_writes_json_csv_and_prometheus(tmp_path):
+    metrics = Metrics()
+    with metrics.timer("decode"):
+        pass
+    metrics.inc("images")
+    metrics.set_stages("cascade.xml", [{"stage": 0, "evaluated": 10, "rejected": 7}])
+
+    paths = metrics.export(str(tmp_path))
+
+    assert json.load(open(paths["json"]))["latency"]["decode"]["count"] == 1
+    assert [r["name"] for r in csv.DictReader(open(paths["csv"]))] == ["decode"]
+    prom = open(paths["prom"]).read()
+    assert 'haar_latency_seconds_bucket{step="decode",le="+Inf"} 1' in prom
+    assert 'haar_events_total{event="images"} 1' in prom
+    assert 'stage="0",kind="rejected"} 7' in prom
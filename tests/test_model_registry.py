@@ -0,0 +1,101 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from app.core.cascade_eval import HaarCascade, detect_multiscale, detect_multiscale_shared
+from app.core.detector import Detector, MultiDetector
+from app.core.model_registry import ModelRegistry
+
+
+def synthetic_face(size: int) -> np.ndarray:
+    """Rosto desenhado (olhos, sobrancelhas, nariz, boca) que os cascades de face e olho aceitam."""
+    img = np.full((96, 96), 150, np.uint8)
+    cv2.ellipse(img, (48, 52), (29, 38), 0, 0, 360, 200, -1)
+    for dx in (-1, 1):
+        cv2.ellipse(img, (48 + dx * 12, 40), (8, 4), 0, 0, 360, 40, -1)
+        cv2.line(img, (48 + dx * 5, 32), (48 + dx * 21, 32), 60, 3)
+    cv2.line(img, (48, 45), (48, 59), 120, 2)
+    cv2.ellipse(img, (48, 69), (12, 4), 0, 0, 360, 70, -1)
+    return cv2.resize(cv2.GaussianBlur(img, (0, 0), 1.5), (size, size), interpolation=cv2.INTER_AREA)
+
+
+def test_register_versions_dedup_and_activate(face_xml, eye_xml, tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"), reload_seconds=0)
+
+    first = registry.register(face_xml, "books", metadata={"samples": {"num_pos": 10}})
+    assert first["version"] == "v0001" and first["samples"] == {"num_pos": 10}
+    assert registry.register(face_xml, "books")["version"] == "v0001"  # mesmo conteúdo
+
+    second = registry.register(eye_xml, "books")
+    assert second["version"] == "v0002"
+    assert registry.active("books")["version"] == "v0002"
+    assert registry.active_path("books").endswith(os.path.join("v0002", "cascade.xml"))
+
+    registry.activate("books", "v0001")
+    assert registry.active_path("books") == registry.path("books", "v0001")
+    assert [m["version"] for m in registry.versions("books")] == ["v0001", "v0002"]
+
+    with open(registry.path("books", "v0002"), "a") as f:
+        f.write("<!-- alterado -->")
+    with pytest.raises(RuntimeError):
+        registry.activate("books", "v0002")
+
+
+def test_missing_model_has_no_active_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.active("books") is None
+    with pytest.raises(FileNotFoundError):
+        registry.active_path("books")
+
+
+def test_detector_follows_active_version(face_xml, eye_xml, tmp_path):
+    registry = ModelRegistry(str(tmp_path), reload_seconds=0)
+    registry.register(face_xml, "books")
+    detector = Detector(model="books", registry=registry)
+    assert detector.cascade_path == registry.path("books", "v0001")
+
+    registry.register(eye_xml, "books")  # ativa v0002 sem recriar o detector
+    assert detector.cascade_path == registry.path("books", "v0002")
+    gray = np.full((120, 160), 128, np.uint8)
+    cascade, _, _ = detector.plan(gray)
+    assert tuple(cascade.getOriginalWindowSize()) == (20, 20)  # janela do cascade de olhos
+
+
+def test_multi_detector_matches_individual_detectors(face_xml, alt_xml, eye_xml, monkeypatch):
+    from app.core import detector as detector_module
+
+    gray = np.full((480, 640), 150, np.uint8)
+    gray[100:260, 200:360] = synthetic_face(160)
+    params = {"minSize": (24, 24), "maxSize": None}
+    detectors = {"face": Detector(face_xml, workingSize=320, **params),
+                 "face_alt": Detector(alt_xml, workingSize=320, **params),
+                 "eye": Detector(eye_xml, workingSize=640, **params)}
+
+    resizes = []
+    working_image = detector_module.working_image
+    monkeypatch.setattr(detector_module, "working_image",
+                        lambda g, resize: resizes.append(resize) or working_image(g, resize))
+    combined = MultiDetector(detectors).detect_scored(gray)
+    # uma redução por escala de trabalho (320 → 0.5, 640 → 1.0), compartilhada entre as faces
+    assert sorted(resizes) == [0.5, 1.0]
+
+    for name, detector in detectors.items():
+        boxes, scores = detector.detect_scored(gray)
+        assert len(boxes)  # há detecções de verdade para comparar
+        np.testing.assert_array_equal(combined[name][0], boxes)
+        np.testing.assert_array_equal(combined[name][1], scores)
+
+
+def test_shared_integrals_match_single_cascade_runs(face_xml, eye_xml):
+    gray = cv2.GaussianBlur(np.random.default_rng(2).integers(0, 256, (60, 80), dtype=np.uint8),
+                            (0, 0), 3)
+    cascades = {"face": HaarCascade.from_xml(face_xml).truncated(3),
+                "eye": HaarCascade.from_xml(eye_xml).truncated(3)}
+
+    shared = detect_multiscale_shared(cascades, gray, scale_factor=1.3)
+    for name, cascade in cascades.items():
+        single = detect_multiscale(cascade, gray, scale_factor=1.3)
+        for got, want in zip(shared[name], single):
+            np.testing.assert_array_equal(got, want)
@@ -0,0 +1,25 @@
+from app.core.multiscale import plan_search, adaptive_scale_factor
+
+PARAMS = {"scaleFactor": 1.06, "minSize": (80, 100), "maxSize": None,
+          "workingSize": 1280, "maxScaleLevels": 16}
+
+
+def test_large_image_is_scaled_to_working_size():
+    scale, planned = plan_search((3000, 4000), PARAMS, window=(80, 80))
+
+    assert scale == 0.32
+    assert planned["minSize"] == (80, 80)          # nunca abaixo da janela do cascade
+    assert planned["scaleFactor"] > PARAMS["scaleFactor"]
+
+
+def test_small_image_keeps_original_resolution():
+    scale, planned = plan_search((600, 800), dict(PARAMS, maxScaleLevels=0), window=(24, 24))
+
+    assert scale == 1.0
+    assert planned["minSize"] == (80, 100) and planned["scaleFactor"] == 1.06
+
+
+def test_adaptive_scale_factor_respects_level_budget():
+    sf = adaptive_scale_factor((80, 80), None, (1280, 1280), base=1.01, max_levels=10)
+
+    assert abs(sf ** 10 - 16) < 1e-6
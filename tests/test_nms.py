@@ -0,0 +1,24 @@
+import numpy as np
+
+from app.core.nms import iou_matrix, nms, cascade_scores
+
+
+def test_iou_matrix_identical_and_disjoint():
+    a = np.array([[0, 0, 10, 10]], np.int32)
+    b = np.array([[0, 0, 10, 10], [20, 20, 5, 5], [5, 0, 10, 10]], np.int32)
+
+    np.testing.assert_allclose(iou_matrix(a, b)[0], [1.0, 0.0, 50 / 150], rtol=1e-6)
+
+
+def test_nms_keeps_best_boxes_by_score():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 10, 10], [100, 0, 10, 10]], np.int32)
+    scores = np.array([0.5, 0.9, 0.7, 0.1], np.float32)
+
+    assert nms(boxes, scores, iou_threshold=0.3).tolist() == [1, 2, 3]
+    assert nms(boxes, scores, iou_threshold=0.3, top_k=2).tolist() == [1, 2]
+
+
+def test_cascade_scores_rank_by_stage_then_weight():
+    scores = cascade_scores([[20], [25], [25]], [[5.0], [-1.0], [2.0]])
+
+    assert np.argsort(-scores).tolist() == [2, 1, 0]
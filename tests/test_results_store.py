@@ -0,0 +1,57 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.results_store import ResultsStore, open_store, read_results
+
+
+@pytest.mark.parametrize("name", ["results.jsonl", "results.db"])
+def test_store_batches_writes_and_round_trips(tmp_path, name):
+    path = str(tmp_path / name)
+    result = {"path": "a.jpg", "sha256": "ff", "size": [640, 480],
+              "boxes": np.array([[1, 2, 3, 4]], np.int32), "scores": np.array([0.5], np.float32),
+              "timings": {"detect": 1.5}, "cascade": "c.xml", "output": None}
+
+    with open_store(path, flush_every=2, flush_seconds=60) as store:
+        store.add(result)
+        assert store.count == 0          # ainda no buffer
+        store.add({**result, "path": "b.jpg", "boxes": np.empty((0, 4), np.int32),
+                   "scores": np.empty(0, np.float32)})
+        assert store.count == 2
+
+    records = list(read_results(path))
+    assert [r["path"] for r in records] == ["a.jpg", "b.jpg"]
+    assert records[0]["boxes"] == [[1, 2, 3, 4]] and records[1]["boxes"] == []
+    assert records[0]["size"] == [640, 480] and records[0]["timings"] == {"detect": 1.5}
+
+
+def test_process_image_skips_jpeg_unless_rendering(face_xml, tmp_path):
+    from app.core.detector import Detector, process_image, render_results
+
+    img_path = str(tmp_path / "img.jpg")
+    cv2.imwrite(img_path, np.full((120, 160, 3), 90, np.uint8))
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    detector = Detector(face_xml)
+
+    result = process_image(detector, img_path, str(out_dir), str(out_dir), render=False)
+    assert result["output"] is None and not os.listdir(out_dir)
+    assert result["sha256"] == hashlib.sha256(open(img_path, "rb").read()).hexdigest()
+    assert result["size"] == [160, 120] and set(result["timings"]) == {"decode", "detect"}
+
+    rendered = process_image(detector, img_path, str(out_dir), str(out_dir), render=True)
+    assert os.path.exists(rendered["output"])
+
+    store = str(tmp_path / "results.jsonl")
+    with open_store(store) as s:
+        s.add({**result, "boxes": np.array([[10, 10, 20, 20]], np.int32)})
+    assert render_results(store, str(tmp_path / "det"), str(tmp_path / "none")) == 1
+    assert os.listdir(tmp_path / "det") == ["img.jpg"]
+
+
+def test_results_store_requires_write(tmp_path):
+    with pytest.raises(TypeError):
+        ResultsStore(str(tmp_path / "x.jsonl"))
@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+from app.core.scale_tuner import tune_multiscale
+from app.config.settings import DETECTION_PARAMS
+
+
+def synthetic_face(size: int) -> np.ndarray:
+    """Rosto desenhado (olhos, sobrancelhas, nariz, boca) que o cascade de face aceita."""
+    img = np.full((96, 96), 150, np.uint8)
+    cv2.ellipse(img, (48, 52), (29, 38), 0, 0, 360, 200, -1)
+    for dx in (-1, 1):
+        cv2.ellipse(img, (48 + dx * 12, 40), (8, 4), 0, 0, 360, 40, -1)
+        cv2.line(img, (48 + dx * 5, 32), (48 + dx * 21, 32), 60, 3)
+    cv2.line(img, (48, 45), (48, 59), 120, 2)
+    cv2.ellipse(img, (48, 69), (12, 4), 0, 0, 360, 70, -1)
+    return cv2.resize(cv2.GaussianBlur(img, (0, 0), 1.5), (size, size), interpolation=cv2.INTER_AREA)
+
+
+def test_tuner_reports_planned_search_and_recall(face_xml, tmp_path):
+    gray = np.full((1200, 1600), 150, np.uint8)
+    gray[300:700, 500:900] = synthetic_face(400)
+    cv2.imwrite(str(tmp_path / "face.png"), gray)
+    (tmp_path / "positives.txt").write_text("face.png 1 500 300 400 400\n")
+
+    report = tune_multiscale([(None, 0), (640, 16)], info_path=str(tmp_path / "positives.txt"),
+                             cascade_path=face_xml)
+    rows = {(r["workingSize"], r["maxScaleLevels"]): r for r in report}
+
+    # resolução original e escalas fixas: a grade de DETECTION_PARAMS vale como está
+    full = rows[(None, 0)]
+    assert full["planned"] == [(DETECTION_PARAMS["scaleFactor"], DETECTION_PARAMS["minSize"])]
+    # 1600 → 640 px (0.4): minSize (80, 100) → (32, 40); a varredura até maxSize × 0.4
+    # (320 px = 10 × 32) cabe em 16 escalas com scaleFactor 10^(1/16)
+    small = rows[(640, 16)]
+    assert small["planned"] == [(round(10 ** (1 / 16), 4), (32, 40))]
+    assert all(r["recall"] == 1.0 and r["detections"] == 1 and "boxes" not in r for r in report)
+    assert [r["mean_ms"] for r in report] == sorted(r["mean_ms"] for r in report)
@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+import requests
+
+from app.core.server import DetectionServer
+
+
+@contextlib.contextmanager
+def running(srv):
+    """Roda o servidor num event loop em outra thread; devolve a URL base."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(srv.start())
+        ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(60)
+    try:
+        yield f"http://127.0.0.1:{srv.port}"
+    finally:
+        asyncio.run_coroutine_threadsafe(srv.stop(), loop).result(30)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(30)
+        loop.close()
+
+
+@pytest.fixture(scope="module")
+def server(face_xml):
+    with running(DetectionServer(face_xml, port=0, workers=2, max_batch=4, max_wait_ms=20)) as url:
+        yield url
+
+
+def _jpeg(value):
+    return cv2.imencode(".jpg", np.full((120, 160, 3), value, np.uint8))[1].tobytes()
+
+
+def test_concurrent_uploads_are_micro_batched(server):
+    with requests.Session() as session:
+        with ThreadPoolExecutor(8) as pool:
+            responses = list(pool.map(lambda v: session.post(f"{server}/detect", data=_jpeg(v)),
+                                      range(0, 240, 15)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["size"] == [160, 120] and r.json()["boxes"] == [] for r in responses)
+
+    metrics = requests.get(f"{server}/metrics").text
+    batches = float(metrics.split('haar_events_total{event="batches"} ')[1].split()[0])
+    images = float(metrics.split('haar_events_total{event="batched_images"} ')[1].split()[0])
+    assert images == 16 and batches < images
+
+
+def test_health_and_errors(server):
+    health = requests.get(f"{server}/health").json()
+    assert health["status"] == "ok" and health["workers"] == 2
+
+    assert requests.post(f"{server}/detect", data=b"nao e imagem").status_code == 422
+    assert requests.post(f"{server}/detect", data=b"").status_code == 400
+    assert requests.get(f"{server}/nada").status_code == 404
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_invalid_content_length_is_bad_request(server, length):
+    host, port = server.rsplit("/", 1)[-1].split(":")
+    with socket.create_connection((host, int(port)), timeout=10) as sock:
+        sock.sendall(f"POST /detect HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+        status = sock.recv(1024).split(b"\r\n", 1)[0]
+    assert status == b"HTTP/1.1 400 Bad Request"
+
+
+def test_pool_is_rebuilt_after_worker_dies(face_xml):
+    srv = DetectionServer(face_xml, port=0, workers=1, max_wait_ms=1)
+    with running(srv) as url:
+        for pid in list(srv._pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        first = requests.post(f"{url}/detect", data=_jpeg(100))
+        assert first.status_code == 503
+
+        assert requests.post(f"{url}/detect", data=_jpeg(100)).status_code == 200
+        assert requests.get(f"{url}/health").json()["pool_restarts"] == 1
@@ -0,0 +1,66 @@
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+from app.core import stream_pipeline
+from app.core.stream_pipeline import run_stream_detection
+from app.services.results_store import read_results
+
+
+def synthetic_face(size: int) -> np.ndarray:
+    """Rosto desenhado (olhos, sobrancelhas, nariz, boca) que o cascade de face aceita."""
+    img = np.full((96, 96), 150, np.uint8)
+    cv2.ellipse(img, (48, 52), (29, 38), 0, 0, 360, 200, -1)
+    for dx in (-1, 1):
+        cv2.ellipse(img, (48 + dx * 12, 40), (8, 4), 0, 0, 360, 40, -1)
+        cv2.line(img, (48 + dx * 5, 32), (48 + dx * 21, 32), 60, 3)
+    cv2.line(img, (48, 45), (48, 59), 120, 2)
+    cv2.ellipse(img, (48, 69), (12, 4), 0, 0, 360, 70, -1)
+    return cv2.resize(cv2.GaussianBlur(img, (0, 0), 1.5), (size, size), interpolation=cv2.INTER_AREA)
+
+
+def write_images(folder, n: int) -> list:
+    """n imagens 240×320: as pares com um rosto, as ímpares lisas."""
+    paths = []
+    for i in range(n):
+        img = np.full((240, 320), 150, np.uint8)
+        if i % 2 == 0:
+            img[40:200, 80:240] = synthetic_face(160)
+        paths.append(str(folder / f"img{i}.jpg"))
+        cv2.imwrite(paths[-1], cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    return paths
+
+
+def test_stream_detection_stores_every_image(face_xml, tmp_path):
+    xml = str(tmp_path / "cascade.xml")
+    shutil.copy(face_xml, xml)
+    paths = write_images(tmp_path, 6)
+    store = str(tmp_path / "results.jsonl")
+
+    summary = run_stream_detection(iter(paths), readers=2, detectors=2, writers=1, queue_size=2,
+                                   cascade_path=xml, render=False, store_path=store)
+
+    assert summary["images"] == 6 and summary["detected"] == 3
+    assert all(summary["stages"][name]["items"] == 6 for name in ("read", "detect", "write"))
+    records = {r["path"]: r for r in read_results(store)}
+    assert sorted(records) == sorted(paths)
+    assert all(len(records[p]["boxes"]) == (i % 2 == 0) for i, p in enumerate(paths))
+    assert all(records[p]["cascade"] == xml and records[p]["sha256"] for p in paths)
+
+
+def test_stream_detection_fails_fast_when_writer_breaks(face_xml, tmp_path, monkeypatch):
+    class BrokenStore:
+        def add(self, result):
+            raise OSError("disco cheio")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(stream_pipeline, "open_store", lambda path=None: BrokenStore())
+    paths = write_images(tmp_path, 2) * 20   # bem mais que as filas comportam
+
+    with pytest.raises(RuntimeError, match="disco cheio"):
+        run_stream_detection(paths, readers=1, detectors=1, writers=1, queue_size=1,
+                             cascade_path=face_xml, render=False)
@@ -0,0 +1,120 @@
+import json
+import sys
+import time
+
+import pytest
+
+from app.core.train_monitor import TrainMonitor
+from app.core.trainer import run_traincascade
+
+OUTPUT = """\
+PARAMETERS:
+cascadeDirName: model
+vecFileName: model/trained_vec.vec
+numPos: 40
+numNeg: 100
+numStages: 3
+precalcValBufSize[Mb] : 1024
+featureType: HAAR
+Number of unique features given windowSize [24,24] : 162336
+
+===== TRAINING 0-stage =====
+<BEGIN
+POS count : consumed   40 : 40
+NEG count : acceptanceRatio    100 : 1
+Precalculation time: 2
++----+---------+---------+
+|  N |    HR   |    FA   |
++----+---------+---------+
+|   1|        1|        1|
++----+---------+---------+
+|   2|    0.995|     0.42|
++----+---------+---------+
+END>
+Training until now has taken 0 days 0 hours 1 minutes 5 seconds.
+
+===== TRAINING 1-stage =====
+<BEGIN
+POS count : consumed   40 : 41
+NEG count : acceptanceRatio    100 : 3.2e-06
+"""
+
+
+def test_parses_stages_and_stops_on_overtraining(tmp_path):
+    progress = tmp_path / "progress.json"
+    monitor = TrainMonitor(str(progress), min_acceptance=1e-5)
+    events = [e for line in OUTPUT.splitlines() for e in monitor.feed(line)]
+
+    kinds = [e["event"] for e in events]
+    assert kinds[0] == "params" and monitor.params["precalcValBufSize"] == "1024"
+    assert monitor.num_stages == 3
+    assert kinds.count("weak") == 2 and kinds.count("stage_end") == 1
+
+    stage = monitor.stages[0]
+    assert (stage["weak"], stage["hr"], stage["fa"]) == (2, 0.995, 0.42)
+    assert stage["acceptance_ratio"] == 1.0 and stage["seconds"] == 65
+    assert monitor.completed == 1
+    assert monitor.stop_reason and "overtraining" in monitor.stop_reason
+
+    saved = json.loads(progress.read_text())
+    assert saved["status"] == "stopped" and saved["current"]["acceptance_ratio"] == 3.2e-06
+
+
+def test_max_weak_flags_stage_that_does_not_converge():
+    monitor = TrainMonitor(max_weak=1, min_acceptance=0)
+    for line in OUTPUT.splitlines()[10:22]:
+        monitor.feed(line)
+    assert monitor.stop_reason and "não converge" in monitor.stop_reason
+
+
+def test_run_traincascade_kills_run_going_nowhere(tmp_path):
+    script = ("import sys, time\n"
+              f"sys.stdout.write({OUTPUT!r})\n"
+              "sys.stdout.flush()\n"
+              "time.sleep(30)\n")
+    t0 = time.perf_counter()
+    state = run_traincascade([sys.executable, "-c", script],
+                             progress_path=str(tmp_path / "progress.json"))
+    assert time.perf_counter() - t0 < 10
+    assert state["status"] == "stopped" and state["completed"] == 1
+
+
+def test_run_traincascade_stopped_before_first_stage_fails():
+    output = "===== TRAINING 0-stage =====\\nNEG count : acceptanceRatio    100 : 1e-09\\n"
+    with pytest.raises(RuntimeError, match="primeiro estágio"):
+        run_traincascade([sys.executable, "-c", f"print('{output}')"])
+
+
+def test_run_traincascade_finalize_failure_is_runtime_error(tmp_path):
+    # a remontagem (-numStages 1) falha: vira RuntimeError, que a varredura trata por job
+    script = ("import sys, time\n"
+              "if sys.argv[-1] == '1': raise SystemExit(2)\n"
+              f"sys.stdout.write({OUTPUT!r})\n"
+              "sys.stdout.flush()\n"
+              "time.sleep(30)\n")
+    with pytest.raises(RuntimeError, match="montar o cascade"):
+        run_traincascade([sys.executable, "-c", script, "-numStages", "3"],
+                         progress_path=str(tmp_path / "progress.json"))
+    assert json.loads((tmp_path / "progress.json").read_text())["status"] == "error"
+
+
+@pytest.mark.parametrize("line, loaded", [("Stage 0 is loaded", 1), ("Stages 0-2 are loaded", 3)])
+def test_resumed_stages_count_as_completed(line, loaded):
+    monitor = TrainMonitor(min_acceptance=1e-5)
+    monitor.feed(line)
+    monitor.feed("===== TRAINING 1-stage =====" if loaded == 1 else "===== TRAINING 3-stage =====")
+    monitor.feed("NEG count : acceptanceRatio    100 : 1e-09")
+
+    # parada logo no estágio retomado: os estágios em disco continuam valendo
+    assert monitor.stop_reason and monitor.completed == loaded
+
+
+def test_progress_is_saved_on_stage_boundaries_only(tmp_path, monkeypatch):
+    monitor = TrainMonitor(str(tmp_path / "progress.json"), min_acceptance=0)
+    saves = []
+    monkeypatch.setattr(monitor, "save", lambda: saves.append(monitor.completed))
+    for line in OUTPUT.splitlines():
+        monitor.feed(line)
+
+    # params, início do 0, fim do 0, início do 1 — nenhuma linha HR/FA ou contagem
+    assert len(saves) == 4
@@ -0,0 +1,40 @@
+import sys
+
+import pytest
+
+from app.core.trainer import run_traincascade
+from app.core.training_sweep import plan_resources, sweep_jobs
+
+
+def test_sweep_jobs_expand_grid_over_training_params():
+    jobs = sweep_jobs({"feature_type": ["HAAR", "LBP"], "window": [(24, 24), (40, 32)]})
+
+    assert len(jobs) == 4
+    assert len({j["name"] for j in jobs}) == 4
+    lbp = next(j for j in jobs if j["name"] == "lbp_40x32")
+    assert lbp["params"]["feature_type"] == "LBP"
+    assert (lbp["params"]["width"], lbp["params"]["height"]) == (40, 32)
+    assert "window" not in lbp["params"]
+
+
+def test_plan_resources_caps_jobs_and_splits_budget():
+    plan = plan_resources(8, jobs=4, memory_mb=4096, cpus=8)
+    assert plan["jobs"] == 4 and plan["threads"] == 2
+    assert plan["jobs"] * (plan["precalcValBufSize"] + plan["precalcIdxBufSize"]) <= 4096
+
+    # pouca memória: menos jobs simultâneos em vez de buffers abaixo do piso
+    tight = plan_resources(8, jobs=8, memory_mb=1024, cpus=8)
+    assert tight["jobs"] == 2 and tight["precalcValBufSize"] == 256
+
+    with pytest.raises(ValueError):
+        plan_resources(2, memory_mb=256, cpus=8)   # nem um job com 2 × 256 MB
+
+
+def test_run_traincascade_streams_output_to_log(tmp_path):
+    log = tmp_path / "train.log"
+    script = "import sys; print('===== TRAINING 0-stage ====='); sys.stdout.flush(); print('END')"
+    run_traincascade([sys.executable, "-c", script], log_path=str(log), prefix="[t] ")
+    assert log.read_text().splitlines() == ["===== TRAINING 0-stage =====", "END"]
+
+    with pytest.raises(RuntimeError):
+        run_traincascade([sys.executable, "-c", "raise SystemExit(3)"])
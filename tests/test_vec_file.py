@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+from app.core.vec_file import (
+    VecReader, VecWriter, merge_vec, read_header, sample_dtype, write_samples,
+)
+
+
+def test_writer_appends_instead_of_rewriting(tmp_path):
+    path = str(tmp_path / "s.vec")
+    a = np.full((3, 8, 6), 7, np.uint8)
+    b = np.arange(48, dtype=np.uint8).reshape(1, 8, 6)
+
+    VecWriter(path, 6, 8).write(a)
+    assert VecWriter(path, 6, 8, append=True).write(b) == 4
+
+    assert read_header(path) == (4, 48)
+    data = np.fromfile(path, dtype=sample_dtype(6, 8), offset=12)
+    assert (data["sep"] == 0).all()
+    np.testing.assert_array_equal(data["img"][3], b[0])
+
+
+def test_write_samples_is_reproducible(tmp_path):
+    img = str(tmp_path / "img.png")
+    cv2.imwrite(img, np.random.default_rng(1).integers(0, 255, (120, 160), dtype=np.uint8))
+    positives = [(img, np.array([[10, 20, 60, 80]], np.int32))]
+
+    runs = []
+    for name in ("a.vec", "b.vec"):
+        path = str(tmp_path / name)
+        assert write_samples(path, positives, 12, 16, variants=3, seed=5, workers=1) == 3
+        runs.append(open(path, "rb").read())
+
+    assert runs[0] == runs[1]
+
+
+def _vec(path, samples):
+    VecWriter(str(path), 4, 4).write(np.asarray(samples, np.uint8).reshape(-1, 4, 4))
+    return str(path)
+
+
+def test_reader_exposes_zero_copy_view(tmp_path):
+    path = _vec(tmp_path / "a.vec", [np.full(16, i) for i in range(5)])
+    reader = VecReader(path)
+
+    assert reader.samples.shape == (5, 4, 4) and reader.samples.dtype == np.int16
+    assert np.shares_memory(reader[1:3], reader.samples)
+    assert int(reader[4][0, 0]) == 4
+
+
+def test_dedupe_merge_and_split(tmp_path):
+    a = _vec(tmp_path / "a.vec", [np.full(16, v) for v in (1, 2, 1)])
+    b = _vec(tmp_path / "b.vec", [np.full(16, v) for v in (2, 3)])
+
+    assert VecReader(a).unique_indices().tolist() == [0, 1]
+    assert merge_vec([a, b], str(tmp_path / "m.vec"), dedupe=True) == 3
+    assert merge_vec([a, b], str(tmp_path / "all.vec")) == 5
+
+    train, val = VecReader(str(tmp_path / "all.vec")).split(
+        str(tmp_path / "t.vec"), str(tmp_path / "v.vec"), val_fraction=0.4)
+    assert (train, val) == (3, 2)